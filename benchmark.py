@@ -0,0 +1,347 @@
+import argparse
+import json
+import os
+import platform
+import signal
+import sys
+import time
+import warnings
+from contextlib import contextmanager
+
+import numpy as np
+
+from block_detection import (
+    detect_blocks, build_super_blocks, get_xor_blocks, get_par_blocks, get_optional_blocks
+)
+from relationship_matrix import RelationshipMatrix
+from score_process import (
+    score_process, compute_base_score, refine_sb_to_sb, refine_out_to_sb, refine_out_to_out
+)
+from synthetic import SHAPES, generate_matrix
+
+# Percentiles reported per stage
+PERCENTILES = (50, 90, 99)
+
+
+class StageTimeout(Exception):
+    """Raised when a benchmarked stage exceeds its time limit."""
+
+
+@contextmanager
+def time_limit(seconds):
+    """
+    Abort the enclosed code with StageTimeout after `seconds` of wall time.
+
+    Relies on SIGALRM, so the limit is only enforced on Unix and in the main thread.
+    """
+    if not seconds or not hasattr(signal, "SIGALRM"):
+        yield
+        return
+
+    def handler(signum, frame):
+        raise StageTimeout(f"exceeded {seconds}s")
+
+    previous = signal.signal(signal.SIGALRM, handler)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+def _fresh(relations):
+    # Copy without the derived masks and indices cached by earlier runs
+    return RelationshipMatrix(
+        relations.activities, relations.temporal, relations.existential,
+        relations.temporal_symbols, relations.existential_symbols
+    )
+
+
+def _detection_args(relations, context):
+    # Arguments of get_xor_blocks / get_par_blocks as prepared by detect_blocks
+    preds, succs, direct_preds, direct_succs = relations.reachability.adjacency()
+    return list(relations.activities), preds, succs, direct_preds, direct_succs, relations, {}
+
+
+# Benchmarked stages: name -> (context entries needed, applicability check, argument builder, function).
+# Arguments are built from a fresh matrix before the timer starts.
+STAGES = {
+    "detect_blocks": ((), None, lambda r, c: (r,), detect_blocks),
+    "get_xor_blocks": ((), None, _detection_args, get_xor_blocks),
+    "get_par_blocks": ((), None, _detection_args, get_par_blocks),
+    "get_optional_blocks": (
+        ("xor_blocks",), None, lambda r, c: (list(r.activities), c["xor_blocks"], r), get_optional_blocks
+    ),
+    "build_super_blocks": (("blocks",), None, lambda r, c: (c["blocks"], r), build_super_blocks),
+    "refine_sb_to_sb": (
+        ("super_blocks",), lambda c: len(c["super_blocks"]) > 1,
+        lambda r, c: (r, c["super_blocks"], False), refine_sb_to_sb
+    ),
+    "refine_out_to_sb": (
+        ("super_blocks", "outsiders"), lambda c: len(c["super_blocks"]) >= 1 and len(c["outsiders"]) >= 1,
+        lambda r, c: (c["outsiders"], r, c["super_blocks"], False), refine_out_to_sb
+    ),
+    "refine_out_to_out": (
+        ("outsiders",), lambda c: len(c["outsiders"]) > 1,
+        lambda r, c: (c["outsiders"], r, False), refine_out_to_out
+    ),
+    "score_process": (("super_blocks",), None, lambda r, c: (None, r, c["super_blocks"]), score_process),
+}
+
+
+def stage_context(relations, timeout):
+    """
+    Intermediate results the later stages take as input, computed once per matrix.
+
+    Entries whose computation fails are missing, the error is stored under "errors". A step
+    whose inputs are missing is skipped and inherits the error of the first missing input,
+    so every missing entry reports the original cause.
+    """
+    context = {"errors": {}}
+    # (name, context entries needed, computation)
+    steps = (
+        ("xor_blocks", (), lambda: get_xor_blocks(*_detection_args(_fresh(relations), context))),
+        ("blocks", (), lambda: detect_blocks(_fresh(relations))),
+        ("super_blocks", ("blocks",), lambda: build_super_blocks(context["blocks"], _fresh(relations))),
+        (
+            "outsiders", ("super_blocks",),
+            lambda: compute_base_score(context["super_blocks"], relations.activities)[1]
+        ),
+    )
+    for name, needs, compute in steps:
+        missing = [entry for entry in needs if entry not in context]
+        if missing:
+            context["errors"][name] = context["errors"][missing[0]]
+            continue
+        try:
+            with time_limit(timeout):
+                context[name] = compute()
+        except Exception as e:
+            context["errors"][name] = f"{type(e).__name__}: {e}"
+    return context
+
+
+def time_stage(name, relations, context, warmup=1, repeats=5, timeout=None):
+    """
+    Time one stage on one matrix.
+
+    Every run gets a fresh copy of the matrix, so derived masks and indices are built within
+    the timed stage just like in the pipeline.
+
+    Args:
+        name (str): Stage name, a key of STAGES.
+        relations (RelationshipMatrix): Input relationships.
+        context (Dict): Intermediate results from `stage_context`.
+        warmup (int): Untimed runs before the measurement.
+        repeats (int): Timed runs.
+        timeout (float, optional): Time limit per run in seconds.
+
+    Returns:
+        Dict: "samples" (seconds per timed run), or "skipped" / "error" / "timeout" with a reason.
+    """
+    needs, applicable, make_args, func = STAGES[name]
+    missing = [entry for entry in needs if entry not in context]
+    if missing:
+        return {"skipped": f"no {missing[0]}: {context['errors'].get(missing[0])}"}
+    if applicable is not None and not applicable(context):
+        return {"skipped": "not applicable"}
+
+    samples = []
+    for run in range(warmup + repeats):
+        args = make_args(_fresh(relations), context)
+        try:
+            with time_limit(timeout):
+                start = time.perf_counter()
+                func(*args)
+                elapsed = time.perf_counter() - start
+        except StageTimeout as e:
+            return {"timeout": str(e), "samples": samples}
+        except Exception as e:
+            return {"error": f"{type(e).__name__}: {e}", "samples": samples}
+        if run >= warmup:
+            samples.append(elapsed)
+    return {"samples": samples}
+
+
+def summarize(samples):
+    """
+    Summary statistics of timing samples in seconds.
+
+    Args:
+        samples (List[float]): Seconds per run.
+
+    Returns:
+        Dict: Number of runs, min, mean, max and the percentiles of PERCENTILES ("p50", ...).
+    """
+    if not samples:
+        return {"runs": 0}
+    values = np.asarray(samples, dtype=float)
+    stats = {"runs": len(values), "min": float(values.min()), "mean": float(values.mean()), "max": float(values.max())}
+    for p in PERCENTILES:
+        stats[f"p{p}"] = float(np.percentile(values, p))
+    return stats
+
+
+def scaling_exponents(sizes, times):
+    """
+    Estimate how a stage scales with the number of activities, assuming time ~ size^k.
+
+    Args:
+        sizes (List[int]): Number of activities per measurement, ascending.
+        times (List[float]): Median time per measurement.
+
+    Returns:
+        Dict: "exponent" fitted over all points (log-log least squares) and "local_exponents"
+            between consecutive points, None where the measurements do not suffice.
+    """
+    points = [(n, t) for n, t in zip(sizes, times) if n > 0 and t and t > 0]
+    if len(points) < 2:
+        return {"exponent": None, "local_exponents": []}
+    log_n = np.log([n for n, _ in points])
+    log_t = np.log([t for _, t in points])
+    exponent = float(np.polyfit(log_n, log_t, 1)[0]) if len(set(log_n)) > 1 else None
+    local = [
+        float((t2 - t1) / (n2 - n1)) if n2 != n1 else None
+        for (n1, t1), (n2, t2) in zip(zip(log_n, log_t), zip(log_n[1:], log_t[1:]))
+    ]
+    return {"exponent": exponent, "local_exponents": local}
+
+
+def environment():
+    """Python and NumPy versions and the machine the benchmark ran on."""
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "cpus": os.cpu_count(),
+        "host": platform.node(),
+    }
+
+
+def run_benchmark(sizes, shape="mixed", noise=0.05, n_traces=200, max_branches=4, seeds=1,
+                  warmup=1, repeats=5, timeout=30.0, stages=None, log=None):
+    """
+    Benchmark the pipeline stages on synthetic matrices of growing size.
+
+    For every size, `seeds` matrices are generated (see synthetic.generate_matrix) and every
+    stage is timed on each of them; the samples of a size are pooled. A stage that times out
+    is not run for larger sizes.
+
+    Args:
+        sizes (List[int]): Numbers of activities.
+        shape (str): Process structure, see synthetic.SHAPES.
+        noise (float): Fraction of distorted traces.
+        n_traces (int): Simulated traces per matrix.
+        max_branches (int): Maximum number of branches per block.
+        seeds (int): Matrices per size.
+        warmup (int): Untimed runs per stage and matrix.
+        repeats (int): Timed runs per stage and matrix.
+        timeout (float, optional): Time limit per run in seconds.
+        stages (List[str], optional): Stages to run, all of STAGES by default.
+        log (file, optional): Stream for progress messages.
+
+    Returns:
+        Dict: JSON-serializable report with the configuration, the environment, the statistics
+            per size and stage, and the scaling exponents per stage.
+    """
+    stages = list(stages or STAGES)
+    results = []
+    stopped = {}
+
+    with warnings.catch_warnings():
+        # Unknown relations are common in noisy matrices and only cost time in the report
+        warnings.simplefilter("ignore")
+        for size in sorted(sizes):
+            samples = {name: [] for name in stages}
+            issues = {name: [] for name in stages}
+            n_activities = []
+            for seed in range(seeds):
+                relations = generate_matrix(size, shape, n_traces, noise, max_branches, seed)
+                n_activities.append(len(relations.activities))
+                context = stage_context(relations, timeout)
+                for name in stages:
+                    if name in stopped:
+                        continue
+                    outcome = time_stage(name, relations, context, warmup, repeats, timeout)
+                    samples[name].extend(outcome.get("samples", []))
+                    for kind in ("skipped", "error", "timeout"):
+                        if kind in outcome:
+                            issues[name].append({"seed": seed, kind: outcome[kind]})
+                    if "timeout" in outcome:
+                        stopped[name] = size
+
+            entry = {"size": size, "activities": float(np.mean(n_activities)), "stages": {}}
+            for name in stages:
+                if name in stopped and stopped[name] < size:
+                    entry["stages"][name] = {"runs": 0, "stopped": f"timed out at size {stopped[name]}"}
+                    continue
+                entry["stages"][name] = summarize(samples[name])
+                if issues[name]:
+                    entry["stages"][name]["issues"] = issues[name]
+            results.append(entry)
+
+            if log is not None:
+                medians = ", ".join(
+                    f"{name}={entry['stages'][name]['p50'] * 1000:.1f}ms"
+                    for name in stages if entry["stages"][name].get("runs")
+                )
+                print(f"size {size}: {medians}", file=log, flush=True)
+
+    scaling = {}
+    for name in stages:
+        measured = [(r["activities"], r["stages"][name].get("p50")) for r in results]
+        scaling[name] = scaling_exponents([n for n, _ in measured], [t for _, t in measured])
+
+    return {
+        "config": {
+            "sizes": sorted(sizes), "shape": shape, "noise": noise, "traces": n_traces,
+            "max_branches": max_branches, "seeds": seeds, "warmup": warmup, "repeats": repeats,
+            "timeout": timeout,
+        },
+        "environment": environment(),
+        "results": results,
+        "scaling": scaling,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the pipeline stages on synthetic relationship matrices of growing size."
+    )
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[10, 20, 40, 80],
+        help="Numbers of activities to generate (default: 10 20 40 80).",
+    )
+    parser.add_argument("--shape", choices=SHAPES, default="mixed", help="Process structure (default: mixed).")
+    parser.add_argument("--noise", type=float, default=0.05, help="Fraction of distorted traces (default: 0.05).")
+    parser.add_argument("--traces", type=int, default=200, help="Simulated traces per matrix (default: 200).")
+    parser.add_argument("--branches", type=int, default=4, help="Maximum branches per block (default: 4).")
+    parser.add_argument("--seeds", type=int, default=3, help="Matrices per size (default: 3).")
+    parser.add_argument("--warmup", type=int, default=1, help="Untimed runs per stage (default: 1).")
+    parser.add_argument("--repeats", type=int, default=5, help="Timed runs per stage (default: 5).")
+    parser.add_argument(
+        "--timeout", type=float, default=30.0,
+        help="Time limit per run in seconds; a stage that exceeds it is not run for larger sizes (default: 30).",
+    )
+    parser.add_argument("--stages", nargs="+", choices=list(STAGES), default=None, help="Stages to run (default: all).")
+    parser.add_argument("--out", default=None, help="Write the JSON report to this file instead of stdout.")
+    args = parser.parse_args()
+
+    report = run_benchmark(
+        args.sizes, args.shape, args.noise, args.traces, args.branches, args.seeds,
+        args.warmup, args.repeats, args.timeout, args.stages, log=sys.stderr,
+    )
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as fh:
+            json.dump(report, fh, indent=2)
+        print(f"✅ Benchmark report written to: {args.out}", file=sys.stderr)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,46 @@
-from itertools import permutations
-from collections import defaultdict, Counter
+from itertools import combinations
+from collections import defaultdict, Counter, deque
 from collections import defaultdict
+
+import numpy as np
+
 from utils import flatten_blocks, flatten_block, earliest_among, latest_among, find_first_allowed_pred, flatten_block_acts
+from profiling import count, timed
+from reachability import bitsets_from_mask, iter_bits
+from relationship_matrix import (
+    RelationshipMatrix, T_NONE, T_BEFORE, T_DIRECTLY_BEFORE,
+    E_CO_OCCURRENCE, E_IMPLIED_BY, E_IMPLIES, E_NON_CO_OCCURRENCE, MAX_SYMBOLS
+)
+
+
+# Relation codes that block detection and super-block aggregation tell apart. Every other
+# temporal code (">", ">d", unknown symbols) and existential code ("-", unknown symbols) is
+# never compared against, so these codes are interchangeable for both stages.
+BLOCK_TEMPORAL_CODES = (T_NONE, T_BEFORE, T_DIRECTLY_BEFORE)
+BLOCK_EXISTENTIAL_CODES = (E_IMPLIES, E_IMPLIED_BY, E_CO_OCCURRENCE, E_NON_CO_OCCURRENCE)
+
+
+def block_relation_classes(temporal, existential):
+    """
+    Project relation codes onto the classes that block detection can distinguish.
+
+    Two relationship matrices whose cells have the same classes yield the same blocks and
+    super-blocks. Keep BLOCK_TEMPORAL_CODES and BLOCK_EXISTENTIAL_CODES in sync with the
+    relations read in this module.
+
+    Args:
+        temporal (np.ndarray): Temporal codes.
+        existential (np.ndarray): Existential codes of the same cells.
+
+    Returns:
+        np.ndarray: Integer class of each cell.
+    """
+    temporal = np.asarray(temporal)
+    existential = np.asarray(existential)
+    temporal_class = np.where(np.isin(temporal, BLOCK_TEMPORAL_CODES), temporal, MAX_SYMBOLS - 1)
+    existential_class = np.where(np.isin(existential, BLOCK_EXISTENTIAL_CODES), existential, MAX_SYMBOLS - 1)
+    return temporal_class.astype(np.int32) * MAX_SYMBOLS + existential_class
+
 
 def build_super_blocks(blocks, relationships):
     """
@@ -15,8 +54,9 @@ def build_super_blocks(blocks, relationships):
             - "start": start activity of block (may be None)
             - "end": end activity of block (may be None)
             - "activities": list of activities (may include tuples)
-        relationships (Dict[str, Dict[str, str]]): Pairwise temporal+existential relationships between activities,
-            encoded as strings like "<d,=>" or "-,<=>" for each activity pair.
+        relationships (RelationshipMatrix or Dict[str, Dict[str, str]]): Pairwise temporal+existential
+            relationships between activities, either as shared coded matrix or encoded as strings like
+            "<d,=>" or "-,<=>" for each activity pair.
 
     Returns:
         List[Dict]: List of super-blocks. Each super-block is a dictionary containing:
@@ -25,13 +65,7 @@ def build_super_blocks(blocks, relationships):
             - "activities": list of all inner activities (flattened, deduplicated)
     """
 
-    all_acts = list(relationships.keys())
-
-    # Preprocess pairwise temporal relations from relationships
-    temporal = {
-        a: {b: ("-" if a == b else relationships[a][b].split(",")[0]) for b in all_acts}
-        for a in all_acts
-    }
+    relations = RelationshipMatrix.coerce(relationships)
 
     # Identify edges between blocks, i.e., how the blocks will be arranged as super-blocks
     edges = []
@@ -51,7 +85,7 @@ def build_super_blocks(blocks, relationships):
             starts_j = [block_j["start"]] if block_j.get("start") else inner_j
 
             # Either direct temporal relationship from end of i to start of j, or they are the same activity
-            if any(temporal[e][s] == "<d" for e in ends_i for s in starts_j) or \
+            if any(relations.temporal_of(e, s) == "<d" for e in ends_i for s in starts_j) or \
                any(e == s for e in ends_i for s in starts_j):
                 edges.append((i, j))
                 continue
@@ -62,11 +96,14 @@ def build_super_blocks(blocks, relationships):
             starts_i = [block_i["start"]] if block_i.get("start") else inner_i
 
             # Either direct temporal relationship from end of j to start of i, or they are the same activity
-            if any(temporal[e][s] == "<d" for e in ends_j for s in starts_i) or \
+            if any(relations.temporal_of(e, s) == "<d" for e in ends_j for s in starts_i) or \
                any(e == s for e in ends_j for s in starts_i):
                 edges.append((j, i))
 
 
+    count("super_block_pairs", len(blocks) * (len(blocks) - 1) // 2)
+    count("super_block_edges", len(edges))
+
     # Initialize maps to store incoming and outgoing edges for each block index
     incoming = defaultdict(set) 
     outgoing = defaultdict(set)
@@ -87,15 +124,24 @@ def build_super_blocks(blocks, relationships):
             continue
 
         # Find the starting point of the chain by following incoming edges backwards
+        # (blocks sharing activities can be linked in a cycle, the walk stops when it closes)
         current = idx
+        walked = {current}
         while incoming[current]:
             current = next(iter(incoming[current]))
+            if current in walked:
+                break
+            walked.add(current)
 
         # Build the chain starting from the source
         chain = [current]
+        in_chain = {current}
         while outgoing[current]:
             current = next(iter(outgoing[current]))
+            if current in in_chain:
+                break
             chain.append(current)
+            in_chain.add(current)
 
         # Mark all blocks in this chain as visited so they won't be included again
         visited.update(chain)
@@ -148,8 +194,9 @@ def detect_blocks(relationships):
     Nested structures are cleaned to avoid overlapping or redundant blocks.
 
     Args:
-        relationships (Dict[str, Dict[str, str]]): Mapping from activity pairs 
-            to their (temporal, existential) relationship string (e.g., "<,=>").
+        relationships (RelationshipMatrix or Dict[str, Dict[str, str]]): Shared coded relationship
+            matrix, or mapping from activity pairs to their (temporal, existential) relationship
+            string (e.g., "<,=>").
 
     Returns:
         List[Dict]: A list of detected block structures. Each block contains:
@@ -159,72 +206,44 @@ def detect_blocks(relationships):
             - "end": the merge activity (if applicable)
             - "nested": any nested blocks (if present)
     """
-    acts = list(relationships.keys())
-
-    # Extract pairwise temporal and existential relations for all activity pairs
-    temporal = {
-        a: {b: ("-" if a == b else relationships[a][b].split(",")[0]) for b in acts}
-        for a in acts
-    }
-    existential = {
-        a: {b: ("-" if a == b else relationships[a][b].split(",")[1]) for b in acts}
-        for a in acts
-    }
-
-    # Initialize (direct) predecessor/successor dictionaries
-    preds = {a: list() for a in acts}
-    succs = {a: list() for a in acts}
-    direct_preds = {a: list() for a in acts}
-    direct_succs = {a: list() for a in acts}
-
-    # Build (direct) successor/predecessor relations
-    for a in relationships:
-        for b in relationships[a]:
-            if "<" in temporal[a][b]:
-                succs[a].append(b)
-                preds[b].append(a)
-                if "d" in temporal[a][b]: 
-                    direct_succs[a].append(b)
-                    direct_preds[b].append(a)
-            if "<" in temporal[b][a]:
-                succs[b].append(a)
-                preds[a].append(b)
-                if "d" in temporal[b][a]:
-                    direct_succs[b].append(a)
-                    direct_preds[a].append(b)
-
-
-    # Precompute (non-)co-occurrence flags
-    always = {
-        a: {b: (temporal[a][b]=="-" and existential[a][b]=="<=>") for b in acts}
-        for a in acts
-    }
-    never  = {
-        a: {b: (temporal[a][b]=="-" and existential[a][b]=="</=>") for b in acts}
-        for a in acts
-    }
+    # Parse the relation strings once into integer codes (no-op if already shared)
+    relations = RelationshipMatrix.coerce(relationships)
+    acts = list(relations.activities)
+
+    # Deduplicated (direct) predecessor/successor lists from the reachability index of the matrix
+    preds, succs, direct_preds, direct_succs = relations.reachability.adjacency()
+
+    # Nested XOR/PAR results per activity subset, shared by XOR and PAR detection
+    nested_cache = {}
 
     # Identify XOR blocks
-    xor_blocks = get_xor_blocks(
-        acts, preds, succs, direct_preds, direct_succs, temporal, existential, always, never
-    )
+    with timed("get_xor_blocks"):
+        xor_blocks = get_xor_blocks(
+            acts, preds, succs, direct_preds, direct_succs, relations, nested_cache
+        )
 
     # Identify PAR blocks
-    par_blocks = get_par_blocks(
-        acts, preds, succs, direct_preds, direct_succs, temporal, existential, always, never
-    )
+    with timed("get_par_blocks"):
+        par_blocks = get_par_blocks(
+            acts, preds, succs, direct_preds, direct_succs, relations, nested_cache
+        )
 
     # Identify optional blocks
-    optional_blocks = get_optional_blocks(acts, xor_blocks, succs, temporal, existential)
+    with timed("get_optional_blocks"):
+        optional_blocks = get_optional_blocks(acts, xor_blocks, relations)
 
     # Identify sequence blocks 
-    seq_blocks = get_sequence_blocks(acts, direct_succs, existential)
+    with timed("get_sequence_blocks"):
+        seq_blocks = get_sequence_blocks(acts, direct_succs, relations)
 
     # Remove redundant blocks caused by XOR/PAR nesting
-    xor_blocks_clean = remove_duplicate_blocks_from_nesting(xor_blocks, par_blocks)
-    par_blocks_clean = remove_duplicate_blocks_from_nesting(par_blocks, xor_blocks)
-    seq_blocks_clean = remove_duplicate_blocks_from_nesting(seq_blocks, xor_blocks, include_split_merge=True)
-    seq_blocks_clean = remove_duplicate_blocks_from_nesting(seq_blocks_clean, par_blocks, include_split_merge=True)
+    with timed("remove_duplicate_blocks_from_nesting"):
+        xor_blocks_clean = remove_duplicate_blocks_from_nesting(xor_blocks, par_blocks)
+        par_blocks_clean = remove_duplicate_blocks_from_nesting(par_blocks, xor_blocks)
+        seq_blocks_clean = remove_duplicate_blocks_from_nesting(seq_blocks, xor_blocks, include_split_merge=True)
+        seq_blocks_clean = remove_duplicate_blocks_from_nesting(seq_blocks_clean, par_blocks, include_split_merge=True)
+    count("blocks_pruned_by_nesting", len(xor_blocks) + len(par_blocks) + len(seq_blocks)
+          - len(xor_blocks_clean) - len(par_blocks_clean) - len(seq_blocks_clean))
 
     # Combine all block types into a unified structure list
     blocks = xor_blocks_clean + par_blocks_clean + optional_blocks + seq_blocks_clean
@@ -232,7 +251,7 @@ def detect_blocks(relationships):
     return blocks
 
 
-def get_xor_blocks(acts, preds, succs, direct_preds, direct_succs, temporal, existential, always, never):
+def get_xor_blocks(acts, preds, succs, direct_preds, direct_succs, relations, nested_cache=None):
     """
     Identifies XOR blocks within a process model based on binary relations between activities.
 
@@ -240,9 +259,11 @@ def get_xor_blocks(acts, preds, succs, direct_preds, direct_succs, temporal, exi
     exclusive execution paths. It supports nested structures and accounts for embedded PAR blocks and further nesting.
 
     Steps performed by the function:
-    1. For each activity x, find all other activities y such that x and y never co-occur.
-    2. Construct branches starting from x and its XOR partners using temporal and existential conditions.
+    1. For each activity, take it and a maximal clique of the activities it never co-occurs with as branch heads (see get_branch_groups).
+    2. Construct a branch from each head of a group using temporal and existential conditions.
+       Groups yielding the same branches as an already explored group are skipped.
     3. Detect nested PAR blocks within branches and tag branches as XOR or PAR.
+       Nested results are cached per activity subset in `nested_cache`.
     4. Identify a possible merge activity that appears in all branches and follows them.
     5. Remove invalid successors from branches if the XOR exclusiveness criterion is violated.
     6. Identify a split activity if one exists. Must be a shared direct predecessor of all branches (except PAR branches).
@@ -256,10 +277,10 @@ def get_xor_blocks(acts, preds, succs, direct_preds, direct_succs, temporal, exi
         succs (Dict[str, List[str]]): Successor relation mapping for each activity.
         direct_preds (Dict[str, Set[str]]): Direct predecessors per activity.
         direct_succs (Dict[str, Set[str]]): Direct successors per activity.
-        temporal (Dict[str, Dict[str, str]]): Temporal relations between activities (e.g., "<", ">").
-        existential (Dict[str, Dict[str, str]]): Existential relations between activities (e.g., "</=>").
-        always (Dict[str, Dict[str, bool]]): True if two activities always co-occur.
-        never (Dict[str, Dict[str, bool]]): True if two activities never co-occur.
+        relations (RelationshipMatrix): Coded temporal (e.g., "<", ">") and existential (e.g., "</=>")
+            relations between activities, including the always/never co-occurrence masks.
+        nested_cache (Dict[Tuple[str, FrozenSet[str]], List[Dict]], optional): Nested XOR/PAR blocks
+            per block type and activity subset, shared across the nested XOR/PAR detection calls.
 
     Returns:
         List[Dict]: A list of XOR blocks, each represented as a dictionary with:
@@ -269,37 +290,29 @@ def get_xor_blocks(acts, preds, succs, direct_preds, direct_succs, temporal, exi
             - "start": Split activity (or None)
             - "end": Merge activity (or None)
     """
-    xor_blocks = []
-    for x in acts:
-        # all acts y with x XOR y
-        acts_XOR_x = [
-                y for y in acts
-                if y!=x
-                and never[x][y]
-            ]
+    if nested_cache is None:
+        nested_cache = {}
 
-        # continue with next act if no XOR exists
-        if len(acts_XOR_x) == 0:
-            continue
+    # Branches (and their encoding) of the XOR groups explored so far
+    explored_groups = set()
 
+    acts = list(acts)
+    acts_set = set(acts)
+
+    xor_blocks = []
+    for group in get_branch_groups(acts, relations, type="XOR"):
         # branches in XOR containing the acts
         branches = []
 
         # store if branches are XOR or PAR to identify later
         branch_encoding = []
 
-        # not yet used acts in any branch
-        remaining_XOR_acts = [x] + acts_XOR_x
-
-        while len(remaining_XOR_acts) > 0:
-            # For an element of acts, get the first element within XOR acts
-            y = find_first_allowed_pred(next(iter(remaining_XOR_acts)), preds, remaining_XOR_acts)
-
+        for y in group:
             # this branch contains all acts that follow the first element within branch
-            new_branch = append_branch_succs(y, succs, temporal, existential, type="XOR")
+            new_branch = append_branch_succs(y, relations, type="XOR")
 
             # Add potential PAR acts if this branch contains a PAR split
-            acts_par_y = [other for other in acts if always[y][other]]
+            acts_par_y = [other for other in relations.neighbors(y, T_NONE, E_CO_OCCURRENCE) if other in acts_set]
 
             branches += [new_branch + acts_par_y]
 
@@ -308,16 +321,25 @@ def get_xor_blocks(acts, preds, succs, direct_preds, direct_succs, temporal, exi
             else:
                 branch_encoding += ["XOR"]
 
-            # continue with acts in other branches (in XOR to y)
-            remaining_XOR_acts = [
-                z for z in remaining_XOR_acts
-                if never[y][z]
-            ]
+        # Skip groups yielding the same branches as an already explored group, the block would be identical
+        group_key = (tuple(map(tuple, branches)), tuple(branch_encoding))
+        if group_key in explored_groups:
+            count("xor_groups_repeated")
+            continue
+        explored_groups.add(group_key)
 
         # get PAR blocks from nested PAR acts for later usage
         # reduce acts to only current block we're looking at
         branches_acts = set([act for branch in branches for act in branch])
-        nested_par_blocks = get_par_blocks(branches_acts, preds, succs, direct_preds, direct_succs, temporal, existential, always, never)
+        nested_key = ("PAR", frozenset(branches_acts))
+        if nested_key not in nested_cache:
+            # Placeholder while the nested call runs, a nested XOR search over the same acts
+            # leads back here (XOR(S) -> PAR(S) -> XOR(S)) and must not recurse again
+            nested_cache[nested_key] = []
+            nested_cache[nested_key] = get_par_blocks(
+                branches_acts, preds, succs, direct_preds, direct_succs, relations, nested_cache
+            )
+        nested_par_blocks = nested_cache[nested_key]
 
         # Check for merge acts and clean up branches
         merge = None
@@ -328,7 +350,7 @@ def get_xor_blocks(acts, preds, succs, direct_preds, direct_succs, temporal, exi
                 [x for x in branch if x not in joint_acts]
                 for branch in branches
             ]
-            merge_cands = earliest_among(joint_acts, succs)
+            merge_cands = earliest_among(joint_acts, relations.reachability)
             # if a single joint act exists, it's the merge act
             if len(merge_cands) == 1:
                 merge = next(iter(merge_cands))
@@ -340,7 +362,7 @@ def get_xor_blocks(acts, preds, succs, direct_preds, direct_succs, temporal, exi
             for b2 in branches:
                 if b1 == b2:
                     continue
-                xor_criterium = all([existential[a1][a2] == "</=>" for a1 in b1 for a2 in b2])
+                xor_criterium = all([relations.existential_of(a1, a2) == "</=>" for a1 in b1 for a2 in b2])
                 if not xor_criterium:
                     break
             if not xor_criterium:
@@ -349,7 +371,12 @@ def get_xor_blocks(acts, preds, succs, direct_preds, direct_succs, temporal, exi
         # if it doesn't hold, there have to be succs added to branch that don't fulfill criterium
         # therefore, find smallest subset with acts in branches that fulfill condition
         if not xor_criterium:
-            branches = reduce_branches_to_only_XOR(branches, preds, existential)
+            with timed("reduce_branches_to_only_XOR"):
+                branches = reduce_branches_to_only_XOR(branches, relations)
+
+        # No XOR block if no valid assignment exists or a branch consisted of joint acts only
+        if not branches or not all(branches):
+            continue
 
         # Find split act if it exists
         # if split act before XOR exists, it's the single joint direct pred of first element of all branches
@@ -370,7 +397,7 @@ def get_xor_blocks(acts, preds, succs, direct_preds, direct_succs, temporal, exi
             encoding = [True if enc == "XOR" else False for enc in branch_encoding]
             xor_preds = [x for x, m in zip(direct_pred_sets, encoding) if m]
             # Use direct pred from XOR as start if all XOR direct preds are equal 
-            if len(xor_preds[0]) > 0 and all(s == xor_preds[0] for s in xor_preds):
+            if xor_preds and len(xor_preds[0]) > 0 and all(s == xor_preds[0] for s in xor_preds):
                 split = next(iter(next(iter(xor_preds))))
 
     
@@ -406,11 +433,74 @@ def get_xor_blocks(acts, preds, succs, direct_preds, direct_succs, temporal, exi
         block for block in filtered_xor_blocks
         if all(activity_counts[act] == 1 for act in block['activities'])
     ]
+    count("xor_candidates", len(xor_blocks))
+    count("xor_candidates_pruned", len(xor_blocks) - len(final_xor_blocks))
 
     return final_xor_blocks
 
 
-def get_par_blocks(acts, preds, succs, direct_preds, direct_succs, temporal, existential, always, never):
+def get_branch_groups(acts, relations, type):
+    """
+    Collects the candidate XOR or PAR groups of branch heads as cliques of the "never co-occur"
+    (XOR) or "always co-occur" (PAR) graph. The graph is undirected: two activities are
+    partners if they are related in both directions.
+
+    Each activity x spans one group: x itself and a maximal clique among its partners. The
+    clique is searched depth-first on bitsets. The first remaining partner (in `acts` order)
+    is traced back to its first allowed predecessor among the remaining partners, which
+    becomes the next head, and only the common partners of all heads remain. The clique found
+    within every candidate set on the way is memoized, so activities with the same partners
+    (e.g., a sequence within one branch) and searches that meet resolve each set once.
+
+    Only one clique per activity is a candidate. Enumerating all maximal cliques yields
+    groups that share branches, whose blocks then discard each other as duplicates, and
+    their number grows exponentially with nested blocks.
+
+    Args:
+        acts (List[str]): List of activity labels to consider.
+        relations (RelationshipMatrix): Coded relations between activities.
+        type (str): "XOR" or "PAR".
+
+    Returns:
+        List[List[str]]: Branch heads of each distinct group in the order they were chosen,
+            groups in the order of the activity they were first built from.
+    """
+    # Undirected graph of acts that never (XOR) or always (PAR) co-occur, an act is not its own partner
+    idx = [relations.index[a] for a in acts]
+    mask = relations.never_mask if type == "XOR" else relations.always_mask
+    related = mask[np.ix_(idx, idx)]
+    partners = [bits & ~(1 << i) for i, bits in enumerate(bitsets_from_mask(related & related.T))]
+    position = {a: i for i, a in enumerate(acts)}
+
+    # Heads of the clique found within each candidate set searched so far
+    cliques = {}
+
+    def clique(candidates):
+        heads = []
+        path = []
+        while candidates and candidates not in cliques:
+            path.append((candidates, len(heads)))
+            remaining = [acts[j] for j in iter_bits(candidates)]
+            head = find_first_allowed_pred(remaining[0], relations.reachability, remaining)
+            heads.append(head)
+            candidates &= partners[position[head]]
+        heads += cliques.get(candidates, [])
+        # Every candidate set on the path leads to the rest of the same clique
+        for searched, depth in path:
+            cliques[searched] = heads[depth:]
+        return heads
+
+    groups = {}
+    for i, bits in enumerate(partners):
+        if bits:
+            groups.setdefault((acts[i], *clique(bits)), None)
+
+    count(f"{type.lower()}_groups", len(groups))
+    count(f"{type.lower()}_candidate_sets", len(cliques))
+    return [list(group) for group in groups]
+
+
+def get_par_blocks(acts, preds, succs, direct_preds, direct_succs, relations, nested_cache=None):
     """
     Identifies PAR blocks within a process model based on binary relations between activities.
 
@@ -419,8 +509,9 @@ def get_par_blocks(acts, preds, succs, direct_preds, direct_succs, temporal, exi
     and further nesting.
 
     Steps performed by the function:
-    1. For each activity x, find all other activities y such that x and y always co-occur.
-    2. Construct branches starting from x and its PAR partners using temporal and existential conditions.
+    1. For each activity, take it and a maximal clique of the activities it always co-occurs with as branch heads (see get_branch_groups).
+    2. Construct a branch from each head of a group using temporal and existential conditions.
+       Groups yielding the same branches as an already explored group are skipped.
     3. Add any XOR activities that follow the branch head but are mutually exclusive with it.
     4. Identify a possible merge activity that appears in all branches and follows them.
        If multiple candidates exist, select the one with appropriate existential relations to all branch activities.
@@ -428,6 +519,7 @@ def get_par_blocks(acts, preds, succs, direct_preds, direct_succs, temporal, exi
        The split must have (<, <=>) relations to all PAR activities in the block.
     6. Detect nested XOR blocks within the PAR structure using the previously defined XOR detection algorithm.
        This is done after merge cleanup to avoid including unrelated XOR blocks beyond the PAR boundary.
+       Nested results are cached per activity subset in `nested_cache`.
     7. Store the block with its start (split), end (merge), activities, and nested block structures.
     8. Remove redundant blocks that are subsets of other blocks.
     9. Remove blocks with duplicated activities across PAR blocks (to ensure exclusiveness).
@@ -438,10 +530,10 @@ def get_par_blocks(acts, preds, succs, direct_preds, direct_succs, temporal, exi
         succs (Dict[str, List[str]]): Successor relation mapping for each activity.
         direct_preds (Dict[str, Set[str]]): Direct predecessors per activity.
         direct_succs (Dict[str, Set[str]]): Direct successors per activity.
-        temporal (Dict[str, Dict[str, str]]): Temporal relations between activities (e.g., "<", ">").
-        existential (Dict[str, Dict[str, str]]): Existential relations between activities (e.g., "<=>", "=>").
-        always (Dict[str, Dict[str, bool]]): True if two activities always co-occur.
-        never (Dict[str, Dict[str, bool]]): True if two activities never co-occur.
+        relations (RelationshipMatrix): Coded temporal (e.g., "<", ">") and existential (e.g., "<=>", "=>")
+            relations between activities, including the always/never co-occurrence masks.
+        nested_cache (Dict[Tuple[str, FrozenSet[str]], List[Dict]], optional): Nested XOR/PAR blocks
+            per block type and activity subset, shared across the nested XOR/PAR detection calls.
 
     Returns:
         List[Dict]: A list of PAR blocks, each represented as a dictionary with:
@@ -451,50 +543,41 @@ def get_par_blocks(acts, preds, succs, direct_preds, direct_succs, temporal, exi
             - "start": Split activity (or None)
             - "end": Merge activity (or None)
     """
-    par_blocks = []
-    for x in acts:
-        # all acts y with x PAR y
-        acts_PAR_x = [
-                y for y in acts
-                if y!=x
-                and always[x][y]
-        ]
-
-        # continue with next act if no XOR exists
-        if len(acts_PAR_x) == 0:
-            continue
+    if nested_cache is None:
+        nested_cache = {}
 
-        # branches in PAR containing the acts
-        branches = []
+    acts = list(acts)
+    acts_set = set(acts)
 
-        # not yet used acts in any branch
-        remaining_PAR_acts = [x] + acts_PAR_x
+    # Branches of the PAR groups explored so far
+    explored_groups = set()
 
-        while len(remaining_PAR_acts) > 0:
-            # For an element of acts, get the first element within PAR acts
-            y = find_first_allowed_pred(next(iter(remaining_PAR_acts)), preds, remaining_PAR_acts)
+    par_blocks = []
+    for group in get_branch_groups(acts, relations, type="PAR"):
+        # branches in PAR containing the acts
+        branches = []
 
+        for y in group:
             # this branch contains all acts that follow the first element within branch
-            new_branch = append_branch_succs(y, succs, temporal, existential, type="PAR")
+            new_branch = append_branch_succs(y, relations, type="PAR")
 
             # Add potential XOR acts if this branch contains an XOR split
-            y_xor_acts = [other for other in acts if never[y][other]]
+            y_xor_acts = [other for other in relations.neighbors(y, T_NONE, E_NON_CO_OCCURRENCE) if other in acts_set]
 
             branches += [new_branch + y_xor_acts]
-            
-            # remove used act in this iteration and continue with remaining acts
-            remaining_PAR_acts = [
-                z for z in remaining_PAR_acts
-                if y!=z
-                and always[y][z]
-            ]
+
+        # Skip groups yielding the same branches as an already explored group, the block would be identical
+        group_key = tuple(map(tuple, branches))
+        if group_key in explored_groups:
+            count("par_groups_repeated")
+            continue
+        explored_groups.add(group_key)
 
         # Get acts in branches that are part of a nested XOR for later usage
         branches_acts = set([act for branch in branches for act in branch])
-        nested_xor_acts = set([
-            x for x in branches_acts for y in branches_acts
-            if never[x][y]
-        ])
+        branches_idx = [relations.index[act] for act in branches_acts]
+        never = relations.never_mask[np.ix_(branches_idx, branches_idx)]
+        nested_xor_acts = {act for act, has_xor in zip(branches_acts, never.any(axis=1)) if has_xor}
 
         # Check for merge acts and clean up branches
         merge = None
@@ -506,11 +589,11 @@ def get_par_blocks(acts, preds, succs, direct_preds, direct_succs, temporal, exi
                 [x for x in branch if x not in joint_acts]
                 for branch in branches
             ]
-            merge_cands = earliest_among(joint_acts, succs)
+            merge_cands = earliest_among(joint_acts, relations.reachability)
             # if multiple merge acts exist, check if there is a single one with <=> (for PAR acts) or <= (for XOR acts) 
             # existential relationship to branch acts -> This is merge
             for merge_cand in merge_cands:
-                if all(existential[merge_cand][x] in ("<=", "<=>") for x in [act for branch in branches for act in branch]):
+                if all(relations.existential_of(merge_cand, x) in ("<=", "<=>") for x in [act for branch in branches for act in branch]):
                     merge = merge_cand
 
         # Find split act if it exists
@@ -522,7 +605,7 @@ def get_par_blocks(acts, preds, succs, direct_preds, direct_succs, temporal, exi
             len(pred_sets[0]) > 0 
             and all(p == pred_sets[0] for p in pred_sets)):
             # Get all latest preds of each branch
-            start_candidates = [next(iter(latest_among(s, succs))) for s in pred_sets]
+            start_candidates = [next(iter(latest_among(s, relations.reachability))) for s in pred_sets]
             # Latest pred of each branch should be same activitiy if it is the split act
             if len(set(start_candidates)) == 1:
                 start_candidate = start_candidates[0]
@@ -534,8 +617,7 @@ def get_par_blocks(acts, preds, succs, direct_preds, direct_succs, temporal, exi
                 par_branch_acts = {par_act for branch in branches for par_act in branch} - set(nested_xor_acts)
                 # If (<, <=>) relationship doesn't hold for any PAR act, split is incorrect
                 for par_act in par_branch_acts:
-                    if not(temporal[start_candidate][par_act] == "<" 
-                        and existential[start_candidate][par_act] == "<=>"):
+                    if relations.relation(start_candidate, par_act) != ("<", "<=>"):
                         split = None
                         break
 
@@ -543,7 +625,14 @@ def get_par_blocks(acts, preds, succs, direct_preds, direct_succs, temporal, exi
         # reduce acts to only current block we're looking at
         branches_acts = set([act for branch in branches for act in branch])
 
-        nested_XOR_blocks = get_xor_blocks(branches_acts, preds, succs, direct_preds, direct_succs, temporal, existential, always, never)
+        nested_key = ("XOR", frozenset(branches_acts))
+        if nested_key not in nested_cache:
+            # Placeholder while the nested call runs (see get_xor_blocks)
+            nested_cache[nested_key] = []
+            nested_cache[nested_key] = get_xor_blocks(
+                branches_acts, preds, succs, direct_preds, direct_succs, relations, nested_cache
+            )
+        nested_XOR_blocks = nested_cache[nested_key]
 
         block_acts = [tuple(branch) if len(branch) > 1 else branch[0] for branch in branches]
 
@@ -578,11 +667,13 @@ def get_par_blocks(acts, preds, succs, direct_preds, direct_succs, temporal, exi
         block for block in filtered_par_blocks
         if all(activity_counts[act] == 1 for act in block['activities'])
     ]
+    count("par_candidates", len(par_blocks))
+    count("par_candidates_pruned", len(par_blocks) - len(final_par_blocks))
 
     return final_par_blocks
 
 
-def get_optional_blocks(acts, xor_blocks, succs, temporal, existential):
+def get_optional_blocks(acts, xor_blocks, relations):
     """
     Identifies optional blocks in the process model.
 
@@ -595,9 +686,11 @@ def get_optional_blocks(acts, xor_blocks, succs, temporal, existential):
     - The activity z must not already be part of an XOR block.
 
     Steps:
-    1. Iterate over all activity pairs (x, y) that always co-occur in a strict order.
-    2. For each such pair, search for intermediate activity z that fits the optional execution pattern.
-    3. Exclude blocks where x, z, or y are already part of known XOR blocks.
+    1. Build boolean relation masks for (x, y), (x, z) and (z, y), excluding activities that are
+       already part of known XOR blocks.
+    2. Find all pairs (x, y) that always co-occur in a strict order and have at least one
+       intermediate activity z, using a product of the (x, z) and (z, y) masks.
+    3. Collect the candidate (x, z, y) triples for these pairs only.
     4. Deduplicate blocks that share the same z activity by preferring:
         a) The block with the earliest merge.
         b) Among those, the block with the latest split.
@@ -605,60 +698,55 @@ def get_optional_blocks(acts, xor_blocks, succs, temporal, existential):
     Args:
         acts (List[str]): All activities in the process.
         xor_blocks (List[Dict]): Already identified XOR blocks (to avoid overlaps).
-        succs (Dict[str, Set[str]]): Successors of each activity.
-        temporal (Dict[str, Dict[str, str]]): Temporal relations between activities (e.g., "<").
-        existential (Dict[str, Dict[str, str]]): Existential relations between activities (e.g., "<=>", "=>").
+        relations (RelationshipMatrix): Coded temporal (e.g., "<") and existential (e.g., "<=>", "=>")
+            relations between activities, including their reachability index.
 
     Returns:
         List[Dict]: Cleaned list of optional blocks.
     """
-    opt_blocks = []
-    for x in acts:
-        for y in acts:
-            # Check if x and y always co-occur in fixed order
-            if temporal[x][y] == "<" and existential[x][y] == "<=>":
-                for z in acts:
-                    # Check if z fits the optional structure pattern
-                    if ("<" in temporal[x][z]
-                        and existential[x][z] == "<="
-                        and "<" in temporal[z][y]
-                        and existential[z][y] == "=>"):
-
-                        # Flatten XOR blocks for duplicate checking
-                        block_acts_flat = flatten_blocks(xor_blocks)
-
-                        # Ensure x, z, or y are not already part of an XOR block
-                        if not any(act in block_acts_flat for act in [x, y, z]):
-                            opt_blocks.append({
-                                "block_type": "OPT",
-                                "activities": [z],
-                                "nested": [],
-                                "start": x,
-                                "end": y
-                            })
+    acts = list(acts)
+    index = [relations.index[act] for act in acts]
+    temporal = relations.temporal[np.ix_(index, index)]
+    existential = relations.existential[np.ix_(index, index)]
+    precedes = (temporal == T_BEFORE) | (temporal == T_DIRECTLY_BEFORE)
+
+    # Flatten XOR blocks once; x, z, and y must not already be part of an XOR block
+    block_acts_flat = flatten_blocks(xor_blocks)
+    allowed = np.array([act not in block_acts_flat for act in acts], dtype=bool)
+
+    # Boolean relation masks for the three required relations
+    # (x, y): "<" with "<=>", (x, z): "<"/"<d" with "<=", (z, y): "<"/"<d" with "=>"
+    x_before_y = (temporal == T_BEFORE) & (existential == E_CO_OCCURRENCE) & np.outer(allowed, allowed)
+    x_before_z = precedes & (existential == E_IMPLIED_BY) & allowed[np.newaxis, :]
+    z_before_y = precedes & (existential == E_IMPLIES)
+
+    # Number of intermediate activities z for every pair (x, y), only pairs with at least one are candidates
+    n_between = x_before_z.astype(np.float32) @ z_before_y.astype(np.float32)
+    candidate_pairs = np.argwhere(x_before_y & (n_between > 0))
+
+    # Collect candidate blocks in (x, y, z) activity order, grouped by their optional activity z
+    opt_blocks_by_act = {}
+    for x, y in candidate_pairs:
+        for z in np.flatnonzero(x_before_z[x] & z_before_y[:, y]):
+            opt_blocks_by_act.setdefault(acts[z], []).append({
+                "block_type": "OPT",
+                "activities": [acts[z]],
+                "nested": [],
+                "start": acts[x],
+                "end": acts[y]
+            })
 
     opt_blocks_clean = []
-    visited = []
 
-    for i, block_i in enumerate(opt_blocks):
-        # Skip if already handled
-        if i in visited:
-            continue
-
-        opt_blocks_duplicates = [block_i]
-        for j, block_j in enumerate(opt_blocks[i+1:], start=i+1):
-            if block_i["activities"] == block_j["activities"]:
-                opt_blocks_duplicates.append(block_j)
-                visited.append(j)
-
-        # If no opt_blocks_duplicates, keep block_i as-is
+    for opt_blocks_duplicates in opt_blocks_by_act.values():
+        # If no duplicates, keep block as-is
         if len(opt_blocks_duplicates) == 1:
-            opt_blocks_clean.append(block_i)
+            opt_blocks_clean.append(opt_blocks_duplicates[0])
             continue
 
         # Step 1: pick block(s) with earliest merge
         merges = [b["end"] for b in opt_blocks_duplicates]
-        earliest_merges = earliest_among(merges, succs)
+        earliest_merges = earliest_among(merges, relations.reachability)
         candidates = [b for b in opt_blocks_duplicates if b["end"] in earliest_merges]
 
         # If this leads to one single block, we are done
@@ -668,17 +756,21 @@ def get_optional_blocks(acts, xor_blocks, succs, temporal, existential):
 
         # Step 2: among those, pick one with latest split
         splits = [b["start"] for b in candidates]
-        latest_splits = latest_among(splits, succs)
+        latest_splits = latest_among(splits, relations.reachability)
 
         for b in candidates:
             if b["start"] in latest_splits:
                 opt_blocks_clean.append(b)
                 break
 
+    n_candidates = sum(len(duplicates) for duplicates in opt_blocks_by_act.values())
+    count("opt_candidates", n_candidates)
+    count("opt_candidates_pruned", n_candidates - len(opt_blocks_clean))
+
     return opt_blocks_clean
 
 
-def get_sequence_blocks(acts, direct_succs, existential):
+def get_sequence_blocks(acts, direct_succs, relations):
     """
     Identifies sequence blocks in the process model.
 
@@ -699,7 +791,7 @@ def get_sequence_blocks(acts, direct_succs, existential):
     Args:
         acts (List[str]): All activities in the process.
         direct_succs (Dict[str, Set[str]]): Direct successors of each activity.
-        existential (Dict[str, Dict[str, str]]): Existential relations between activities (e.g., "<=>").
+        relations (RelationshipMatrix): Coded existential relations between activities (e.g., "<=>").
 
     Returns:
         List[Dict]: Cleaned list of sequence blocks.
@@ -726,7 +818,7 @@ def get_sequence_blocks(acts, direct_succs, existential):
 
             y = next(iter(next_acts))
             # Check if current and next always co-occur
-            if existential[current][y] == "<=>":
+            if relations.existential_of(current, y) == "<=>":
                 sequence.append(y)
                 current = y
             # Else, end of sequence
@@ -832,126 +924,186 @@ def remove_redundant_blocks(blocks):
     return [block for block, keep_flag in zip(unique_blocks, keep) if keep_flag]
 
 
-def find_best_xor_assignment(branches, preds, existential):
+def sort_branch_by_preds(branch, order):
     """
-    Cleans up a list of branches by removing activities that violate the XOR condition:
-    For every pair of activities across different branches, the existential relationship
-    must be '</=>'. Activities that appear in multiple branches are exempt from this check.
-    
-    The function removes activities from the end of branches until the condition holds.
+    Sort a single branch topologically based on the temporal order given by the reachability index.
+    Activities released at the same time are queued in branch order.
     """
-    # Sort activities in each branch based on control-flow dependencies
-    sorted_branches = [sort_branch_by_preds(branch, preds) for branch in branches]
-
-    def is_valid(assignment):
-        """
-        Checks whether the given branch assignment satisfies the XOR condition:
-        For any pair of activities from different branches, they must be mutually exclusive.
-        Shared activities (i.e., appearing in multiple branches) are ignored.
-        """
-        for i in range(len(assignment)):
-            for j in range(i + 1, len(assignment)):
-                for act_i in assignment[i]:
-                    for act_j in assignment[j]:
-                        # skip comparison of same activity
-                        if act_i == act_j:
-                            continue
-                        if act_i in assignment[j] or act_j in assignment[i]:
-                            continue
-                        if existential[act_i][act_j] != "</=>" or existential[act_j][act_i] != "</=>":
-                            return False
-        return True
-    
-    final_branches = [list(branch) for branch in sorted_branches]
-
-    # Remove invalid activities from each branch until XOR condition holds
-    for branch in final_branches:
-        while not is_valid(final_branches):
-            if not branch:
-                break
-            branch.pop()
-        if not branch:
-            raise ValueError("No valid XOR assignment found for all branches")
-
-    return final_branches
-
-def sort_branch_by_preds(branch, preds):
-    """Sort a single branch based on temporal order given by preds."""
-    known = [act for act in branch if act in preds]
+    known = [act for act in branch if act in order.index]
+    known_set = set(known)
+    position = {act: i for i, act in reversed(list(enumerate(known)))}
 
     # Build a subgraph for the known activities
     graph = defaultdict(set)
     in_degree = defaultdict(int)
     for act in known:
-        for pred in preds[act]:
-            if pred in known:
+        for pred in order.names(order.pred_bits[order.index[act]]):
+            if pred in known_set:
                 graph[pred].add(act)
                 in_degree[act] += 1
 
     # Topological sort
     ordered = []
-    queue = [act for act in known if in_degree[act] == 0]
+    queue = deque(act for act in known if in_degree[act] == 0)
     while queue:
-        node = queue.pop(0)
+        node = queue.popleft()
         ordered.append(node)
-        for neighbor in graph[node]:
+        for neighbor in sorted(graph[node], key=position.get):
             in_degree[neighbor] -= 1
             if in_degree[neighbor] == 0:
                 queue.append(neighbor)
 
-    # Add any remaining nodes in original order
-    remaining = [act for act in known if act not in ordered]
-    ordered.extend(remaining)
+    # Add any remaining nodes (on cycles) in original order
+    placed = set(ordered)
+    ordered.extend(act for act in known if act not in placed)
 
-    return ordered + [act for act in branch if act not in preds]
+    return ordered + [act for act in branch if act not in order.index]
 
-def reduce_branches_to_only_XOR(branches, preds, existential):
+def reduce_branches_to_only_XOR(branches, relations):
     """
-    Applies XOR cleanup to all permutations of branch order and selects the result
-    with the highest total number of activities. This ensures minimal information loss
-    while enforcing XOR constraints.
+    Cleans up a list of branches by removing activities that violate the XOR condition:
+    For every pair of activities across different branches, the existential relationship
+    must be '</=>' in both directions. Activities that appear in multiple branches are exempt
+    from this check.
+
+    Activities are removed from the end of one (temporally sorted) branch until the condition
+    holds. Every branch is tried as the one to trim, and the result with the highest total
+    number of activities is kept (the first one on ties), with the trimmed branch in front.
+    This ensures minimal information loss while enforcing XOR constraints.
+
+    Instead of re-validating all branch pairs after every removal, the number of conflicting
+    activity pairs between the trimmed branch and every other branch is updated incrementally,
+    so the reduction is polynomial in the number of branches and activities.
+
+    Args:
+        branches (List[List[str]]): Branches of the XOR candidate.
+        relations (RelationshipMatrix): Coded relations between activities, including the
+            reachability index used to sort the branches.
+
+    Returns:
+        List[List[str]] or None: Reduced branches, or None if no valid assignment exists.
     """
+    # Sort activities in each branch based on their temporal order
+    sorted_branches = [sort_branch_by_preds(branch, relations.reachability) for branch in branches]
+
+    # An empty branch can never be part of a valid XOR assignment
+    if not all(sorted_branches):
+        return None
+
+    exclusive = relations.mutually_exclusive_mask
+    branch_sets = [set(branch) for branch in sorted_branches]
+
+    # Number of conflicting activity pairs between each pair of branches
+    conflicts = [[0] * len(branch_sets) for _ in branch_sets]
+    for i, j in combinations(range(len(branch_sets)), 2):
+        conflicts[i][j] = conflicts[j][i] = count_xor_conflicts(
+            branch_sets[i], branch_sets[j], exclusive, relations.index
+        )
+    total_conflicts = sum(map(sum, conflicts)) // 2
+    total_activities = sum(len(branch) for branch in sorted_branches)
+
     best_result = None
     max_total_activities = -1
 
-    for perm in permutations(branches):
-        try:
-            reduced = find_best_xor_assignment(perm, preds, existential)
-            total_activities = sum(len(branch) for branch in reduced)
-            if total_activities > max_total_activities:
-                max_total_activities = total_activities
-                best_result = reduced
-        except ValueError:
+    for k, branch in enumerate(sorted_branches):
+        # Conflicts between the other branches can't be resolved by trimming this branch
+        if total_conflicts - sum(conflicts[k]) > 0:
             continue
 
+        count("xor_branch_trims")
+        reduced = trim_branch_to_xor(k, sorted_branches, branch_sets, list(conflicts[k]), exclusive, relations.index)
+        if reduced is None:
+            continue
+
+        n_activities = total_activities - len(branch) + len(reduced)
+        if n_activities > max_total_activities:
+            max_total_activities = n_activities
+            best_result = [reduced] + [list(other) for j, other in enumerate(sorted_branches) if j != k]
+
     return best_result
 
-def append_branch_succs(start, succs, temporal, existential, type):
+
+def count_xor_conflicts(acts_a, acts_b, exclusive, index):
+    """
+    Counts activity pairs across two branches that are not mutually exclusive.
+    Activities contained in both branches are ignored.
+    """
+    only_a = [index[act] for act in acts_a - acts_b]
+    only_b = [index[act] for act in acts_b - acts_a]
+    if not only_a or not only_b:
+        return 0
+    return len(only_a) * len(only_b) - int(exclusive[np.ix_(only_a, only_b)].sum())
+
+
+def trim_branch_to_xor(k, branches, branch_sets, conflicts, exclusive, index):
+    """
+    Removes activities from the end of branch k until it has no XOR conflicts with the other branches.
+
+    Args:
+        k (int): Index of the branch to trim.
+        branches (List[List[str]]): Sorted branches.
+        branch_sets (List[Set[str]]): Activity sets of the branches.
+        conflicts (List[int]): Current number of conflicting pairs between branch k and every
+            other branch, updated in place.
+        exclusive (np.ndarray): Mask of mutually exclusive activity pairs.
+        index (Dict[str, int]): Activity index of the relationship matrix.
+
+    Returns:
+        List[str] or None: Trimmed branch, or None if the branch had to be removed completely.
+    """
+    branch = list(branches[k])
+    occurrences = Counter(branch)
+    own = set(branch_sets[k])
+
+    while any(conflicts):
+        if not branch:
+            return None
+        act = branch.pop()
+        occurrences[act] -= 1
+        if occurrences[act]:
+            continue
+
+        # The activity leaves the branch, update the conflicts with every other branch
+        own.discard(act)
+        i = index[act]
+        for j, other in enumerate(branch_sets):
+            if j == k:
+                continue
+            if act in other:
+                # No longer shared: now conflicts with the activities only in branch k
+                only_own = [index[x] for x in own - other]
+                conflicts[j] += len(only_own) - int(exclusive[i, only_own].sum())
+            else:
+                # Its conflicts with the activities only in the other branch disappear
+                only_other = [index[y] for y in other - own]
+                conflicts[j] -= len(only_other) - int(exclusive[i, only_other].sum())
+
+    return branch or None
+
+def append_branch_succs(start, relations, type):
     # chain of sequences
     xor_succs = [start]
-    # starting activitiy
-    acts_to_explore = [start]
-    explored_acts = []
+    # acts already in the chain, for constant time membership checks
+    seen = 1 << relations.index[start]
+    # starting activitiy, successors are explored in breadth-first order
+    acts_to_explore = deque([start])
 
     if type == "XOR":
-        allowed_temp = ["<", "<d"]
-        allowed_exist = ["<=", "=>", "<=>"]
+        allowed_temp = (T_BEFORE, T_DIRECTLY_BEFORE)
+        allowed_exist = (E_IMPLIED_BY, E_IMPLIES, E_CO_OCCURRENCE)
     elif type == "PAR":
-        allowed_temp = ["<"]
-        allowed_exist = ["<=", "<=>"]
+        allowed_temp = (T_BEFORE,)
+        allowed_exist = (E_IMPLIED_BY, E_CO_OCCURRENCE)
     else:
         raise RuntimeError(f"Type {type} unknown for appending branch successors")
 
-    while len(acts_to_explore) > 0:
-        for act in acts_to_explore.copy():
-            for x in succs[act]:
-                # identify next sequence activity
-                if temporal[act][x] in allowed_temp and existential[act][x] in allowed_exist:
-                    if not x in acts_to_explore and not x in explored_acts:
-                        acts_to_explore.append(x)
-                    if not x in xor_succs:
-                        xor_succs.append(x)
-            explored_acts.append(act)
-                    
-        acts_to_explore.remove(act)
-    return xor_succs
\ No newline at end of file
+    while acts_to_explore:
+        act = acts_to_explore.popleft()
+        # identify next sequence activities from the neighbour index
+        next_acts = relations.neighbor_bits(act, allowed_temp, allowed_exist) & ~seen
+        seen |= next_acts
+        for j in iter_bits(next_acts):
+            x = relations.activities[j]
+            xor_succs.append(x)
+            acts_to_explore.append(x)
+    return xor_succs
@@ -0,0 +1,399 @@
+import argparse
+import csv
+import inspect
+import os
+import sys
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+import numpy as np
+from tabulate import tabulate
+
+from classify_process import input_files, parse_filename, pipeline_stages
+from constants import class_score_thresholds
+from score_process import (
+    compute_base_score,
+    compute_refinement_weights,
+    refine_out_to_out,
+    refine_out_to_sb,
+    refine_sb_to_sb,
+)
+from stage_cache import DEFAULT_MAX_BYTES, StageCache
+
+# Parameters of compute_base_score and compute_refinement_weights
+BASE_SCORE_PARAMETERS = ("entropy_penalty", "outsider_penalty_exponent")
+WEIGHT_PARAMETERS = ("pair_sum", "imbalance_gamma", "bridge_base", "bridge_strength", "bridge_gamma")
+# Class score thresholds, named like the keys of constants.class_score_thresholds
+THRESHOLD_PARAMETERS = ("unstructured", "looselyStructured", "semiStructured")
+# All calibrated parameters, in the order of the axes of Calibration.correct
+PARAMETERS = BASE_SCORE_PARAMETERS + WEIGHT_PARAMETERS + THRESHOLD_PARAMETERS
+
+# Class labels in the order of score_to_class, each class lies below the threshold of the same name
+CLASSES = THRESHOLD_PARAMETERS + ("structured",)
+
+
+def current_parameters():
+    """
+    Parameter values used by classify_process: the defaults of compute_base_score and
+    compute_refinement_weights and the thresholds from constants.py.
+
+    Returns:
+        Dict[str, float]: Value per parameter (see PARAMETERS).
+    """
+    values = {}
+    for func, names in ((compute_base_score, BASE_SCORE_PARAMETERS), (compute_refinement_weights, WEIGHT_PARAMETERS)):
+        signature = inspect.signature(func)
+        values.update((name, signature.parameters[name].default) for name in names)
+    values.update((name, class_score_thresholds[name]) for name in THRESHOLD_PARAMETERS)
+    return values
+
+
+class LogTerms:
+    """
+    Parameter-independent parts of the structuredness score of one log.
+
+    Block detection, super-blocks and the unweighted refinement averages do not depend on any
+    calibrated parameter, so they are computed once (see `prepare_log`). The score for other
+    parameters only combines them anew.
+
+    Attributes:
+        log (str): Name of the log.
+        class_real (str): Real class from the filename.
+        activities (set): All activities of the process.
+        super_blocks (List[Dict]): Super-blocks as returned by build_super_blocks.
+        refinements (Dict[str, float]): Unweighted average of every refinement term that
+            score_process computes for the log ("sb_sb", "out_sb", "out_out", in this order).
+    """
+
+    def __init__(self, log, class_real, activities, super_blocks, refinements):
+        self.log = log
+        self.class_real = class_real
+        self.activities = activities
+        self.super_blocks = super_blocks
+        self.refinements = refinements
+
+    def score(self, parameters):
+        """
+        Final structuredness score, with the same arithmetic as score_process.
+
+        Args:
+            parameters (Dict[str, float or np.ndarray]): Value of every parameter in
+                BASE_SCORE_PARAMETERS and WEIGHT_PARAMETERS. Arrays are broadcast against each
+                other, so a whole grid is scored at once.
+
+        Returns:
+            float or np.ndarray: Final score per parameter combination.
+        """
+        base_score, _, _ = compute_base_score(
+            self.super_blocks, self.activities, *(parameters[name] for name in BASE_SCORE_PARAMETERS)
+        )
+        weights = compute_refinement_weights(
+            self.activities, self.super_blocks, *(parameters[name] for name in WEIGHT_PARAMETERS)
+        )
+        weights = dict(zip(("sb_sb", "out_sb", "out_out"), weights))
+
+        refinement = 0
+        for term, average in self.refinements.items():
+            refinement = refinement + weights[term] * average
+        return base_score + refinement
+
+
+def prepare_log(path, cache=None):
+    """
+    Detect the blocks and super-blocks of a log and compute its refinement averages.
+
+    Args:
+        path (str): Input file named "<log>_<class>.json" (or any format of classify_process).
+        cache (StageCache, optional): Stage cache for the matrix, blocks and super-blocks.
+
+    Returns:
+        LogTerms: Parameter-independent parts of the score.
+    """
+    parsed = parse_filename(path)
+    if parsed is None:
+        raise ValueError(f"cannot parse '<log>_<class>' from '{os.path.basename(path)}'")
+    log, class_real = parsed
+
+    relationships, _, super_blocks = pipeline_stages(path, cache)
+    relations = relationships()
+    super_blocks = super_blocks()
+    all_acts = set(relations.activities)
+    _, outsiders, _ = compute_base_score(super_blocks, all_acts)
+
+    # Same terms as in score_process
+    refinements = {}
+    if len(super_blocks) > 1:
+        refinements["sb_sb"] = refine_sb_to_sb(relations, super_blocks, False)
+    if len(super_blocks) >= 1 and len(outsiders) >= 1:
+        refinements["out_sb"] = refine_out_to_sb(outsiders, relations, super_blocks, False)
+    if len(outsiders) > 1:
+        refinements["out_out"] = refine_out_to_out(outsiders, relations, False)
+
+    return LogTerms(log, class_real, all_acts, super_blocks, refinements)
+
+
+def _prepare_isolated(path, cache=None):
+    # Unknown relations are reported by classify_process, they would only repeat here
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        try:
+            return prepare_log(path, cache), None
+        except Exception as e:
+            return None, f"Failed to prepare '{os.path.basename(path)}': {e}"
+
+
+def prepare_logs(files, jobs=1, cache=None):
+    """
+    Prepare several logs, either sequentially or spread over a process pool with `jobs` workers.
+
+    Args:
+        files (List[str]): Input files.
+        jobs (int): Number of worker processes, 0 uses all available CPUs.
+        cache (StageCache, optional): Stage cache for the matrix, blocks and super-blocks.
+
+    Returns:
+        Tuple[List[LogTerms], List[str]]: Prepared logs in input order and error messages
+            of the files that failed.
+    """
+    if jobs <= 0:
+        jobs = os.cpu_count() or 1
+    if jobs > 1 and len(files) > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            results = list(pool.map(_prepare_isolated, files, repeat(cache), chunksize=max(1, len(files) // (jobs * 4))))
+    else:
+        results = [_prepare_isolated(path, cache) for path in files]
+
+    terms = [result for result, _ in results if result is not None]
+    errors = [error for _, error in results if error is not None]
+    return terms, errors
+
+
+def parameter_grid(grid=None):
+    """
+    Complete a parameter grid with the current value of every parameter it does not list.
+
+    Args:
+        grid (Dict[str, Iterable[float]], optional): Values per parameter.
+
+    Returns:
+        Dict[str, np.ndarray]: Sorted, distinct values of every parameter in PARAMETERS.
+    """
+    grid = dict(grid or {})
+    unknown = set(grid) - set(PARAMETERS)
+    if unknown:
+        raise ValueError(f"Unknown parameters {sorted(unknown)}, expected some of {PARAMETERS}")
+    current = current_parameters()
+    values = {}
+    for name in PARAMETERS:
+        axis = np.unique(np.asarray(grid.get(name, [current[name]]), dtype=float))
+        if axis.size == 0:
+            raise ValueError(f"No values for parameter '{name}'")
+        values[name] = axis
+    return values
+
+
+class Calibration:
+    """
+    Classification accuracy over a parameter grid (see `calibrate`).
+
+    Attributes:
+        grid (Dict[str, np.ndarray]): Values of every parameter in PARAMETERS.
+        correct (np.ndarray): Number of correctly classified logs, one axis per parameter.
+        n_logs (int): Number of logs the accuracy refers to.
+    """
+
+    def __init__(self, grid, correct, n_logs):
+        self.grid = grid
+        self.correct = correct
+        self.n_logs = n_logs
+
+    @property
+    def accuracy(self):
+        """Fraction of correctly classified logs per grid point, same shape as `correct`."""
+        return self.correct / self.n_logs if self.n_logs else np.zeros(self.correct.shape)
+
+    def parameters(self, index):
+        """Parameter values of a grid point, given as flat index or index tuple."""
+        if np.isscalar(index):
+            index = np.unravel_index(index, self.correct.shape)
+        return {name: float(self.grid[name][i]) for name, i in zip(PARAMETERS, index)}
+
+    def best(self, n=10):
+        """
+        Grid points with the highest accuracy, ties in grid order.
+
+        Returns:
+            List[Tuple[Dict[str, float], int]]: Parameters and number of correct logs.
+        """
+        flat = self.correct.ravel()
+        n = min(n, flat.size)
+        # Partition first, sorting the whole grid is not needed for the top entries
+        candidates = np.argpartition(-flat, n - 1)[:n] if n < flat.size else np.arange(flat.size)
+        cutoff = flat[candidates].min()
+        candidates = np.flatnonzero(flat >= cutoff)
+        top = candidates[np.argsort(-flat[candidates], kind="stable")][:n]
+        return [(self.parameters(int(i)), int(flat[i])) for i in top]
+
+    def rows(self):
+        """Iterate over all grid points as (parameter values..., correct, accuracy)."""
+        mesh = np.meshgrid(*(self.grid[name] for name in PARAMETERS), indexing="ij")
+        columns = [values.ravel().tolist() for values in mesh + [self.correct, self.accuracy]]
+        return zip(*columns)
+
+
+def calibrate(terms, grid=None):
+    """
+    Evaluate the classification accuracy for every point of a parameter grid.
+
+    Each log is scored once for the whole grid: every parameter varies along its own array axis
+    and the score functions broadcast over them. Its class is then compared with the real class
+    for every combination of thresholds at once, so the cost per log is one vectorized pass over
+    the grid. Logs whose real class is not one of CLASSES count as misclassified. Parameter
+    combinations without a real-valued score (a negative imbalance raised to a non-integer
+    `imbalance_gamma`) count as misclassified as well.
+
+    Args:
+        terms (List[LogTerms]): Prepared logs (see `prepare_logs`).
+        grid (Dict[str, Iterable[float]], optional): Values per parameter, parameters not
+            listed keep their current value (see `parameter_grid`).
+
+    Returns:
+        Calibration: Number of correct logs per grid point.
+    """
+    values = parameter_grid(grid)
+    ndim = len(PARAMETERS)
+    # Open mesh, parameter i varies along axis i
+    axes = {
+        name: values[name].reshape([-1 if i == axis else 1 for i in range(ndim)])
+        for axis, name in enumerate(PARAMETERS)
+    }
+    thresholds = [axes[name] for name in THRESHOLD_PARAMETERS]
+
+    correct = np.zeros([len(values[name]) for name in PARAMETERS], dtype=np.int32)
+    with np.errstate(invalid="ignore"):
+        for log in terms:
+            if log.class_real not in CLASSES:
+                continue
+            label = CLASSES.index(log.class_real)
+            score = np.asarray(log.score(axes), dtype=float)
+
+            # score_to_class yields the label iff the score reaches every lower threshold
+            # and stays below its own one; NaN scores fail every comparison
+            hit = True
+            for k, threshold in enumerate(thresholds[:label + 1]):
+                hit = hit & ((score >= threshold) if k < label else (score < threshold))
+            correct += hit
+
+    return Calibration(values, correct, len(terms))
+
+
+def parse_grid_spec(spec):
+    """
+    Parse a grid specification "name=v1,v2,..." or "name=start:stop:num" (evenly spaced, inclusive).
+
+    Returns:
+        Tuple[str, np.ndarray]: Parameter name and values.
+    """
+    name, sep, values = spec.partition("=")
+    name = name.strip()
+    if not sep or name not in PARAMETERS:
+        raise argparse.ArgumentTypeError(f"expected '<name>=<values>' with a name out of {', '.join(PARAMETERS)}")
+    try:
+        if ":" in values:
+            start, stop, num = values.split(":")
+            return name, np.linspace(float(start), float(stop), int(num))
+        return name, np.array([float(v) for v in values.split(",")])
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid values '{values}' for '{name}'")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Evaluate the classification accuracy over a grid of scoring parameters and class thresholds."
+    )
+    parser.add_argument(
+        "--dir",
+        dest="data_dirs",
+        nargs="+",
+        default=["data_development/data"],
+        help="Directories containing labelled input files '<log>_<class>.json' (default: data_development/data).",
+    )
+    parser.add_argument(
+        "--grid",
+        type=parse_grid_spec,
+        action="append",
+        default=[],
+        metavar="NAME=VALUES",
+        help="Values of one parameter, as list 'v1,v2,...' or range 'start:stop:num'. Can be repeated; "
+             f"parameters not given keep their current value. Parameters: {', '.join(PARAMETERS)}.",
+    )
+    parser.add_argument("--top", type=int, default=10, help="Number of best grid points to print (default: 10).")
+    parser.add_argument("--out", help="Write the accuracy of every grid point to this CSV file.")
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="Number of worker processes used to detect the blocks of the logs (default: 1, 0 = all CPUs).",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        default=".stage_cache",
+        help="Directory of the on-disk cache for intermediate stage results (default: .stage_cache).",
+    )
+    parser.add_argument(
+        "--cache-max-mb",
+        type=float,
+        default=DEFAULT_MAX_BYTES / (1024 * 1024),
+        help="Size bound of the cache in MB; least recently used entries are evicted beyond it (default: 512).",
+    )
+    parser.add_argument("--no-cache", action="store_true", help="Disable the stage cache.")
+    args = parser.parse_args()
+
+    cache = None
+    if not args.no_cache:
+        cache = StageCache(args.cache_dir, max_bytes=int(args.cache_max_mb * 1024 * 1024))
+
+    files = [path for data_dir in args.data_dirs for path in input_files(data_dir)]
+    start = time.perf_counter()
+    terms, errors = prepare_logs(files, jobs=args.jobs, cache=cache)
+    prepared = time.perf_counter()
+    for error in errors:
+        print(error, file=sys.stderr)
+    if cache is not None:
+        cache.evict()
+
+    grid = {}
+    for name, values in args.grid:
+        grid[name] = np.concatenate([grid.get(name, []), values])
+    result = calibrate(terms, grid)
+    current = calibrate(terms)
+    done = time.perf_counter()
+
+    print(
+        f"{len(terms)} logs prepared in {prepared - start:.2f}s, "
+        f"{result.correct.size} grid points evaluated in {done - prepared:.2f}s"
+    )
+    print(f"Current parameters: {current.correct.item()}/{len(terms)} correct\n")
+    print(
+        tabulate(
+            [
+                [params[name] for name in PARAMETERS] + [n_correct, f"{n_correct / max(len(terms), 1):.3f}"]
+                for params, n_correct in result.best(args.top)
+            ],
+            headers=list(PARAMETERS) + ["Correct", "Accuracy"],
+            tablefmt="grid",
+        )
+    )
+
+    if args.out:
+        with open(args.out, "w", newline="", encoding="utf-8") as fh:
+            writer = csv.writer(fh)
+            writer.writerow(list(PARAMETERS) + ["correct", "accuracy"])
+            writer.writerows(result.rows())
+        print(f"✅ Accuracy of every grid point written to: {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,317 @@
 import argparse
+import functools
+import io
+import json
 import os
 import pprint
+import sys
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stderr, redirect_stdout
+from itertools import repeat
 from tabulate import tabulate
 
 from utils import load_relationships
+from matrix_formats import BINARY_SUFFIX, YAML_SUFFIXES, is_binary_matrix
 from block_detection import detect_blocks, build_super_blocks
 from score_process import score_process
 from constants import class_score_thresholds
+from stage_cache import DEFAULT_MAX_BYTES, NullCache, StageCache
+from profiling import profiling, timed
 
+# Pipeline stages of run_pipeline, in execution order
+PIPELINE_STAGES = ("load", "detect_blocks", "build_super_blocks", "score_process")
 
-def classify_process(data_dir, verbose):
+# Matrix formats in order of preference when a log is present in several of them, converted
+# files (binary, JSON) are read faster than the AR-matrix YAML exports they were made from
+FORMAT_PREFERENCE = (BINARY_SUFFIX, ".json") + YAML_SUFFIXES
+
+
+def _timed_call(stage, func, *args, **kwargs):
+    # Evaluate the arguments first, so that earlier stages are not timed as part of this one
+    with timed(stage):
+        return func(*args, **kwargs)
+
+
+def pipeline_stages(path, cache=None, keys=None):
+    """
+    Lazy loaders of the matrix, block and super-block stages of a single file.
+
+    Each stage is evaluated at most once, and only if it is not taken from `cache`.
+
+    Args:
+        path (str): Path to the input file.
+        cache (StageCache, optional): Stage cache to read from and write to.
+        keys (Dict[str, str], optional): Stage keys of the file as returned by
+            `cache.stage_keys`, computed here if not given (hashes the file content).
+
+    Returns:
+        tuple: (relationships, blocks, super_blocks), callables returning the respective
+            stage result.
+    """
+    cache = cache if cache is not None else NullCache()
+    keys = keys if keys is not None else cache.stage_keys(path)
+
+    # Each stage is evaluated at most once and only if a later stage misses the cache
+    @functools.cache
+    def relationships():
+        # Load pairwise relationship data (temporal + existential).
+        # Binary matrices are memory-mapped directly, which is cheaper than unpickling a copy
+        if is_binary_matrix(path):
+            with timed("load"):
+                return load_relationships(path)
+        return cache.get_or_compute("matrix", keys["matrix"], lambda: _timed_call("load", load_relationships, path))
+
+    @functools.cache
+    def blocks():
+        # Detect blocks
+        return cache.get_or_compute(
+            "blocks", keys["blocks"], lambda: _timed_call("detect_blocks", detect_blocks, relationships())
+        )
+
+    @functools.cache
+    def super_blocks():
+        # Combine blocks into super-blocks
+        return cache.get_or_compute(
+            "super_blocks", keys["super_blocks"],
+            lambda: _timed_call("build_super_blocks", build_super_blocks, blocks(), relationships())
+        )
+
+    return relationships, blocks, super_blocks
+
+
+def run_pipeline(path, verbose=False, cache=None):
+    """
+    Runs load → detect_blocks → build_super_blocks → score_process for a single file.
+
+    Stage results are taken from `cache` where possible, so a file whose content did not
+    change skips block detection, and scoring is only repeated if constants.py changed.
+    The cached score is not used in verbose mode, as the verbose output is produced while
+    scoring.
+
+    Args:
+        path (str): Path to the input file.
+        verbose (bool): If True, enable verbose mode in score_process.
+        cache (StageCache, optional): Stage cache to read from and write to.
+
+    Returns:
+        tuple: (blocks, super_blocks, final_score, details). blocks and super_blocks are
+            callables returning the respective stage result, they are only evaluated
+            (loaded or computed) when called.
+    """
+    cache = cache if cache is not None else NullCache()
+    keys = cache.stage_keys(path)
+    relationships, blocks, super_blocks = pipeline_stages(path, cache, keys)
+
+    # Score the process to get the final score and details
+    if verbose:
+        score = _timed_call("score_process", score_process, path, relationships(), super_blocks(), verbose=True)
+        cache.put("score", keys["score"], score)
+    else:
+        score = cache.get_or_compute(
+            "score", keys["score"],
+            lambda: _timed_call("score_process", score_process, path, relationships(), super_blocks())
+        )
+    final_score, details = score
+
+    return blocks, super_blocks, final_score, details
+
+
+def score_to_class(final_score):
+    """
+    Map a structuredness score to its class label using the thresholds from constants.py.
+
+    Args:
+        final_score (float): Final structuredness score.
+
+    Returns:
+        str: "unstructured", "looselyStructured", "semiStructured" or "structured".
+    """
+    if final_score < class_score_thresholds["unstructured"]:
+        return "unstructured"
+    elif final_score < class_score_thresholds["looselyStructured"]:
+        return "looselyStructured"
+    elif final_score < class_score_thresholds["semiStructured"]:
+        return "semiStructured"
+    return "structured"
+
+
+def parse_filename(path):
+    """
+    Split the name of an input file "<log>_<class>.json" into log name and real class.
+
+    Args:
+        path (str): Path to the input file (any extension).
+
+    Returns:
+        tuple or None: (log, class_real), or None if the filename does not follow the
+            naming convention.
+    """
+    stem, _ = os.path.splitext(os.path.basename(path))
+    parts = stem.split("_")
+    if len(parts) < 2:
+        return None
+    return "_".join(parts[:-1]), parts[-1]
+
+
+def classify_file(path, verbose, cache=None):
+    """
+    Runs the classification pipeline for a single input file.
+
+    Args:
+        path (str): Path to the input file, named "<log>_<class>.json" (or .yaml/.yml, .relm).
+        verbose (bool): If True, print intermediate debug information and enable
+            verbose mode in score_process.
+        cache (StageCache, optional): Stage cache for intermediate results.
+
+    Returns:
+        list or None: Summary row for this file, or None if the filename does not
+            follow the expected naming convention.
+    """
+    pp = pprint.PrettyPrinter()
+
+    parsed = parse_filename(path)
+    if parsed is None:
+        # Skip files that do not follow the expected naming convention
+        print(f"Skipping '{os.path.basename(path)}' (cannot parse '<log>_<class>')")
+        return None
+    log, class_real = parsed
+
+    # Load, detect blocks and super-blocks and score the process (cached stages are reused)
+    blocks, super_blocks, final_score, details = run_pipeline(path, verbose=verbose, cache=cache)
+    n_sbs_str, block_acts, outsiders, base_score, sb_sb_ref, out_sb_ref, out_out_ref, refinement = details
+
+    # Map score to classification label using thresholds from constants.py
+    class_calc = score_to_class(final_score)
+
+    # Format insiders/outsiders for table output
+    insider_str = ",".join(sorted(block_acts)) if block_acts else "-"
+    outsider_str = ",".join(sorted(outsiders)) if outsiders else "-"
+
+    # Summary row for this file
+    row = [
+        log,
+        n_sbs_str,
+        insider_str,
+        outsider_str,
+        round(base_score, 3) if base_score is not None else None,
+        round(sb_sb_ref, 3) if sb_sb_ref is not None else None,
+        round(out_sb_ref, 3) if out_sb_ref is not None else None,
+        round(out_out_ref, 3) if out_out_ref is not None else None,
+        round(refinement, 3) if refinement is not None else None,
+        round(final_score, 3) if final_score is not None else None,
+        class_real,
+        class_calc,
+        "✅" if class_real == class_calc else "❌",
+    ]
+
+    # Optional verbose debug output
+    if verbose:
+        print(f"Log: {log}")
+        print("  " + "-" * 80)
+        print("  Blocks:")
+        formatted = pp.pformat(blocks())
+        print("\n".join("    " + line for line in formatted.splitlines()))
+        print("  " + "-" * 80)
+        print("  Super Blocks:")
+        formatted = pp.pformat(super_blocks())
+        print("\n".join("    " + line for line in formatted.splitlines()))
+        print("=" * 80)
+
+    return row
+
+
+def _classify_file_isolated(path, verbose, cache=None, profile=False):
+    """
+    Runs classify_file with its console output captured and errors isolated.
+
+    Output is gathered per file so that parallel workers do not interleave their
+    prints, and a failing file does not abort the whole run.
+
+    Returns:
+        tuple: (row or None, captured stdout, captured stderr, profile record or None)
+    """
+    out, err = io.StringIO(), io.StringIO()
+    row = None
+    record = None
+    with redirect_stdout(out), redirect_stderr(err), warnings.catch_warnings(), \
+            profiling(enabled=profile) as file_profile:
+        # Reset the warning registry so that each file reports its own warnings,
+        # independent of which files a worker has processed before
+        warnings.simplefilter("default")
+        start = time.perf_counter()
+        try:
+            row = classify_file(path, verbose, cache)
+        except Exception as e:
+            print(f"Failed to classify '{os.path.basename(path)}': {e}", file=sys.stderr)
+        if file_profile is not None:
+            record = {
+                "file": os.path.basename(path),
+                "ok": row is not None,
+                "seconds": round(time.perf_counter() - start, 6),
+                # Stages whose result was taken from the stage cache
+                "cached": [stage for stage in PIPELINE_STAGES if stage not in file_profile.seconds],
+                **file_profile.to_dict(),
+            }
+    return row, out.getvalue(), err.getvalue(), record
+
+
+def _run_files(files, verbose, jobs, cache, profile=False):
+    """
+    Yields (row, stdout, stderr, profile record) for each file in input order, either
+    sequentially or spread over a process pool with `jobs` workers.
+    """
+    if jobs > 1 and len(files) > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            # map() yields results in submission order, which keeps the output deterministic
+            chunksize = max(1, len(files) // (jobs * 4))
+            yield from pool.map(
+                _classify_file_isolated, files, repeat(verbose), repeat(cache), repeat(profile),
+                chunksize=chunksize
+            )
+    else:
+        for path in files:
+            yield _classify_file_isolated(path, verbose, cache, profile)
+
+
+def input_files(data_dir):
+    """
+    Input files of a directory, sorted by name.
+
+    Subfolders and hidden files (such as conversion manifests) are ignored. A log that is
+    present in several matrix formats (e.g., a YAML export next to its converted JSON file)
+    is classified once, from the first format in FORMAT_PREFERENCE.
+
+    Args:
+        data_dir (str): Directory containing the input files.
+
+    Returns:
+        List[str]: Paths of the input files.
+    """
+    files = [
+        f for f in os.listdir(data_dir)
+        if os.path.isfile(os.path.join(data_dir, f)) and not f.startswith(".")
+    ]
+
+    # Preferred matrix file of each log
+    preferred = {}
+    for f in files:
+        stem, suffix = os.path.splitext(f)
+        if suffix.lower() in FORMAT_PREFERENCE:
+            rank = FORMAT_PREFERENCE.index(suffix.lower())
+            if stem not in preferred or rank < preferred[stem][0]:
+                preferred[stem] = (rank, f)
+
+    return sorted(
+        os.path.join(data_dir, f)
+        for f in files
+        if os.path.splitext(f)[1].lower() not in FORMAT_PREFERENCE
+        or preferred[os.path.splitext(f)[0]][1] == f
+    )
+
+
+def classify_process(data_dir, verbose, jobs=1, cache=None, profile=None):
     """
     Runs the process classification pipeline over all files in a directory.
 
@@ -20,93 +322,42 @@ def classify_process(data_dir, verbose):
     Args:
         data_dir (str): Directory containing the input files for classification.
             Filenames are expected to follow the pattern "<log>_<class>.json",
-            e.g., "Order_Processing_structured.json". The function will process
-            all regular files in this directory.
+            e.g., "Order_Processing_structured.json". AR-matrix YAML exports
+            ("<log>_<class>.yaml") and binary matrices are accepted as well. The
+            function will process all regular, non-hidden files in this directory,
+            each log once if it is present in several formats (see input_files).
         verbose (bool): If True, print intermediate debug information and enable
             verbose mode in score_process.
+        jobs (int): Number of worker processes. Files are spread over a process
+            pool if jobs > 1, 0 uses all available CPUs. The order of the rows and
+            of the per-file output is the same as for a sequential run.
+        cache (StageCache, optional): On-disk cache of the intermediate stage results.
+            If given, least recently used entries are evicted after the run.
+        profile (list, optional): If given, one record per file with the wall time per
+            stage and the work counters (see profiling.Profile) is appended to it.
 
     Returns:
         list: A list of rows summarizing results across all files.
     """
-    # Collect files from directory (ignore subfolders)
-    files = sorted(
-        os.path.join(data_dir, f)
-        for f in os.listdir(data_dir)
-        if os.path.isfile(os.path.join(data_dir, f))
-    )
+    files = input_files(data_dir)
+
+    if jobs <= 0:
+        jobs = os.cpu_count() or 1
 
     summary_rows = []
-    pp = pprint.PrettyPrinter()
 
-    for path in files:
-        # Parse filename: "<log>_<class>.json"
-        filename = os.path.basename(path)
-        stem, _ = os.path.splitext(filename)
-        parts = stem.split("_")
-        if len(parts) < 2:
-            # Skip files that do not follow the expected naming convention
-            print(f"Skipping '{filename}' (cannot parse '<log>_<class>')")
-            continue
-        log = "_".join(parts[:-1])
-        class_real = parts[-1]
-
-        # Load pairwise relationship data (temporal + existential)
-        relationships = load_relationships(path)
-
-        # Detect blocks and combine them into super-blocks
-        blocks = detect_blocks(relationships)
-        super_blocks = build_super_blocks(blocks, relationships)
-
-        # Score the process to get the final score and details
-        final_score, details = score_process(
-            path, relationships, super_blocks, verbose=verbose
-        )
-        n_sbs_str, block_acts, outsiders, base_score, sb_sb_ref, out_sb_ref, out_out_ref, refinement = details
-
-        # Map score to classification label using thresholds from constants.py
-        if final_score < class_score_thresholds["unstructured"]:
-            class_calc = "unstructured"
-        elif final_score < class_score_thresholds["looselyStructured"]:
-            class_calc = "looselyStructured"
-        elif final_score < class_score_thresholds["semiStructured"]:
-            class_calc = "semiStructured"
-        else:
-            class_calc = "structured"
-
-        # Format insiders/outsiders for table output
-        insider_str = ",".join(sorted(block_acts)) if block_acts else "-"
-        outsider_str = ",".join(sorted(outsiders)) if outsiders else "-"
-
-        # Append results to summary
-        row = [
-            log,
-            n_sbs_str,
-            insider_str,
-            outsider_str,
-            round(base_score, 3) if base_score is not None else None,
-            round(sb_sb_ref, 3) if sb_sb_ref is not None else None,
-            round(out_sb_ref, 3) if out_sb_ref is not None else None,
-            round(out_out_ref, 3) if out_out_ref is not None else None,
-            round(refinement, 3) if refinement is not None else None,
-            round(final_score, 3) if final_score is not None else None,
-            class_real,
-            class_calc,
-            "✅" if class_real == class_calc else "❌",
-        ]
-        summary_rows.append(row)
-
-        # Optional verbose debug output
-        if verbose:
-            print(f"Log: {log}")
-            print("  " + "-" * 80)
-            print("  Blocks:")
-            formatted = pp.pformat(blocks)
-            print("\n".join("    " + line for line in formatted.splitlines()))
-            print("  " + "-" * 80)
-            print("  Super Blocks:")
-            formatted = pp.pformat(super_blocks)
-            print("\n".join("    " + line for line in formatted.splitlines()))
-            print("=" * 80)
+    for row, out, err, record in _run_files(files, verbose, jobs, cache, profile is not None):
+        # Replay the captured output of each file in input order
+        sys.stdout.write(out)
+        sys.stderr.write(err)
+        if row is not None:
+            summary_rows.append(row)
+        if record is not None:
+            profile.append(record)
+
+    # Keep the cache within its size bound
+    if cache is not None:
+        cache.evict()
 
     return summary_rows
 
@@ -127,10 +378,48 @@ def main():
         action="store_true",
         help="Enable verbose debug output and verbose mode in score_process.",
     )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="Number of worker processes used to classify files in parallel (default: 1, 0 = all CPUs).",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        default=".stage_cache",
+        help="Directory of the on-disk cache for intermediate stage results (default: .stage_cache).",
+    )
+    parser.add_argument(
+        "--cache-max-mb",
+        type=float,
+        default=DEFAULT_MAX_BYTES / (1024 * 1024),
+        help="Size bound of the cache in MB; least recently used entries are evicted beyond it (default: 512).",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Disable the stage cache and recompute every stage.",
+    )
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const="-",
+        default=None,
+        metavar="FILE",
+        help="Record wall time per stage and work counters of every file as JSON lines, "
+             "written to FILE or after the summary table if no file is given.",
+    )
     args = parser.parse_args()
 
+    cache = None
+    if not args.no_cache:
+        cache = StageCache(args.cache_dir, max_bytes=int(args.cache_max_mb * 1024 * 1024))
+
     # Run classification
-    summary_rows = classify_process(args.data_dir, verbose=args.verbose)
+    profile = [] if args.profile is not None else None
+    summary_rows = classify_process(
+        args.data_dir, verbose=args.verbose, jobs=args.jobs, cache=cache, profile=profile
+    )
 
     # Print results table
     print(
@@ -155,6 +444,15 @@ def main():
         )
     )
 
+    # Profile records as JSON lines, one per file
+    if profile is not None:
+        lines = "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in profile)
+        if args.profile == "-":
+            sys.stdout.write(lines)
+        else:
+            with open(args.profile, "w", encoding="utf-8") as fh:
+                fh.write(lines)
+
 
 if __name__ == "__main__":
     main()
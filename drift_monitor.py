@@ -0,0 +1,298 @@
+import argparse
+import json
+import sys
+import time
+import warnings
+from bisect import bisect_right
+from collections import OrderedDict
+from datetime import datetime
+
+from incremental import changed_pairs, classify_relations, reclassify
+from relationship_mining import RelationshipMiner
+
+# Default number of cases in the sliding window
+DEFAULT_WINDOW = 1000
+# Default minimum number of seconds between two reclassifications
+DEFAULT_MIN_INTERVAL = 1.0
+
+
+def parse_timestamp(value):
+    """
+    Convert an event timestamp into a number that orders the events of a case.
+
+    Args:
+        value (int, float, str or None): Epoch seconds or an ISO 8601 string.
+
+    Returns:
+        float or None: Epoch seconds, None if the event has no timestamp.
+    """
+    if value is None or isinstance(value, (int, float)):
+        return value
+    return datetime.fromisoformat(value).timestamp()
+
+
+class DriftMonitor:
+    """
+    Tracks the structuredness of the most recent cases of an event stream.
+
+    The monitor keeps the traces of the last `window` active cases and a RelationshipMiner over
+    them. An event replaces the trace of its case in the miner (the old trace is removed and the
+    extended one added), a case leaving the window is removed. An update therefore only touches
+    the counters of the activities of one trace, independent of the window size, and the log is
+    never mined again.
+
+    The relationship matrix is derived and the process reclassified in `poll`, at most once per
+    `min_interval` seconds and only if at least `min_changed_pairs` activity pairs changed their
+    relation since the last classification. Reclassification is incremental (see
+    incremental.reclassify).
+
+    Attributes:
+        window (int): Maximum number of cases in the window.
+        min_interval (float): Minimum number of seconds between two reclassifications.
+        min_changed_pairs (int): Number of changed pairs that trigger a reclassification.
+        n_events (int): Number of events seen.
+        classification (Classification or None): Latest classification.
+    """
+
+    def __init__(self, window=DEFAULT_WINDOW, min_interval=DEFAULT_MIN_INTERVAL, min_changed_pairs=1,
+                 clock=time.monotonic):
+        self.window = window
+        self.min_interval = min_interval
+        self.min_changed_pairs = min_changed_pairs
+        self.n_events = 0
+        self.classification = None
+
+        self._clock = clock
+        self._miner = RelationshipMiner()
+        # case id -> (event order keys, activities), least recently active case first
+        self._cases = OrderedDict()
+        self._dirty = False
+        self._last_run = None
+
+    @property
+    def n_cases(self):
+        """Number of cases in the window."""
+        return len(self._cases)
+
+    def add_event(self, case, activity, timestamp=None):
+        """
+        Add one event to the window.
+
+        Events of a case may arrive out of order, they are placed by their timestamp. Events
+        without a timestamp are appended to their case.
+
+        Args:
+            case (str): Case id.
+            activity (str): Activity label.
+            timestamp (int, float, str, optional): Epoch seconds or ISO 8601 string.
+        """
+        self.n_events += 1
+        key = parse_timestamp(timestamp)
+
+        if case in self._cases:
+            keys, trace = self._cases[case]
+            self._miner.remove_trace(trace)
+            self._cases.move_to_end(case)
+        else:
+            keys, trace = self._cases[case] = ([], [])
+            # Make room by dropping the least recently active case
+            if len(self._cases) > self.window:
+                _, (_, oldest) = self._cases.popitem(last=False)
+                self._miner.remove_trace(oldest)
+
+        if key is None:
+            key = keys[-1] if keys else float("-inf")
+        position = bisect_right(keys, key)
+        keys.insert(position, key)
+        trace.insert(position, activity)
+        self._miner.add_trace(trace)
+        self._dirty = True
+
+    def poll(self, force=False):
+        """
+        Reclassify the window if it changed and the rate limit allows it.
+
+        Args:
+            force (bool): Ignore the rate limit, e.g. at the end of the stream.
+
+        Returns:
+            Dict or None: Change record if the score or the class changed, otherwise None.
+        """
+        if not self._dirty or not self._cases:
+            return None
+        now = self._clock()
+        if not force and self._last_run is not None and now - self._last_run < self.min_interval:
+            return None
+        self._last_run = now
+        self._dirty = False
+
+        relations = self._miner.to_matrix()
+        previous = self.classification
+        # Number of changed pairs, None if the activities changed
+        n_changed = None
+        if previous is not None and relations.activities == previous.relations.activities:
+            n_changed = len(changed_pairs(previous.relations, relations)[0])
+            if n_changed < self.min_changed_pairs:
+                return None
+
+        try:
+            if previous is None:
+                current = classify_relations(relations)
+            else:
+                current = reclassify(previous, relations)
+        except Exception as e:
+            # Keep monitoring, the next classification is compared with the last successful one
+            return {"events": self.n_events, "cases": self.n_cases, "error": f"{type(e).__name__}: {e}"}
+        self.classification = current
+
+        if previous is not None and round(previous.final_score, 3) == round(current.final_score, 3) \
+                and previous.class_calc == current.class_calc:
+            return None
+
+        return {
+            "events": self.n_events,
+            "cases": self.n_cases,
+            "activities": len(relations.activities),
+            "changed_pairs": n_changed,
+            "score": round(current.final_score, 3),
+            "class": current.class_calc,
+            "previous_score": round(previous.final_score, 3) if previous is not None else None,
+            "previous_class": previous.class_calc if previous is not None else None,
+            "recomputed": list(current.recomputed),
+        }
+
+
+def iter_events(lines, case_key="case", activity_key="activity", timestamp_key="timestamp"):
+    """
+    Parse JSON lines into events, passing idle markers (None) through.
+
+    Args:
+        lines (Iterable[str or None]): JSON lines, None whenever the source has no new data.
+        case_key (str): Field holding the case id.
+        activity_key (str): Field holding the activity label.
+        timestamp_key (str): Field holding the timestamp.
+
+    Returns:
+        Iterator[Tuple or None]: (case, activity, timestamp) per event.
+    """
+    for line in lines:
+        if line is None:
+            yield None
+            continue
+        line = line.strip()
+        if not line:
+            continue
+        record = json.loads(line)
+        yield str(record[case_key]), record[activity_key], record.get(timestamp_key)
+
+
+def follow_lines(path, poll_interval=0.5):
+    """
+    Read the lines of a file and keep waiting for appended lines, like `tail -f`.
+
+    Args:
+        path (str): Path of the file.
+        poll_interval (float): Seconds to wait for new data.
+
+    Returns:
+        Iterator[str or None]: Complete lines, None whenever no new data arrived.
+    """
+    with open(path, encoding="utf-8") as fh:
+        partial = ""
+        while True:
+            line = fh.readline()
+            if not line:
+                yield None
+                time.sleep(poll_interval)
+                continue
+            partial += line
+            if partial.endswith("\n"):
+                yield partial
+                partial = ""
+
+
+def monitor(events, drift_monitor, out=sys.stdout):
+    """
+    Feed events into a monitor and write every change record as JSON line.
+
+    Args:
+        events (Iterable[Tuple or None]): Events as returned by `iter_events`.
+        drift_monitor (DriftMonitor): Monitor to feed.
+        out (file): Output stream.
+    """
+    def emit(record):
+        if record is not None:
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            out.flush()
+
+    for event in events:
+        if event is None:
+            # Source is idle, catch up on changes held back by the rate limit
+            emit(drift_monitor.poll())
+            continue
+        drift_monitor.add_event(*event)
+        emit(drift_monitor.poll())
+    emit(drift_monitor.poll(force=True))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Monitor the structuredness of the recent cases of an event stream (JSON lines)."
+    )
+    parser.add_argument(
+        "file",
+        nargs="?",
+        default="-",
+        help="JSONL file with one event per line (default: read from stdin).",
+    )
+    parser.add_argument(
+        "--follow",
+        action="store_true",
+        help="Keep reading lines appended to the file, like 'tail -f'.",
+    )
+    parser.add_argument(
+        "--window",
+        type=int,
+        default=DEFAULT_WINDOW,
+        help=f"Number of most recently active cases to classify (default: {DEFAULT_WINDOW}).",
+    )
+    parser.add_argument(
+        "--min-interval",
+        type=float,
+        default=DEFAULT_MIN_INTERVAL,
+        help=f"Minimum number of seconds between two reclassifications (default: {DEFAULT_MIN_INTERVAL}).",
+    )
+    parser.add_argument(
+        "--min-changed-pairs",
+        type=int,
+        default=1,
+        help="Number of activity pairs that must change their relation to reclassify (default: 1).",
+    )
+    parser.add_argument("--case-key", default="case", help="Field holding the case id (default: case).")
+    parser.add_argument("--activity-key", default="activity", help="Field holding the activity (default: activity).")
+    parser.add_argument("--timestamp-key", default="timestamp", help="Field holding the timestamp (default: timestamp).")
+    args = parser.parse_args()
+
+    # Cases that are still running routinely produce relations without a refinement score
+    warnings.simplefilter("ignore", UserWarning)
+
+    drift_monitor = DriftMonitor(args.window, args.min_interval, args.min_changed_pairs)
+
+    def run(lines):
+        events = iter_events(lines, args.case_key, args.activity_key, args.timestamp_key)
+        try:
+            monitor(events, drift_monitor)
+        except KeyboardInterrupt:
+            pass
+
+    if args.file == "-":
+        run(sys.stdin)
+    elif args.follow:
+        run(follow_lines(args.file))
+    else:
+        with open(args.file, encoding="utf-8") as fh:
+            run(fh)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,253 @@
+import argparse
+import json
+import math
+import os
+import sys
+import tempfile
+import time
+import warnings
+from glob import glob
+
+import numpy as np
+from tabulate import tabulate
+
+# Add parent directory to Python path so benchmark.py can be imported
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+from benchmark import STAGES, environment, stage_context, time_stage
+from synthetic import generate_matrix
+from utils import load_relationships
+
+# Bump whenever the layout of baseline files changes
+BASELINE_VERSION = 1
+
+DEFAULT_BASELINE = os.path.join(ROOT, ".benchmark_baseline.json")
+DATA_DIRS = ("data_development/data", "data_evaluation/data")
+SYNTHETIC_SHAPES = ("xor", "par", "mixed")
+SYNTHETIC_SIZES = (40, 80)
+
+
+def iter_cases(data=True, synthetic_sizes=SYNTHETIC_SIZES):
+    """
+    Matrices of the regression suite: the bundled data sets and synthetic matrices.
+
+    Returns:
+        Iterator[Tuple[str, RelationshipMatrix]]: Case name and relationships.
+    """
+    if data:
+        for data_dir in DATA_DIRS:
+            for path in sorted(glob(os.path.join(ROOT, data_dir, "*.json"))):
+                name = os.path.splitext(os.path.basename(path))[0]
+                yield f"{data_dir.split('/')[0]}/{name}", load_relationships(path)
+    for shape in SYNTHETIC_SHAPES:
+        for size in synthetic_sizes:
+            yield f"synthetic/{shape}-{size}", generate_matrix(size, shape, seed=0)
+
+
+def run_suite(data=True, synthetic_sizes=SYNTHETIC_SIZES, warmup=1, repeats=7, timeout=30.0, log=None):
+    """
+    Time every stage on every case of the suite.
+
+    Returns:
+        Dict: Timing samples per case and stage ("samples", plus "error" or "timeout" on failure).
+    """
+    results = {}
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        for case, relations in iter_cases(data, synthetic_sizes):
+            context = stage_context(relations, timeout)
+            results[case] = {}
+            for name in STAGES:
+                outcome = time_stage(name, relations, context, warmup, repeats, timeout)
+                if "skipped" not in outcome:
+                    results[case][name] = outcome
+            if log is not None:
+                print(f"{case}: {len(results[case])} stages timed", file=log, flush=True)
+    return results
+
+
+def save_baseline(results, path, config):
+    """Write suite results with the machine metadata to a baseline file, atomically."""
+    baseline = {
+        "version": BASELINE_VERSION,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "environment": environment(),
+        "config": config,
+        "results": results,
+    }
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as fh:
+            json.dump(baseline, fh, indent=1)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def load_baseline(path):
+    """Read a baseline file written by `save_baseline`."""
+    with open(path, encoding="utf-8") as fh:
+        baseline = json.load(fh)
+    if baseline.get("version") != BASELINE_VERSION:
+        raise ValueError(f"Unsupported baseline version {baseline.get('version')} in {path}")
+    return baseline
+
+
+def _median_and_spread(samples):
+    # Median and median absolute deviation, robust against single outliers (e.g. a GC pause)
+    values = np.asarray(samples, dtype=float)
+    median = float(np.median(values))
+    return median, float(np.median(np.abs(values - median)))
+
+
+def compare_case(base_samples, new_samples, noise=3.0, min_seconds=1e-4):
+    """
+    Compare the timing samples of one stage on one case.
+
+    A change counts as significant if the medians differ by more than `noise` times the
+    summed median absolute deviations of both runs. Stages faster than `min_seconds` in both
+    runs are dominated by timer noise and are not judged.
+
+    Returns:
+        Dict or None: "ratio" (current / baseline median) and "significant", None if not judged.
+    """
+    if not base_samples or not new_samples:
+        return None
+    base, base_spread = _median_and_spread(base_samples)
+    new, new_spread = _median_and_spread(new_samples)
+    if max(base, new) < min_seconds or base <= 0:
+        return None
+    return {
+        "baseline": base,
+        "current": new,
+        "ratio": new / base,
+        "significant": abs(new - base) > noise * (base_spread + new_spread),
+    }
+
+
+def compare_results(baseline, current, threshold=1.25, noise=3.0, min_seconds=1e-4):
+    """
+    Compare suite results against a baseline, per stage.
+
+    The slowdown of a stage is the geometric mean of its median ratios over all judged cases.
+    A stage regressed if its slowdown exceeds `threshold` and at least one case is significantly
+    slower, or if it fails on a case it passed in the baseline.
+
+    Returns:
+        List[Dict]: One summary per stage with "stage", "cases", "slowdown", "worst_case",
+            "worst_ratio", "significant", "failures" and "regressed".
+    """
+    summaries = []
+    for name in STAGES:
+        comparisons = {}
+        failures = []
+        for case, stages in current.items():
+            base = baseline.get(case, {}).get(name)
+            new = stages.get(name)
+            if base is None or new is None:
+                continue
+            if base.get("samples") and ("error" in new or "timeout" in new):
+                failures.append(case)
+                continue
+            comparison = compare_case(base.get("samples"), new.get("samples"), noise, min_seconds)
+            if comparison is not None:
+                comparisons[case] = comparison
+
+        ratios = [c["ratio"] for c in comparisons.values()]
+        slowdown = math.exp(sum(map(math.log, ratios)) / len(ratios)) if ratios else None
+        worst = max(comparisons, key=lambda case: comparisons[case]["ratio"], default=None)
+        significant = sum(1 for c in comparisons.values() if c["significant"] and c["ratio"] > 1)
+        summaries.append({
+            "stage": name,
+            "cases": len(comparisons),
+            "slowdown": slowdown,
+            "worst_case": worst,
+            "worst_ratio": comparisons[worst]["ratio"] if worst else None,
+            "significant": significant,
+            "failures": failures,
+            "regressed": bool(failures) or (slowdown is not None and slowdown > threshold and significant > 0),
+        })
+    return summaries
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Store benchmark baselines of the pipeline stages and detect performance regressions."
+    )
+    parser.add_argument("command", choices=("save", "compare"), help="Save a new baseline or compare against one.")
+    parser.add_argument(
+        "--baseline", default=DEFAULT_BASELINE,
+        help="Baseline file (default: .benchmark_baseline.json in the repository root).",
+    )
+    parser.add_argument(
+        "--threshold", type=float, default=1.25,
+        help="Slowdown factor of a stage that counts as regression (default: 1.25).",
+    )
+    parser.add_argument(
+        "--noise", type=float, default=3.0,
+        help="Differences within this many median absolute deviations count as noise (default: 3).",
+    )
+    parser.add_argument(
+        "--min-seconds", type=float, default=1e-4,
+        help="Stages faster than this (seconds) are not judged (default: 0.0001).",
+    )
+    parser.add_argument("--repeats", type=int, default=7, help="Timed runs per stage and case (default: 7).")
+    parser.add_argument("--warmup", type=int, default=1, help="Untimed runs per stage and case (default: 1).")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Time limit per run in seconds (default: 30).")
+    parser.add_argument(
+        "--sizes", type=int, nargs="*", default=list(SYNTHETIC_SIZES),
+        help="Sizes of the synthetic matrices (default: 40 80).",
+    )
+    parser.add_argument("--no-data", action="store_true", help="Skip the bundled data sets.")
+    args = parser.parse_args()
+
+    config = {
+        "data": not args.no_data, "sizes": args.sizes, "warmup": args.warmup,
+        "repeats": args.repeats, "timeout": args.timeout,
+    }
+
+    if args.command == "save":
+        results = run_suite(not args.no_data, args.sizes, args.warmup, args.repeats, args.timeout, log=sys.stderr)
+        save_baseline(results, args.baseline, config)
+        print(f"✅ Baseline written to: {args.baseline}")
+        return
+
+    baseline = load_baseline(args.baseline)
+    if baseline["environment"] != environment():
+        print("Warning: the baseline was recorded in a different environment:", file=sys.stderr)
+        print(f"  baseline: {baseline['environment']}", file=sys.stderr)
+        print(f"  current:  {environment()}", file=sys.stderr)
+
+    results = run_suite(not args.no_data, args.sizes, args.warmup, args.repeats, args.timeout, log=sys.stderr)
+    summaries = compare_results(baseline["results"], results, args.threshold, args.noise, args.min_seconds)
+
+    print(
+        tabulate(
+            [
+                [
+                    s["stage"],
+                    s["cases"],
+                    f"{s['slowdown']:.2f}x" if s["slowdown"] is not None else "-",
+                    f"{s['worst_case']} ({s['worst_ratio']:.2f}x)" if s["worst_case"] else "-",
+                    s["significant"],
+                    ", ".join(s["failures"]) or "-",
+                    "❌" if s["regressed"] else "✅",
+                ]
+                for s in summaries
+            ],
+            headers=["Stage", "Cases", "Slowdown", "Worst Case", "Significant", "Failures", "OK"],
+            tablefmt="grid",
+        )
+    )
+
+    if any(s["regressed"] for s in summaries):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
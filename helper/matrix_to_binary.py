@@ -0,0 +1,51 @@
+import argparse
+import os
+import sys
+from pathlib import Path
+
+# Add parent directory to Python path so the matrix modules can be imported
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from matrix_formats import BINARY_SUFFIX, write_binary_relationships
+from utils import load_relationships
+
+
+def convert_to_binary(in_path, out_path=None):
+    """
+    Convert an activity-relationship matrix (classifier JSON or AR-matrix YAML)
+    into the memory-mappable binary format read by utils.load_relationships.
+    """
+    in_path = Path(in_path)
+    if out_path is None:
+        out_path = in_path.with_suffix(BINARY_SUFFIX)
+    out_path = Path(out_path)
+
+    relations = load_relationships(in_path)
+
+    write_binary_relationships(relations, out_path)
+
+    return out_path
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Convert a classifier JSON or AR-matrix YAML file into the binary relationship matrix format."
+    )
+    parser.add_argument("input", help="Path to a classifier .json or AR-matrix .yaml file.")
+    parser.add_argument(
+        "--out",
+        help=f"Optional output path. Defaults to same name/location with '{BINARY_SUFFIX}' extension.",
+        default=None,
+    )
+    args = parser.parse_args()
+
+    if not os.path.isfile(args.input):
+        print(f"Error: file not found: {args.input}", file=sys.stderr)
+        sys.exit(1)
+
+    out_path = convert_to_binary(args.input, args.out)
+    print(f"✅ Binary matrix successfully written to: {out_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,100 +1,218 @@
 import argparse
 import json
-from itertools import product
+import os
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from itertools import product, repeat
 from pathlib import Path
 
-import yaml
+# Add parent directory to Python path so matrix_formats.py can be imported
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-# Unicode mapping used by the AR-matrix export
-SYMBOL_MAP = {
-    "≺": "<",
-    "≻": ">",
-    "⇔": "<=>",
-    "⇎": "</=>",
-}
+from matrix_formats import SPARSE_DEFAULT, YAML_SUFFIXES, load_yaml_sparse
+from stage_cache import file_digest
 
-def normalize_symbol(s, remove_t=False):
+# Name of the file in an output directory that records which sources were converted
+MANIFEST_NAME = ".yaml_to_json_cache.json"
+
+
+def load_yaml_matrix(yaml_path):
     """
-    Normalize a single temporal/existential symbol:
-      - optionally remove 't' for temporal dependencies
-      - replace unicode symbols by ASCII equivalents
-      - return '-' if empty after cleaning
+    Read an activity-relationship matrix exported as YAML into the dense nested
+    dict format expected by the classifier: the full |A|x|A| matrix,
+    initialized with "-,-" (including (a,a)) and overwritten by the
+    dependencies (see matrix_formats.load_yaml_sparse).
     """
-    s = (s or "").strip()
-    if remove_t:
-        s = s.replace("t", "")
-    for old, new in SYMBOL_MAP.items():
-        s = s.replace(old, new)
-    return s if s else "-"
+    sparse = load_yaml_sparse(yaml_path)
+    activities = sparse["activities"]
+
+    # Initialize matrix with defaults
+    matrix = {a1: {} for a1 in activities}
+    for a1, a2 in product(activities, repeat=2):
+        matrix[a1][a2] = SPARSE_DEFAULT
+
+    for a, row in sparse["relations"].items():
+        matrix[a].update(row)
+
+    return matrix
 
 
-def convert_yaml_to_json(yaml_path, out_path=None):
+def convert_yaml_to_json(yaml_path, out_path=None, sparse=False, indent=None):
     """
     Convert an activity-relationship matrix exported as YAML into the JSON
-    format expected by the classifier.
-
-    Rules:
-      - Activities:
-          * infer from metadata.activities
-      - Initialize full |A|x|A| matrix:
-          * (a,a) = "-,-"
-      - For each dependency (a -> b):
-          * temporal  = normalized symbol (remove 't'), or '-'
-          * existential = normalized symbol, or '-'
-          * relation = "{temporal},{existential}"
+    format expected by the classifier, either as dense matrix (see
+    load_yaml_matrix) or in the sparse format (see load_yaml_sparse).
+
+    The output is compact unless an indent is given.
     """
     yaml_path = Path(yaml_path)
     if out_path is None:
         out_path = yaml_path.with_suffix(".json")
     out_path = Path(out_path)
 
-    # Load YAML
-    with open(yaml_path, "r", encoding="utf-8") as f:
-        data = yaml.safe_load(f) or {}
+    matrix = load_yaml_sparse(yaml_path) if sparse else load_yaml_matrix(yaml_path)
 
-    deps = data.get("dependencies", []) or []
+    # Write JSON atomically, so an interrupted run never leaves a truncated output behind
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    separators = (",", ":") if indent is None else None
+    fd, tmp_path = tempfile.mkstemp(dir=out_path.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(matrix, f, indent=indent, separators=separators, ensure_ascii=False)
+        os.replace(tmp_path, out_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
 
-    # Collect activities
-    activities = data.get("metadata", {}).get("activities", [])
+    return out_path
 
-    # Initialize matrix with defaults
-    matrix = {a1: {} for a1 in activities}
-    for a1, a2 in product(activities, repeat=2):
-        matrix[a1][a2] = "-,-"
 
-    # Apply dependencies
-    for d in deps:
-        a = d.get("from")
-        b = d.get("to")
-        if a not in matrix or b not in matrix[a]:
-            continue
+def _convert_cached(yaml_path, out_path, entry, options):
+    """
+    Convert one file of a directory unless the manifest entry shows that its output is current.
 
-        temporal = normalize_symbol(d.get("temporal", {}).get("symbol", ""), remove_t=True)
-        existential = normalize_symbol(d.get("existential", {}).get("symbol", ""), remove_t=False)
+    An unchanged modification time and size skip the file without reading it, a changed
+    modification time only leads to a conversion if the content hash changed as well.
 
-        matrix[a][b] = f"{temporal},{existential}"
+    Returns:
+        tuple: (new manifest entry, True if the file was converted)
+    """
+    stat = os.stat(yaml_path)
+    current = entry is not None and entry.get("options") == options and os.path.isfile(out_path)
 
-    # Write JSON
-    out_path.parent.mkdir(parents=True, exist_ok=True)
-    with open(out_path, "w", encoding="utf-8") as f:
-        json.dump(matrix, f, indent=2, ensure_ascii=False)
+    if current and (entry["mtime_ns"], entry["size"]) == (stat.st_mtime_ns, stat.st_size):
+        return entry, False
 
-    return out_path
+    digest = file_digest(yaml_path)
+    converted = not (current and entry["sha256"] == digest)
+    if converted:
+        convert_yaml_to_json(yaml_path, out_path, **options)
+
+    new_entry = {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size, "sha256": digest, "options": options}
+    return new_entry, converted
+
+
+def convert_directory(yaml_dir, out_dir=None, sparse=False, indent=None, jobs=1, force=False):
+    """
+    Convert all YAML files of a directory into classifier-ready JSON files.
+
+    Files are converted in parallel by `jobs` worker processes (0 uses all CPUs).
+    A manifest in the output directory records modification time, size and content
+    hash of every converted source, so sources that did not change since the last
+    run (with the same options) are skipped.
+
+    Args:
+        yaml_dir (str or Path): Directory containing the YAML exports.
+        out_dir (str or Path, optional): Output directory, defaults to `yaml_dir`.
+        sparse (bool): Write the sparse format.
+        indent (int, optional): Indentation of the JSON output, compact if None.
+        jobs (int): Number of worker processes.
+        force (bool): Convert all files, ignoring the manifest.
+
+    Returns:
+        Tuple[List[Path], List[Path]]: Converted and skipped output paths.
+    """
+    yaml_dir = Path(yaml_dir)
+    out_dir = Path(out_dir) if out_dir is not None else yaml_dir
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    sources = sorted(
+        p for p in yaml_dir.iterdir()
+        if p.is_file() and p.suffix.lower() in YAML_SUFFIXES
+    )
+    targets = [out_dir / p.with_suffix(".json").name for p in sources]
+
+    manifest_path = out_dir / MANIFEST_NAME
+    manifest = {}
+    if not force and manifest_path.is_file():
+        try:
+            with open(manifest_path, encoding="utf-8") as fh:
+                manifest = json.load(fh)
+        except (OSError, ValueError):
+            # A broken manifest only costs a full conversion
+            manifest = {}
+
+    options = {"sparse": sparse, "indent": indent}
+    entries = [manifest.get(p.name) for p in sources]
+
+    if jobs <= 0:
+        jobs = os.cpu_count() or 1
+    if jobs > 1 and len(sources) > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            results = list(pool.map(_convert_cached, sources, targets, entries, repeat(options)))
+    else:
+        results = list(map(_convert_cached, sources, targets, entries, repeat(options)))
+
+    converted, skipped = [], []
+    for source, target, (entry, was_converted) in zip(sources, targets, results):
+        manifest[source.name] = entry
+        (converted if was_converted else skipped).append(target)
+
+    # Forget sources that no longer exist
+    names = {p.name for p in sources}
+    manifest = {name: entry for name, entry in manifest.items() if name in names}
+
+    fd, tmp_path = tempfile.mkstemp(dir=out_dir, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as fh:
+            json.dump(manifest, fh, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, manifest_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    return converted, skipped
 
 
 def main():
     parser = argparse.ArgumentParser(
         description="Convert AR-matrix YAML to classifier-ready JSON."
     )
-    parser.add_argument("yaml", help="Path to YAML file exported from the AR-matrix discovery tool.")
+    parser.add_argument(
+        "yaml",
+        help="Path to a YAML file exported from the AR-matrix discovery tool, or a directory of such files.",
+    )
     parser.add_argument(
         "--out",
-        help="Optional output JSON path. Defaults to same name/location with '.json' extension.",
+        help="Optional output JSON path (output directory for a directory input). "
+             "Defaults to same name/location with '.json' extension.",
+        default=None,
+    )
+    parser.add_argument(
+        "--sparse",
+        action="store_true",
+        help="Write the sparse format that only lists pairs other than '-,-'.",
+    )
+    parser.add_argument(
+        "--indent",
+        type=int,
         default=None,
+        help="Indent the JSON output by this many spaces (default: compact output).",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="Number of worker processes for a directory input (default: 1, 0 = all CPUs).",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Convert all files of a directory, even if their outputs are up to date.",
     )
     args = parser.parse_args()
 
-    out_path = convert_yaml_to_json(args.yaml, args.out)
+    if os.path.isdir(args.yaml):
+        converted, skipped = convert_directory(
+            args.yaml, args.out, sparse=args.sparse, indent=args.indent, jobs=args.jobs, force=args.force
+        )
+        print(f"✅ {len(converted)} JSON files written, {len(skipped)} up to date")
+        return
+
+    out_path = convert_yaml_to_json(args.yaml, args.out, sparse=args.sparse, indent=args.indent)
     print(f"✅ JSON successfully written to: {out_path}")
 
 
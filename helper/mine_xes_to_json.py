@@ -0,0 +1,71 @@
+import argparse
+import os
+import sys
+from pathlib import Path
+
+# Add parent directory to Python path so relationship_mining.py can be imported
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from relationship_mining import mine_relationships, write_relationships
+
+
+def convert_xes_to_json(xes_path, out_path=None, activity_key="concept:name", variant_table=None, sparse=False):
+    """
+    Mine the activity-relationship matrix of an XES event log and write it as
+    classifier-ready JSON.
+
+    The log is streamed once and collapsed into trace variants; no intermediate
+    YAML matrix is needed. If a variant table path is given, the variants are
+    persisted there and reused as long as the log content is unchanged.
+    With `sparse`, only pairs other than "-,-" are written.
+    """
+    xes_path = Path(xes_path)
+    if out_path is None:
+        out_path = xes_path.with_suffix(".json")
+    out_path = Path(out_path)
+
+    relations = mine_relationships(xes_path, activity_key=activity_key, variant_table=variant_table)
+
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    write_relationships(relations, out_path, sparse=sparse)
+
+    return out_path
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Mine an activity-relationship matrix from an XES event log into classifier-ready JSON."
+    )
+    parser.add_argument("xes", help="Path to a .xes event log.")
+    parser.add_argument(
+        "--out",
+        help="Optional output JSON path. Defaults to same name/location with '.json' extension.",
+        default=None,
+    )
+    parser.add_argument(
+        "--activity-key",
+        help="Event attribute holding the activity label (default: concept:name).",
+        default="concept:name",
+    )
+    parser.add_argument(
+        "--variants",
+        help="Optional path of a variant table to persist the trace variants in and reuse on re-mining.",
+        default=None,
+    )
+    parser.add_argument(
+        "--sparse",
+        action="store_true",
+        help="Write the sparse format that only lists pairs other than '-,-'.",
+    )
+    args = parser.parse_args()
+
+    if not os.path.isfile(args.xes):
+        print(f"Error: file not found: {args.xes}", file=sys.stderr)
+        sys.exit(1)
+
+    out_path = convert_xes_to_json(args.xes, args.out, args.activity_key, args.variants, args.sparse)
+    print(f"✅ JSON successfully written to: {out_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -7,6 +7,7 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from utils import load_relationships
 from block_detection import detect_blocks, build_super_blocks
+from score_process import score_process
 
 # Known development files (kept for convenience/documentation)
 DEV_FILES = [
@@ -39,6 +40,29 @@ DEV_FILES = [
     "data_development/data/Log28_structured.json"
 ]
 
+# Smallest known inputs of fixed failures (kept as regression checks)
+REGRESSION_FILES = [
+    # Blocks sharing activities are linked in a cycle (super-block chain walk never ended)
+    "helper/regression_data/super_block_cycle.json",
+    # XOR group without a valid branch assignment (reduce_branches_to_only_XOR returns None)
+    "helper/regression_data/xor_without_valid_assignment.json",
+    # Super-block fully covered by earlier ones (log(0) in the coverage entropy)
+    "helper/regression_data/fully_covered_super_block.json",
+    # Overlapping cliques of the never co-occur graph (competing XOR groups dropped each other)
+    "helper/regression_data/overlapping_xor_cliques.json",
+    # Activity with several PAR heads (only one extra group per further head was explored)
+    "helper/regression_data/dropped_par_block.json",
+    # Branch whose activities are ordered differently by global rank than topologically
+    "helper/regression_data/branch_sort_order.json",
+    # XOR group whose branches are all PAR-encoded (split lookup indexed an empty list)
+    "helper/regression_data/all_par_branches.json",
+    # Nested XOR and PAR detection over the same activities (XOR(S) -> PAR(S) -> XOR(S) never ended)
+    "helper/regression_data/nested_detection_cycle.json",
+    # Synthetic mixed process with 120 activities, reaches the same cycle deep in the nesting
+    # (synthetic.generate_matrix(120, "mixed", 200, 0.05, 4, 0), stored in the sparse format)
+    "helper/regression_data/mixed_120_activities.json",
+]
+
 # Order-invariant expected outputs for development files
 EXPECTED = {
     "data_development/data/Log01_structured.json": {
@@ -269,7 +293,99 @@ EXPECTED = {
         ],
         
         "super": [{"activities": ["b", "c", "d", "e", "f", "g", "h"], "end": "i", "start": "a"}],
-    }
+    },
+    "helper/regression_data/super_block_cycle.json": {
+        "blocks": [
+            {"activities": [("a02", "a04", "a06"), ("a07", "a08")], "block_type": "PAR", "end": "a10", "nested": [], "start": None},
+            {"activities": ["a08", ("a02", "a04", "a06", "a10")], "block_type": "PAR", "end": None, "nested": [], "start": None},
+            {"activities": ["a04"], "block_type": "OPT", "end": "a06", "nested": [], "start": "a02"},
+        ],
+        "super": [{"activities": ["a02", "a04", "a07", "a08", "a10"], "end": "a06", "start": None}],
+        "score": 1.0,
+    },
+    "helper/regression_data/xor_without_valid_assignment.json": {
+        "blocks": [],
+        "super": [],
+        "score": 0.2333,
+    },
+    "helper/regression_data/fully_covered_super_block.json": {
+        "blocks": [
+            {"activities": ["a2"], "block_type": "OPT", "end": "a4", "nested": [], "start": "a1"},
+            {"activities": ["a3"], "block_type": "OPT", "end": "a4", "nested": [], "start": "a1"},
+            {"activities": [], "block_type": "SEQ", "end": "a3", "nested": [], "start": "a2"},
+        ],
+        "super": [
+            {"activities": ["a2"], "end": "a4", "start": "a1"},
+            {"activities": ["a3"], "end": "a4", "start": "a1"},
+            {"activities": [], "end": "a3", "start": "a2"},
+        ],
+        "score": 0.9953,
+    },
+    "helper/regression_data/overlapping_xor_cliques.json": {
+        "blocks": [
+            {"activities": ["a03", ("a05", "a08")], "block_type": "XOR", "end": None, "nested": [], "start": None},
+            {"activities": ["a05", "a11"], "block_type": "XOR", "end": None, "nested": [], "start": None},
+        ],
+        "super": [
+            {"activities": ["a03", "a05", "a08", "a11"], "end": None, "start": None},
+        ],
+        "score": 0.3994,
+    },
+    "helper/regression_data/dropped_par_block.json": {
+        "blocks": [
+            {"activities": ["a7", ("a4", "a5")], "block_type": "PAR", "end": None, "nested": [], "start": None},
+            {"activities": ["a5", ("a7", "a8")], "block_type": "PAR", "end": None, "nested": [], "start": None},
+        ],
+        "super": [
+            {"activities": ["a4", "a5", "a7", "a8"], "end": None, "start": None},
+        ],
+        "score": 1.0,
+    },
+    "helper/regression_data/branch_sort_order.json": {
+        "blocks": [],
+        "super": [],
+        "score": -0.0333,
+    },
+    "helper/regression_data/all_par_branches.json": {
+        "blocks": [
+            {"activities": [("a081", "a094", "a095", "a095"), ("a099", "a100")], "block_type": "XOR", "end": None,
+             "nested": [
+                 {"activities": ["a095", ("a081", "a094")], "block_type": "PAR", "end": None, "nested": [], "start": None},
+                 {"activities": ["a099", "a100"], "block_type": "PAR", "end": None, "nested": [], "start": None},
+             ], "start": None},
+        ],
+        "super": [
+            {"activities": ["a081", "a094", "a095", "a099", "a100"], "end": None, "start": None},
+        ],
+        "score": 1.0,
+    },
+    "helper/regression_data/nested_detection_cycle.json": {
+        "blocks": [
+            {"activities": [("a010", "a042"), ("a036", "a044")], "block_type": "PAR", "end": None, "nested": [], "start": None},
+        ],
+        "super": [
+            {"activities": ["a010", "a036", "a042", "a044"], "end": None, "start": None},
+        ],
+        "score": 1.0,
+    },
+    # Splits of deeply nested blocks depend on set iteration order here, only super-blocks and score are compared
+    "helper/regression_data/mixed_120_activities.json": {
+        "super": [
+            {"activities": ["a005", "a006", "a007", "a008", "a009", "a010", "a011", "a012", "a013", "a014", "a015", "a016", "a017", "a018", "a019", "a020", "a021", "a022", "a023", "a024", "a025", "a026", "a027", "a028", "a029", "a030", "a031", "a032", "a033", "a034", "a035", "a036", "a037", "a038", "a039", "a040", "a041", "a042", "a043", "a044", "a045", "a046", "a047", "a048", "a049", "a050", "a051", "a052", "a053", "a054", "a055", "a056", "a057", "a058", "a059", "a060", "a061", "a062", "a063", "a064", "a065", "a066", "a067", "a068", "a069", "a070", "a071", "a072", "a073", "a074", "a075", "a076", "a077", "a078", "a079", "a080", "a081", "a082", "a083", "a084", "a085", "a086", "a087", "a088", "a089", "a090", "a091", "a092", "a093", "a094", "a095", "a096", "a097", "a098", "a099", "a100", "a101", "a102", "a103", "a104", "a105", "a106", "a107", "a108", "a109", "a111", "a112", "a113", "a114", "a115", "a116", "a117"], "end": "a118", "start": None},
+            {"activities": ["a070", "a071", "a072", "a073", "a074", "a075", "a076", "a077", "a078", "a079", "a080", "a081", "a082", "a083", "a084", "a085", "a086", "a087", "a088", "a089", "a090", "a091", "a092", "a093", "a094", "a095", "a096", "a097", "a098", "a099", "a100", "a101", "a102", "a103", "a104", "a105", "a106", "a107", "a108", "a109", "a111", "a112", "a113", "a114", "a115", "a116", "a117"], "end": "a118", "start": "a069"},
+            {"activities": ["a004"], "end": "a118", "start": "a003"},
+            {"activities": ["a005"], "end": "a118", "start": "a003"},
+            {"activities": ["a011"], "end": "a118", "start": "a003"},
+            {"activities": ["a026"], "end": "a118", "start": "a003"},
+            {"activities": ["a028"], "end": "a118", "start": "a003"},
+            {"activities": ["a029"], "end": "a118", "start": "a003"},
+            {"activities": ["a030"], "end": "a118", "start": "a003"},
+            {"activities": ["a037"], "end": "a118", "start": "a003"},
+            {"activities": ["a041"], "end": "a118", "start": "a003"},
+            {"activities": ["a110"], "end": "a118", "start": "a003"},
+        ],
+        "score": 1.2337,
+    },
 }
 
 def normalize_blocks(blocks):
@@ -277,6 +393,7 @@ def normalize_blocks(blocks):
     Normalize blocks so order does not matter:
     - Represent nested tuples in 'activities' as canonical strings.
     - Sort by (block_type, activities, start, end).
+    - Normalize the nested blocks of each block the same way.
     """
     def normalize_activity(act):
         if isinstance(act, tuple):
@@ -294,7 +411,8 @@ def normalize_blocks(blocks):
             b.get("end") or "",
         )
 
-    return sorted(blocks, key=key)
+    normalized = [{**b, "nested": normalize_blocks(b.get("nested", []))} for b in blocks]
+    return sorted(normalized, key=key)
 
 def normalize_super(super_blocks):
     """
@@ -312,7 +430,7 @@ def normalize_super(super_blocks):
         })
 
     def key(b):
-        return (b.get("start"), b.get("end"), b.get("activities"))
+        return (b.get("start") or "", b.get("end") or "", b.get("activities"))
 
     return sorted(normalized, key=key)
 
@@ -320,7 +438,9 @@ def normalize_super(super_blocks):
 def verify_one(path, pp):
     """
     Load relationships, detect blocks and super-blocks, and compare
-    with EXPECTED for the given path (if available).
+    with EXPECTED for the given path (if available). Blocks are only
+    compared if the expectation lists them, the final score only if
+    it contains one.
     """
     print(f"\n=== {path} ===")
 
@@ -340,10 +460,10 @@ def verify_one(path, pp):
     exp = EXPECTED[path]
     ok = True
 
-    # Compare blocks (order-invariant)
+    # Compare blocks (order-invariant), unless the expectation leaves them out
     norm_blk_exp = normalize_blocks(exp.get("blocks", []))
     norm_blk_act = normalize_blocks(blocks)
-    if norm_blk_act != norm_blk_exp:
+    if "blocks" in exp and norm_blk_act != norm_blk_exp:
         print("  ❌  Blocks don’t match (order-invariant):")
         print("    expected:")
         pp.pprint(norm_blk_exp)
@@ -362,12 +482,19 @@ def verify_one(path, pp):
         pp.pprint(norm_super_act)
         ok = False
 
+    # Compare the final score (rounded to 4 decimals)
+    if "score" in exp:
+        final_score, _ = score_process(path, relationships, super_blocks)
+        if round(final_score, 4) != exp["score"]:
+            print(f"  ❌  Score doesn’t match: expected {exp['score']}, actual {round(final_score, 4)}")
+            ok = False
+
     if ok:
         print("  ✅  OK")
 
 
 def main():
-    for path in DEV_FILES:
+    for path in DEV_FILES + REGRESSION_FILES:
         pp = pprint.PrettyPrinter(indent=2, width=120)
         verify_one(path, pp)
 
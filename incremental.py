@@ -0,0 +1,202 @@
+import numpy as np
+
+from block_detection import detect_blocks, build_super_blocks, block_relation_classes
+from classify_process import score_to_class
+from relationship_matrix import RelationshipMatrix, T_DIRECTLY_BEFORE
+from score_process import score_process
+from utils import get_super_block_acts
+
+# Stages that can be taken over from a previous classification
+STAGES = ("blocks", "super_blocks", "sb_sb", "out_sb", "out_out")
+
+
+class Classification:
+    """
+    Result of classifying one relationship matrix, kept to reclassify the matrix after some of
+    its relations changed (see `reclassify`).
+
+    Attributes:
+        relations (RelationshipMatrix): The classified relationships.
+        blocks (List[Dict]): Blocks as returned by detect_blocks.
+        super_blocks (List[Dict]): Super-blocks as returned by build_super_blocks.
+        final_score (float): Final structuredness score.
+        details (tuple): Score components as returned by score_process.
+        class_calc (str): Class label of the final score.
+        recomputed (Tuple[str]): Stages (see STAGES) that were computed for this result,
+            all other stages were taken over from the previous result.
+    """
+
+    def __init__(self, relations, blocks, super_blocks, final_score, details, recomputed=STAGES):
+        self.relations = relations
+        self.blocks = blocks
+        self.super_blocks = super_blocks
+        self.final_score = final_score
+        self.details = details
+        self.class_calc = score_to_class(final_score)
+        self.recomputed = tuple(recomputed)
+
+    def refinement_terms(self):
+        """Weighted refinement terms of the result that were computed, keyed like STAGES."""
+        _, _, _, _, sb_sb_ref, out_sb_ref, out_out_ref, _ = self.details
+        terms = {"sb_sb": sb_sb_ref, "out_sb": out_sb_ref, "out_out": out_out_ref}
+        return {key: value for key, value in terms.items() if value is not None}
+
+
+def classify_relations(relationships, path=None):
+    """
+    Classify a relationship matrix from scratch, keeping every stage result for `reclassify`.
+
+    Args:
+        relationships (RelationshipMatrix or Dict[str, Dict[str, str]]): Relationships to classify.
+        path (str, optional): Name of the process, only used in messages.
+
+    Returns:
+        Classification: All stage results.
+    """
+    relations = RelationshipMatrix.coerce(relationships)
+    blocks = detect_blocks(relations)
+    super_blocks = build_super_blocks(blocks, relations)
+    final_score, details = score_process(path, relations, super_blocks)
+    return Classification(relations, blocks, super_blocks, final_score, details)
+
+
+def changed_pairs(old, new):
+    """
+    Activity pairs whose relation differs between two matrices over the same activities.
+
+    Args:
+        old (RelationshipMatrix): Previous relationships.
+        new (RelationshipMatrix): Current relationships, with the activities in the same order.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: Row and column indices of the changed pairs.
+    """
+    if (old.temporal_symbols, old.existential_symbols) == (new.temporal_symbols, new.existential_symbols):
+        differs = (old.temporal != new.temporal) | (old.existential != new.existential)
+    else:
+        # Codes of symbols that are not known may differ, compare the symbols themselves
+        differs = np.zeros((len(old.activities), len(old.activities)), dtype=bool)
+        for codes, symbols in (("temporal", "temporal_symbols"), ("existential", "existential_symbols")):
+            old_symbols = np.asarray(getattr(old, symbols), dtype=object)[getattr(old, codes)]
+            new_symbols = np.asarray(getattr(new, symbols), dtype=object)[getattr(new, codes)]
+            differs |= old_symbols != new_symbols
+    np.fill_diagonal(differs, False)
+    return np.nonzero(differs)
+
+
+def _affected_refinements(super_blocks, outsiders, cells):
+    """
+    Refinement terms of score_process that read at least one of the given activity pairs.
+
+    Args:
+        super_blocks (List[Dict]): Super-blocks of the scored process.
+        outsiders (Iterable[str]): Activities not covered by any super-block.
+        cells (Iterable[Tuple[str, str]]): Changed activity pairs (a, b).
+
+    Returns:
+        set: Affected terms ("sb_sb", "out_sb", "out_out").
+    """
+    # Activities read by refine_sb_to_sb (ends of one SB against starts of another)
+    # and by refine_out_to_sb (all activities of a SB)
+    ends = [{sb["end"]} if sb["end"] else set(sb["activities"]) for sb in super_blocks]
+    starts = [{sb["start"]} if sb["start"] else set(sb["activities"]) for sb in super_blocks]
+    sb_acts = set(act for sb in super_blocks for act in get_super_block_acts(sb))
+    outsiders = set(outsiders)
+
+    affected = set()
+    for a, b in cells:
+        if any(a in ends[i] and b in starts[j] for i in range(len(super_blocks))
+               for j in range(len(super_blocks)) if i != j):
+            affected.add("sb_sb")
+        if a in outsiders and b in sb_acts:
+            affected.add("out_sb")
+        # Pairs of outsiders are read in one direction only, depending on their order
+        if a in outsiders and b in outsiders:
+            affected.add("out_out")
+    return affected
+
+
+def reclassify(previous, relationships, changed_cells=None, path=None):
+    """
+    Classify a relationship matrix that differs from an already classified one in a few pairs.
+
+    Only the stages that can be affected by the changed pairs are recomputed, the result is
+    the same as that of `classify_relations`:
+
+    - Blocks (and super-blocks) only depend on the classes of block_relation_classes, they are
+      kept if no changed pair changes its class. Otherwise block detection is rerun on the whole
+      matrix. It is not limited to the blocks of the changed activities: detection searches
+      globally, and a changed pair can create or remove blocks that contain neither of its
+      activities. Most changes of re-mined matrices change a class, so the savings are mainly
+      in super-blocks and scoring.
+    - Super-blocks are kept if the blocks are equal and no pair gained or lost "<d".
+    - If the super-blocks are equal, only the refinement terms reading a changed pair are
+      recomputed, the base score and the weights are cheap and always recomputed. Warnings on
+      unknown relations are only repeated for recomputed terms.
+
+    Matrices over different activities are classified from scratch.
+
+    Args:
+        previous (Classification): Classification of the previous relationships.
+        relationships (RelationshipMatrix or Dict[str, Dict[str, str]]): Current relationships.
+        changed_cells (Iterable[Tuple[str, str]], optional): Activity pairs (a, b) whose relation
+            may have changed. If omitted, the pairs are found by comparing both matrices.
+        path (str, optional): Name of the process, only used in messages.
+
+    Returns:
+        Classification: Stage results for the current relationships.
+    """
+    relations = RelationshipMatrix.coerce(relationships)
+    old = previous.relations
+    if relations.activities != old.activities:
+        return classify_relations(relations, path)
+
+    # Pairs whose relation actually changed
+    if changed_cells is None:
+        rows, cols = changed_pairs(old, relations)
+    else:
+        cells = {(relations.index[a], relations.index[b]) for a, b in changed_cells if a != b}
+        cells = [(i, j) for i, j in cells
+                 if old.relation(old.activities[i], old.activities[j]) !=
+                 relations.relation(relations.activities[i], relations.activities[j])]
+        rows = np.array([i for i, _ in cells], dtype=np.intp)
+        cols = np.array([j for _, j in cells], dtype=np.intp)
+
+    if len(rows) == 0:
+        return Classification(
+            relations, previous.blocks, previous.super_blocks, previous.final_score, previous.details, ()
+        )
+
+    recomputed = []
+
+    # Blocks
+    old_classes = block_relation_classes(old.temporal[rows, cols], old.existential[rows, cols])
+    new_classes = block_relation_classes(relations.temporal[rows, cols], relations.existential[rows, cols])
+    if np.array_equal(old_classes, new_classes):
+        blocks = previous.blocks
+    else:
+        blocks = detect_blocks(relations)
+        recomputed.append("blocks")
+
+    # Super-blocks
+    directly_changed = (old.temporal[rows, cols] == T_DIRECTLY_BEFORE) != \
+        (relations.temporal[rows, cols] == T_DIRECTLY_BEFORE)
+    if blocks == previous.blocks and not directly_changed.any():
+        super_blocks = previous.super_blocks
+    else:
+        super_blocks = build_super_blocks(blocks, relations)
+        recomputed.append("super_blocks")
+
+    # Score, taking over the refinement terms that read no changed pair
+    reuse = {}
+    if super_blocks == previous.super_blocks:
+        outsiders = previous.details[2]
+        cells = [(relations.activities[i], relations.activities[j]) for i, j in zip(rows, cols)]
+        affected = _affected_refinements(super_blocks, outsiders, cells)
+        reuse = {key: value for key, value in previous.refinement_terms().items() if key not in affected}
+    final_score, details = score_process(path, relations, super_blocks, reuse=reuse)
+
+    result = Classification(relations, blocks, super_blocks, final_score, details)
+    recomputed.extend(key for key in result.refinement_terms() if key not in reuse)
+    result.recomputed = tuple(recomputed)
+    return result
@@ -0,0 +1,498 @@
+import json
+import os
+import re
+import struct
+import tempfile
+
+import numpy as np
+import yaml
+
+from relationship_matrix import RelationshipMatrix, MatrixBuilder, check_dense_row
+
+# ----------------------------------------------------------------------
+# Sparse JSON format
+# ----------------------------------------------------------------------
+#
+# {"format": SPARSE_FORMAT, "version": SPARSE_VERSION,
+#  "activities": [...],
+#  "relations": {"a": {"b": "<d,=>", ...}, ...}}
+#
+# Only pairs whose relation differs from SPARSE_DEFAULT are listed. The dense format maps
+# every activity to a dict, so the string-valued "format" key tells both formats apart.
+
+SPARSE_FORMAT = "sparse-relationships"
+SPARSE_VERSION = 1
+SPARSE_DEFAULT = "-,-"
+
+
+def is_sparse_document(data):
+    """True if a parsed JSON document is in the sparse format."""
+    return isinstance(data, dict) and data.get("format") == SPARSE_FORMAT
+
+
+def matrix_from_sparse(data):
+    """
+    Build a relationship matrix from a parsed sparse JSON document.
+
+    The code arrays start out as all "-,-" (code 0), so only the listed pairs are parsed
+    and written.
+
+    Args:
+        data (Dict): Sparse document, see the format description above.
+
+    Returns:
+        RelationshipMatrix: The coded matrix.
+    """
+    version = data.get("version")
+    if version != SPARSE_VERSION:
+        raise ValueError(f"Unsupported sparse relationship format version {version}")
+    activities = data["activities"]
+    rows = data.get("relations", {})
+    unknown = rows.keys() - set(activities)
+    if unknown:
+        raise ValueError(f"Unknown activities in sparse relationships: {sorted(unknown)}")
+    return RelationshipMatrix.from_rows(activities, rows)
+
+
+def matrix_to_sparse(relations):
+    """
+    Convert a relationship matrix into the sparse JSON document.
+
+    Args:
+        relations (RelationshipMatrix): Relationships to convert.
+
+    Returns:
+        Dict: Sparse document listing all pairs that are not "-,-".
+    """
+    non_default = (relations.temporal != 0) | (relations.existential != 0)
+    np.fill_diagonal(non_default, False)
+
+    acts = relations.activities
+    rows = {}
+    for i, j in zip(*np.nonzero(non_default)):
+        rows.setdefault(acts[i], {})[acts[j]] = ",".join(relations.relation(acts[i], acts[j]))
+    return {
+        "format": SPARSE_FORMAT,
+        "version": SPARSE_VERSION,
+        "activities": list(acts),
+        "relations": rows,
+    }
+
+
+def write_sparse_relationships(relations, out_path):
+    """
+    Write a relationship matrix in the sparse JSON format.
+
+    Args:
+        relations (RelationshipMatrix): Relationships to write.
+        out_path (str or Path): Output JSON path.
+    """
+    with open(out_path, "w", encoding="utf-8") as fh:
+        json.dump(matrix_to_sparse(relations), fh, indent=2, ensure_ascii=False)
+
+
+# ----------------------------------------------------------------------
+# AR-matrix YAML export
+# ----------------------------------------------------------------------
+
+YAML_SUFFIXES = (".yaml", ".yml")
+YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+# Unicode mapping used by the AR-matrix export
+SYMBOL_MAP = {
+    "≺": "<",
+    "≻": ">",
+    "⇔": "<=>",
+    "⇎": "</=>",
+}
+
+
+def normalize_symbol(s, remove_t=False):
+    """
+    Normalize a single temporal/existential symbol:
+      - optionally remove 't' for temporal dependencies
+      - replace unicode symbols by ASCII equivalents
+      - return '-' if empty after cleaning
+    """
+    s = (s or "").strip()
+    if remove_t:
+        s = s.replace("t", "")
+    for old, new in SYMBOL_MAP.items():
+        s = s.replace(old, new)
+    return s if s else "-"
+
+
+def load_yaml_sparse(yaml_path):
+    """
+    Read an activity-relationship matrix exported as YAML into the sparse
+    JSON format, which only lists pairs that are not "-,-".
+
+    Rules:
+      - Activities:
+          * infer from metadata.activities
+      - For each dependency (a -> b):
+          * temporal  = normalized symbol (remove 't'), or '-'
+          * existential = normalized symbol, or '-'
+          * relation = "{temporal},{existential}"
+      - All other pairs are implicitly "-,-"
+    """
+    # Load YAML, with the C LibYAML loader if PyYAML was built with it
+    with open(yaml_path, "r", encoding="utf-8") as f:
+        data = yaml.load(f, Loader=YAML_LOADER) or {}
+
+    deps = data.get("dependencies", []) or []
+
+    # Collect activities
+    activities = data.get("metadata", {}).get("activities", [])
+    known = set(activities)
+
+    # Apply dependencies
+    relations = {}
+    for d in deps:
+        a = d.get("from")
+        b = d.get("to")
+        if a not in known or b not in known:
+            continue
+
+        temporal = normalize_symbol(d.get("temporal", {}).get("symbol", ""), remove_t=True)
+        existential = normalize_symbol(d.get("existential", {}).get("symbol", ""), remove_t=False)
+
+        relation = f"{temporal},{existential}"
+        if relation == SPARSE_DEFAULT:
+            # A later dependency may reset an earlier one to the default
+            relations.get(a, {}).pop(b, None)
+        else:
+            relations.setdefault(a, {})[b] = relation
+
+    return {
+        "format": SPARSE_FORMAT,
+        "version": SPARSE_VERSION,
+        "activities": activities,
+        "relations": {a: row for a, row in relations.items() if row},
+    }
+
+
+def is_yaml_matrix(path):
+    """True if `path` has the file extension of an AR-matrix YAML export."""
+    return os.path.splitext(str(path))[1].lower() in YAML_SUFFIXES
+
+
+def load_yaml_relationships(yaml_path):
+    """
+    Load an AR-matrix YAML export directly into a RelationshipMatrix.
+
+    Args:
+        yaml_path (str or Path): Path to the YAML file.
+
+    Returns:
+        RelationshipMatrix: Coded relationships, the same as for the converted JSON file.
+    """
+    return matrix_from_sparse(load_yaml_sparse(yaml_path))
+
+
+# ----------------------------------------------------------------------
+# Binary format
+# ----------------------------------------------------------------------
+#
+# Layout (all integers little-endian):
+#   magic      8 bytes   BINARY_MAGIC
+#   version    uint32    BINARY_VERSION
+#   table_len  uint32    length of the UTF-8 JSON table that follows
+#   table      JSON      {"activities": [...], "temporal_symbols": [...], "existential_symbols": [...]}
+#   padding    zeros up to the next multiple of BINARY_ALIGNMENT
+#   temporal   |A|*|A| uint8 codes, row-major
+#   existential |A|*|A| uint8 codes, row-major
+#
+# The codes are the indices into the symbol tables, exactly as in RelationshipMatrix.
+
+BINARY_MAGIC = b"RELMATRX"
+BINARY_VERSION = 1
+BINARY_SUFFIX = ".relm"
+BINARY_ALIGNMENT = 64
+
+_PREAMBLE = struct.Struct("<8sII")
+
+
+def is_binary_matrix(path):
+    """True if the file at `path` starts with the magic bytes of the binary matrix format."""
+    with open(path, "rb") as fh:
+        return fh.read(len(BINARY_MAGIC)) == BINARY_MAGIC
+
+
+def write_binary_relationships(relations, out_path):
+    """
+    Write a relationship matrix in the binary format, written atomically.
+
+    Args:
+        relations (RelationshipMatrix): Relationships to write.
+        out_path (str or Path): Output path (by convention with suffix BINARY_SUFFIX).
+    """
+    table = json.dumps(
+        {
+            "activities": relations.activities,
+            "temporal_symbols": list(relations.temporal_symbols),
+            "existential_symbols": list(relations.existential_symbols),
+        },
+        ensure_ascii=False,
+        separators=(",", ":"),
+    ).encode("utf-8")
+    header_len = _PREAMBLE.size + len(table)
+    padding = -header_len % BINARY_ALIGNMENT
+
+    directory = os.path.dirname(os.path.abspath(out_path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as fh:
+            fh.write(_PREAMBLE.pack(BINARY_MAGIC, BINARY_VERSION, len(table)))
+            fh.write(table)
+            fh.write(b"\0" * padding)
+            fh.write(np.ascontiguousarray(relations.temporal, dtype=np.uint8).tobytes())
+            fh.write(np.ascontiguousarray(relations.existential, dtype=np.uint8).tobytes())
+        os.replace(tmp_path, out_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def load_binary_relationships(path):
+    """
+    Open a relationship matrix stored in the binary format.
+
+    The code arrays are read-only memory maps of the file, so nothing but the activity table
+    is parsed or copied on load, and processes opening the same file share its page cache.
+
+    Args:
+        path (str or Path): Path to the binary file.
+
+    Returns:
+        RelationshipMatrix: Coded relationships backed by the file.
+    """
+    with open(path, "rb") as fh:
+        preamble = fh.read(_PREAMBLE.size)
+        if len(preamble) < _PREAMBLE.size:
+            raise ValueError(f"Truncated relationship matrix file: {path}")
+        magic, version, table_len = _PREAMBLE.unpack(preamble)
+        if magic != BINARY_MAGIC:
+            raise ValueError(f"Not a binary relationship matrix: {path}")
+        if version != BINARY_VERSION:
+            raise ValueError(f"Unsupported binary relationship matrix version {version} in {path}")
+        table = json.loads(fh.read(table_len).decode("utf-8"))
+
+    n = len(table["activities"])
+    header_len = _PREAMBLE.size + table_len
+    offset = header_len + (-header_len % BINARY_ALIGNMENT)
+    if os.path.getsize(path) != offset + 2 * n * n:
+        raise ValueError(f"Truncated relationship matrix file: {path}")
+
+    if n == 0:
+        codes = np.zeros((2, 0, 0), dtype=np.uint8)
+    else:
+        codes = np.memmap(path, dtype=np.uint8, mode="r", offset=offset, shape=(2, n, n))
+    return RelationshipMatrix(
+        table["activities"],
+        codes[0],
+        codes[1],
+        temporal_symbols=table["temporal_symbols"],
+        existential_symbols=table["existential_symbols"],
+    )
+
+
+# ----------------------------------------------------------------------
+# Streaming reader for the dense JSON format
+# ----------------------------------------------------------------------
+
+# Bytes read from the file at once
+STREAM_CHUNK_SIZE = 1 << 20
+
+_WHITESPACE = re.compile(rb"[ \t\n\r]*")
+_STRING = re.compile(rb'"(?:[^"\\]|\\.)*"')
+
+
+class _NotDense(Exception):
+    """
+    Raised by the row scanner if the document is not a dense matrix of flat rows, e.g. in the
+    sparse format. Such documents are loaded with json.load, which also reports malformed JSON.
+    """
+
+
+class _RowScanner:
+    """
+    Splits a dense relationship JSON object {"a": {...}, "b": {...}, ...} into its rows.
+
+    The file is read in chunks and only the current row is held in memory. Rows are located
+    by their closing brace and validated by decoding them, so a brace inside an activity
+    label just extends the row to the next brace. Since UTF-8 never encodes other
+    characters with ASCII bytes, scanning the raw bytes is safe.
+    """
+
+    def __init__(self, fh, chunk_size=STREAM_CHUNK_SIZE):
+        self.fh = fh
+        self.chunk_size = chunk_size
+        self.buf = b""
+        # Read position in buf
+        self.pos = 0
+        self.eof = False
+
+    def _more(self):
+        # Drop the consumed prefix and append the next chunk, False at the end of the file
+        if self.eof:
+            return False
+        self.buf = self.buf[self.pos:]
+        self.pos = 0
+        chunk = self.fh.read(max(self.chunk_size, len(self.buf)))
+        if not chunk:
+            self.eof = True
+            return False
+        self.buf += chunk
+        return True
+
+    def _peek(self):
+        # Skip whitespace and return the next byte, b"" at the end of the file
+        while True:
+            self.pos = _WHITESPACE.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf) or not self._more():
+                return self.buf[self.pos:self.pos + 1]
+
+    def _expect(self, token):
+        if self._peek() != token:
+            raise _NotDense()
+        self.pos += 1
+
+    def _string(self):
+        self._expect(b'"')
+        self.pos -= 1
+        while True:
+            m = _STRING.match(self.buf, self.pos)
+            if m is not None:
+                self.pos = m.end()
+                return json.loads(m.group())
+            if not self._more():
+                raise _NotDense()
+
+    def _row(self):
+        search = 0
+        while True:
+            end = self.buf.find(b"}", self.pos + search)
+            if end < 0:
+                search = len(self.buf) - self.pos
+                if not self._more():
+                    raise _NotDense()
+                continue
+            try:
+                row = json.loads(self.buf[self.pos:end + 1])
+            except json.JSONDecodeError as e:
+                if not e.msg.startswith("Unterminated string"):
+                    # Nested objects (e.g. the sparse format) or malformed JSON
+                    raise _NotDense() from e
+                # The brace belongs to a string, continue after it
+                search = end + 1 - self.pos
+                continue
+            self.pos = end + 1
+            return row
+
+    def __iter__(self):
+        """
+        Yield every row of the document.
+
+        Returns:
+            Iterator[Tuple[str, Dict[str, str]]]: Activity and its decoded row.
+        """
+        if self._peek() != b"{":
+            raise _NotDense()
+        self.pos += 1
+        if self._peek() == b"}":
+            self.pos += 1
+        else:
+            while True:
+                activity = self._string()
+                self._expect(b":")
+                if self._peek() != b"{":
+                    raise _NotDense()
+                yield activity, self._row()
+                if self._peek() == b"}":
+                    self.pos += 1
+                    break
+                self._expect(b",")
+        if self._peek() != b"":
+            raise _NotDense()
+
+
+def stream_relationships(path, chunk_size=STREAM_CHUNK_SIZE):
+    """
+    Read a relationship JSON file row by row into a RelationshipMatrix.
+
+    Each row is coded as soon as it has been read, so apart from the current row only the
+    uint8 codes are kept in memory and the nested dict of relation strings is never built.
+    Rows are coded against all labels seen so far and aligned to the final activity order
+    at the end. The result, including the KeyError for a missing pair or an unknown column,
+    is the same as RelationshipMatrix.from_dict on the parsed file.
+    Documents that are not dense matrices (the sparse format) are loaded as a whole.
+
+    Args:
+        path (str or Path): Path to the JSON file.
+        chunk_size (int): Bytes read from the file at once.
+
+    Returns:
+        RelationshipMatrix: Coded relationships between activities.
+    """
+    # Only used to code relation strings and collect their symbols
+    coder = MatrixBuilder([])
+    # Column of every label seen so far, coded rows per activity
+    labels = {}
+    rows = {}
+
+    with open(path, "rb") as fh:
+        try:
+            for a, row in _RowScanner(fh, chunk_size):
+                labels.setdefault(a, len(labels))
+                cols, temp_codes, exist_codes = [], [], []
+                for b, value in row.items():
+                    if b == a:
+                        continue
+                    temp, exist = coder.parse(value, a, b)
+                    cols.append(labels.setdefault(b, len(labels)))
+                    temp_codes.append(temp)
+                    exist_codes.append(exist)
+                temporal = np.zeros(len(labels), dtype=np.uint8)
+                existential = np.zeros(len(labels), dtype=np.uint8)
+                listed = np.zeros(len(labels), dtype=bool)
+                temporal[cols] = temp_codes
+                existential[cols] = exist_codes
+                listed[cols] = True
+                # Like json.load, a repeated key keeps its first position and its last row
+                rows[a] = (temporal, existential, listed)
+        except _NotDense:
+            fh.seek(0)
+            data = json.load(fh)
+            if is_sparse_document(data):
+                return matrix_from_sparse(data)
+            return RelationshipMatrix.from_dict(data)
+
+    # Align all rows to the activity order
+    activities = list(rows)
+    n = len(activities)
+    columns = np.array([labels[a] for a in activities], dtype=np.intp)
+    temporal = np.zeros((n, n), dtype=np.uint8)
+    existential = np.zeros((n, n), dtype=np.uint8)
+    for i, (temp_row, exist_row, listed) in enumerate(rows.values()):
+        known = columns < len(temp_row)
+        temporal[i, known] = temp_row[columns[known]]
+        existential[i, known] = exist_row[columns[known]]
+        # Like from_dict, a row must list every other activity and nothing else
+        if listed.sum() != n - 1 or listed[columns[known]].sum() != n - 1:
+            names = list(labels)
+            index = {a: j for j, a in enumerate(activities)}
+            check_dense_row(activities[i], {names[j] for j in np.flatnonzero(listed)}, index)
+    np.fill_diagonal(temporal, 0)
+    np.fill_diagonal(existential, 0)
+
+    return RelationshipMatrix(
+        activities,
+        temporal,
+        existential,
+        temporal_symbols=coder.temporal_symbols,
+        existential_symbols=coder.existential_symbols,
+    )
+
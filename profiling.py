@@ -0,0 +1,114 @@
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+# Profile collecting the measurements of the current run, None while profiling is off
+_current = None
+
+
+class Profile:
+    """
+    Wall time per stage and work counters of one run (see `profiling`).
+
+    Stage times are inclusive: the time of a stage called within another stage (e.g.
+    reduce_branches_to_only_XOR within get_xor_blocks) is also part of the outer stage.
+    Recursive calls of a stage are only timed once, by the outermost call.
+
+    Attributes:
+        seconds (Dict[str, float]): Wall time per stage.
+        calls (Counter): Number of (outermost) calls per stage.
+        counters (Counter): Work counters, e.g. candidate blocks or scored pairs.
+    """
+
+    def __init__(self):
+        self.seconds = {}
+        self.calls = Counter()
+        self.counters = Counter()
+        self._depth = Counter()
+
+    def to_dict(self):
+        """JSON-serializable view with "stages" (seconds and calls per stage) and "counters"."""
+        return {
+            "stages": {
+                name: {"seconds": round(seconds, 6), "calls": self.calls[name]}
+                for name, seconds in self.seconds.items()
+            },
+            "counters": dict(self.counters),
+        }
+
+
+class _Timer:
+    __slots__ = ("profile", "name", "start")
+
+    def __init__(self, profile, name):
+        self.profile = profile
+        self.name = name
+
+    def __enter__(self):
+        self.profile._depth[self.name] += 1
+        if self.profile._depth[self.name] == 1:
+            self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        depth = self.profile._depth
+        depth[self.name] -= 1
+        if depth[self.name] == 0:
+            seconds = self.profile.seconds
+            seconds[self.name] = seconds.get(self.name, 0.0) + time.perf_counter() - self.start
+            self.profile.calls[self.name] += 1
+        return False
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+def timed(name):
+    """
+    Context manager adding the wall time of the enclosed code to stage `name`.
+
+    While profiling is off, a shared no-op context manager is returned.
+    """
+    if _current is None:
+        return _NULL_TIMER
+    return _Timer(_current, name)
+
+
+def count(name, n=1):
+    """Add `n` to work counter `name`, no-op while profiling is off."""
+    if _current is not None:
+        _current.counters[name] += n
+
+
+@contextmanager
+def profiling(enabled=True):
+    """
+    Collect the stage times and work counters of the enclosed code.
+
+    Profiles are per process, worker processes profile the files they classify.
+
+    Args:
+        enabled (bool): If False, nothing is measured and None is yielded.
+
+    Yields:
+        Profile or None: The profile of the enclosed code.
+    """
+    global _current
+    if not enabled:
+        yield None
+        return
+    previous = _current
+    _current = Profile()
+    try:
+        yield _current
+    finally:
+        _current = previous
@@ -0,0 +1,177 @@
+import numpy as np
+
+
+def bitsets_from_mask(mask):
+    """
+    Convert the rows of a boolean adjacency mask into integer bitsets.
+    Bit j of the i-th bitset is set if mask[i, j] is True.
+
+    Args:
+        mask (np.ndarray): Boolean mask of shape (n, n).
+
+    Returns:
+        List[int]: Bitset of each row.
+    """
+    packed = np.packbits(np.asarray(mask, dtype=bool), axis=1, bitorder="little")
+    return [int.from_bytes(row.tobytes(), "little") for row in packed]
+
+
+def iter_bits(bitset):
+    """
+    Iterate over the indices of all set bits of a bitset in ascending order.
+
+    Args:
+        bitset (int): Bitset.
+
+    Returns:
+        Iterator[int]: Indices of set bits.
+    """
+    while bitset:
+        low = bitset & -bitset
+        yield low.bit_length() - 1
+        bitset ^= low
+
+
+class ReachabilityIndex:
+    """
+    Predecessor/successor index over the temporal order of a relationship matrix.
+
+    Built once per matrix (see RelationshipMatrix.reachability) from the "<"/"<d" relations.
+    The (direct) successors and predecessors of each activity are stored as deduplicated
+    integer bitsets in matrix order, so that membership checks are single bit tests and
+    earliest/latest selections over a node set only need a few bitwise operations.
+
+    Attributes:
+        activities (List[str]): Activity labels in matrix order.
+        index (Dict[str, int]): Mapping from activity label to bit position.
+        succ_bits (List[int]): Successors ("<" or "<d") of each activity.
+        pred_bits (List[int]): Predecessors of each activity.
+        direct_succ_bits (List[int]): Direct successors ("<d") of each activity.
+        direct_pred_bits (List[int]): Direct predecessors of each activity.
+    """
+
+    def __init__(self, activities, precedes, directly_precedes):
+        self.activities = list(activities)
+        self.index = {act: i for i, act in enumerate(self.activities)}
+
+        precedes = np.asarray(precedes, dtype=bool)
+        directly_precedes = np.asarray(directly_precedes, dtype=bool)
+        self.succ_bits = bitsets_from_mask(precedes)
+        self.pred_bits = bitsets_from_mask(precedes.T)
+        self.direct_succ_bits = bitsets_from_mask(directly_precedes)
+        self.direct_pred_bits = bitsets_from_mask(directly_precedes.T)
+
+        # (activity, allowed bitset) -> first allowed predecessor
+        self._first_pred_memo = {}
+
+    @classmethod
+    def from_matrix(cls, relations):
+        """
+        Build the index from the precedence masks of a relationship matrix.
+
+        Args:
+            relations (RelationshipMatrix): Coded relations between activities.
+
+        Returns:
+            ReachabilityIndex: The index.
+        """
+        return cls(relations.activities, relations.precedes_mask, relations.directly_precedes_mask)
+
+    def bits(self, nodes):
+        """Bitset of a collection of activities."""
+        bits = 0
+        for node in nodes:
+            bits |= 1 << self.index[node]
+        return bits
+
+    def names(self, bits):
+        """Activities of a bitset in matrix order."""
+        return [self.activities[i] for i in iter_bits(bits)]
+
+    def adjacency(self):
+        """
+        Deduplicated (direct) predecessor and successor lists of every activity.
+
+        Returns:
+            Tuple[Dict[str, List[str]], ...]: preds, succs, direct_preds and direct_succs,
+                each listing the related activities in matrix order.
+        """
+        return tuple(
+            {act: self.names(row[i]) for i, act in enumerate(self.activities)}
+            for row in (self.pred_bits, self.succ_bits, self.direct_pred_bits, self.direct_succ_bits)
+        )
+
+    def first_allowed_pred(self, x, allowed):
+        """
+        Walk backwards from x through allowed predecessors, see utils.find_first_allowed_pred.
+
+        The walk is iterative and stops on cycles. Results are memoized per set of allowed
+        activities for every activity on the walk.
+
+        Args:
+            x (str): Activity to start from.
+            allowed (Iterable[str]): Allowed predecessors.
+
+        Returns:
+            str: First allowed predecessor found, or x.
+        """
+        allowed_bits = self.bits(allowed)
+        memo = self._first_pred_memo
+        result = memo.get((x, allowed_bits))
+        if result is not None:
+            return result
+
+        walk = []
+        visited = 0
+        i = self.index[x]
+        cycle = False
+        while True:
+            walk.append(i)
+            visited |= 1 << i
+            if allowed_bits >> i & 1 and not self.pred_bits[i]:
+                break
+            allowed_preds = self.pred_bits[i] & allowed_bits
+            if not allowed_preds:
+                break
+            # First allowed predecessor in matrix order
+            p = (allowed_preds & -allowed_preds).bit_length() - 1
+            if visited >> p & 1:
+                cycle = True
+                break
+            i = p
+
+        result = self.activities[i]
+        # Every activity on an acyclic walk leads to the same result
+        for j in (walk[:1] if cycle else walk):
+            memo[(self.activities[j], allowed_bits)] = result
+        return result
+
+    def earliest(self, nodes):
+        """
+        Nodes that do not follow any other node of the set.
+
+        Args:
+            nodes (Iterable[str]): Nodes to check.
+
+        Returns:
+            set: Subset of nodes that are earliest.
+        """
+        nodes = set(nodes)
+        followers = 0
+        for node in nodes:
+            followers |= self.succ_bits[self.index[node]]
+        return {node for node in nodes if not followers >> self.index[node] & 1}
+
+    def latest(self, nodes):
+        """
+        Nodes that are not followed by any other node of the set.
+
+        Args:
+            nodes (Iterable[str]): Nodes to check.
+
+        Returns:
+            set: Subset of nodes that are latest.
+        """
+        nodes = set(nodes)
+        node_bits = self.bits(nodes)
+        return {node for node in nodes if not self.succ_bits[self.index[node]] & node_bits}
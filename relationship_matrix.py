@@ -0,0 +1,466 @@
+from collections.abc import Mapping
+
+import numpy as np
+
+from reachability import ReachabilityIndex, bitsets_from_mask, iter_bits
+
+# Known relation symbols. The position of a symbol is its integer code, so the
+# codes below are stable across all matrices.
+TEMPORAL_SYMBOLS = ("-", "<", "<d", ">", ">d")
+EXISTENTIAL_SYMBOLS = ("-", "=>", "<=", "<=>", "</=>", "∧", "v")
+
+# Temporal codes
+T_NONE = 0              # no temporal ordering
+T_BEFORE = 1            # a before b
+T_DIRECTLY_BEFORE = 2   # a directly before b
+T_AFTER = 3             # a after b
+T_DIRECTLY_AFTER = 4    # a directly after b
+
+# Existential codes
+E_NONE = 0              # fully independent
+E_IMPLIES = 1           # a implies b (leads-to)
+E_IMPLIED_BY = 2        # b implies a (precedes)
+E_CO_OCCURRENCE = 3     # a and b always co-occur
+E_NON_CO_OCCURRENCE = 4 # a and b never co-occur
+E_NAND = 5
+E_OR = 6
+
+# Maximum number of distinct symbols per relation type, as codes are stored as uint8
+MAX_SYMBOLS = 256
+
+
+def check_dense_row(a, columns, index):
+    """
+    Check that the row of activity `a` of a dense matrix lists every other activity and
+    nothing else (the diagonal entry is optional).
+
+    Args:
+        a (str): Activity of the row.
+        columns (Collection[str]): Distinct activities listed in the row.
+        index (Dict[str, int]): Position of every activity of the matrix.
+
+    Raises:
+        KeyError: For the first unknown column or missing pair.
+    """
+    for b in columns:
+        if b not in index:
+            raise KeyError(f"Unknown activity '{b}' in the row of '{a}'")
+    if len(columns) - (a in columns) < len(index) - 1:
+        missing = next(b for b in index if b != a and b not in columns)
+        raise KeyError(f"Missing relation for activity pair ({a}, {missing})")
+
+
+class RelationshipMatrix(Mapping):
+    """
+    Pairwise temporal and existential relationships between activities, stored as
+    two integer-coded |A|x|A| NumPy arrays plus an activity index.
+
+    The matrix is parsed once (see utils.load_relationships) and then shared by
+    block detection, super-block aggregation and scoring. Each cell holds a code
+    into `temporal_symbols` / `existential_symbols`; the first codes are the known
+    symbols (see T_* and E_* above), symbols that are not known are appended per
+    matrix so that they survive a round trip unchanged.
+
+    For backwards compatibility the matrix also behaves like the nested dict it
+    replaces: `matrix[a][b]` returns the relation string "<temporal>,<existential>".
+
+    Attributes:
+        activities (List[str]): Activity labels in matrix order.
+        index (Dict[str, int]): Mapping from activity label to row/column index.
+        temporal (np.ndarray): uint8 array of temporal codes, shape (|A|, |A|).
+        existential (np.ndarray): uint8 array of existential codes, shape (|A|, |A|).
+        temporal_symbols (Tuple[str]): Temporal symbol for each code.
+        existential_symbols (Tuple[str]): Existential symbol for each code.
+    """
+
+    def __init__(self, activities, temporal, existential,
+                 temporal_symbols=TEMPORAL_SYMBOLS, existential_symbols=EXISTENTIAL_SYMBOLS):
+        self.activities = list(activities)
+        self.index = {act: i for i, act in enumerate(self.activities)}
+        if len(self.index) != len(self.activities):
+            raise ValueError("Activity labels of a relationship matrix must be unique")
+
+        n = len(self.activities)
+        self.temporal = np.asarray(temporal, dtype=np.uint8)
+        self.existential = np.asarray(existential, dtype=np.uint8)
+        if self.temporal.shape != (n, n) or self.existential.shape != (n, n):
+            raise ValueError(f"Relationship arrays must have shape ({n}, {n})")
+
+        self.temporal_symbols = tuple(temporal_symbols)
+        self.existential_symbols = tuple(existential_symbols)
+
+        # Lazily computed masks and indices derived from the code arrays
+        self._derived = {}
+
+    @classmethod
+    def from_dict(cls, relationships):
+        """
+        Build a relationship matrix from the nested JSON dict format.
+
+        Each distinct relation string is split only once; all cells are then filled
+        with integer codes. Diagonal entries (usually "TODO") are ignored. Every other
+        pair must be listed, implicit defaults only apply to the sparse format.
+
+        Args:
+            relationships (Dict[str, Dict[str, str]]): Pairwise relationships encoded
+                as strings like "<d,=>" or "-,<=>" for each activity pair.
+
+        Returns:
+            RelationshipMatrix: The coded matrix.
+
+        Raises:
+            KeyError: If a pair is missing or a row lists an unknown activity.
+        """
+        index = {a: i for i, a in enumerate(relationships)}
+        for a, row in relationships.items():
+            check_dense_row(a, row.keys(), index)
+        return cls.from_rows(list(index), relationships)
+
+    @classmethod
+    def from_rows(cls, activities, rows):
+        """
+        Build a relationship matrix from relation strings of a subset of all pairs.
+
+        Args:
+            activities (List[str]): All activity labels, in matrix order.
+            rows (Dict[str, Dict[str, str]]): Relation strings per activity pair. Pairs that
+                are not listed are fully independent ("-,-").
+
+        Returns:
+            RelationshipMatrix: The coded matrix.
+        """
+        builder = MatrixBuilder(activities)
+
+        for a, row in rows.items():
+            builder.set_row(a, row)
+
+        return builder.build()
+
+    @classmethod
+    def coerce(cls, relationships):
+        """
+        Return `relationships` as a RelationshipMatrix, parsing it if it is still a dict.
+
+        Args:
+            relationships (RelationshipMatrix or Dict[str, Dict[str, str]]): Relationships.
+
+        Returns:
+            RelationshipMatrix: The shared coded matrix.
+        """
+        if isinstance(relationships, RelationshipMatrix):
+            return relationships
+        return cls.from_dict(relationships)
+
+    def with_changes(self, changes):
+        """
+        Return a copy of the matrix with the relations of some activity pairs replaced.
+
+        Args:
+            changes (Dict[Tuple[str, str], str]): New relation string (e.g. "<d,=>") per
+                activity pair (a, b). Self-relations are ignored.
+
+        Returns:
+            RelationshipMatrix: The updated matrix, this matrix is left unchanged.
+        """
+        builder = MatrixBuilder.from_matrix(self)
+        for (a, b), value in changes.items():
+            builder.set_row(a, {b: value})
+        return builder.build()
+
+    def without(self, activities):
+        """
+        Return the matrix without some activities, i.e. without their rows and columns.
+
+        The relations of the remaining pairs are sliced out of the code arrays, nothing is
+        parsed again. Pairwise masks that were already derived are sliced as well.
+
+        Args:
+            activities (Iterable[str]): Activities to remove.
+
+        Returns:
+            RelationshipMatrix: Matrix over the remaining activities, in matrix order.
+        """
+        removed = {self.index[a] for a in activities}
+        keep = np.array([i for i in range(len(self.activities)) if i not in removed], dtype=np.intp)
+        cells = np.ix_(keep, keep)
+        matrix = RelationshipMatrix(
+            [self.activities[i] for i in keep], self.temporal[cells], self.existential[cells],
+            self.temporal_symbols, self.existential_symbols,
+        )
+        for key in ("always", "never", "mutually_exclusive", "precedes", "directly_precedes"):
+            if key in self._derived:
+                matrix._derived[key] = self._derived[key][cells]
+        return matrix
+
+    # ------------------------------------------------------------------
+    # Pairwise lookups
+    # ------------------------------------------------------------------
+
+    def temporal_of(self, a, b):
+        """Temporal relation symbol of the activity pair (a, b), e.g. "<d"."""
+        return self.temporal_symbols[self.temporal[self.index[a], self.index[b]]]
+
+    def existential_of(self, a, b):
+        """Existential relation symbol of the activity pair (a, b), e.g. "<=>"."""
+        return self.existential_symbols[self.existential[self.index[a], self.index[b]]]
+
+    def relation(self, a, b):
+        """Tuple (temporal, existential) of relation symbols of the activity pair (a, b)."""
+        i, j = self.index[a], self.index[b]
+        return self.temporal_symbols[self.temporal[i, j]], self.existential_symbols[self.existential[i, j]]
+
+    def always(self, a, b):
+        """True if a and b always co-occur without temporal ordering ("-,<=>")."""
+        return bool(self.always_mask[self.index[a], self.index[b]])
+
+    def never(self, a, b):
+        """True if a and b never co-occur ("-,</=>")."""
+        return bool(self.never_mask[self.index[a], self.index[b]])
+
+    def neighbors(self, a, temporal=None, existential=None):
+        """
+        Activities b holding the given relation codes in (a, b), in matrix order.
+
+        Uses the neighbour index (one bitset per activity and (temporal, existential) code pair),
+        so the cost is proportional to the number of requested code pairs and matches.
+
+        Args:
+            a (str): Activity.
+            temporal (int or Iterable[int], optional): Allowed temporal code(s).
+                If None, any temporal relation is accepted.
+            existential (int or Iterable[int], optional): Allowed existential code(s).
+                If None, any existential relation is accepted.
+
+        Returns:
+            List[str]: Matching activities (never a itself).
+        """
+        return [self.activities[j] for j in iter_bits(self.neighbor_bits(a, temporal, existential))]
+
+    def neighbor_bits(self, a, temporal=None, existential=None):
+        """Bitset (bit j = activity j) of the activities returned by `neighbors`."""
+        neighbor_index = self._cached("neighbors", self._build_neighbor_index)
+        temporal = range(len(self.temporal_symbols)) if temporal is None else np.atleast_1d(temporal)
+        existential = range(len(self.existential_symbols)) if existential is None else np.atleast_1d(existential)
+
+        i = self.index[a]
+        bits = 0
+        for t in temporal:
+            for e in existential:
+                rows = neighbor_index.get((int(t), int(e)))
+                if rows is not None:
+                    bits |= rows[i]
+        return bits
+
+    def _build_neighbor_index(self):
+        # One bitset row per activity for every (temporal, existential) code pair in use
+        codes = self.temporal.astype(np.int32) * MAX_SYMBOLS + self.existential
+        np.fill_diagonal(codes, -1)
+        return {
+            (int(code) // MAX_SYMBOLS, int(code) % MAX_SYMBOLS): bitsets_from_mask(codes == code)
+            for code in np.unique(codes) if code >= 0
+        }
+
+    # ------------------------------------------------------------------
+    # Boolean masks over the whole matrix
+    # ------------------------------------------------------------------
+
+    def mask(self, temporal=None, existential=None):
+        """
+        Boolean |A|x|A| mask of all pairs holding the given relation codes.
+
+        Args:
+            temporal (int or Iterable[int], optional): Allowed temporal code(s).
+                If None, any temporal relation is accepted.
+            existential (int or Iterable[int], optional): Allowed existential code(s).
+                If None, any existential relation is accepted.
+
+        Returns:
+            np.ndarray: Boolean mask, True where the pair matches.
+        """
+        n = len(self.activities)
+        result = np.ones((n, n), dtype=bool)
+        if temporal is not None:
+            result &= np.isin(self.temporal, np.atleast_1d(temporal))
+        if existential is not None:
+            result &= np.isin(self.existential, np.atleast_1d(existential))
+        return result
+
+    def _cached(self, key, compute):
+        if key not in self._derived:
+            self._derived[key] = compute()
+        return self._derived[key]
+
+    @property
+    def always_mask(self):
+        """Mask of all pairs that always co-occur without temporal ordering ("-,<=>")."""
+        return self._cached("always", lambda: self.mask(T_NONE, E_CO_OCCURRENCE))
+
+    @property
+    def never_mask(self):
+        """Mask of all pairs that never co-occur ("-,</=>")."""
+        return self._cached("never", lambda: self.mask(T_NONE, E_NON_CO_OCCURRENCE))
+
+    @property
+    def mutually_exclusive_mask(self):
+        """Mask of all pairs whose existential relation is "</=>" in both directions."""
+        def compute():
+            exclusive = self.existential == E_NON_CO_OCCURRENCE
+            return exclusive & exclusive.T
+        return self._cached("mutually_exclusive", compute)
+
+    @property
+    def precedes_mask(self):
+        """Mask of all pairs (a, b) where a (directly) precedes b ("<" or "<d")."""
+        return self._cached("precedes", lambda: self.mask((T_BEFORE, T_DIRECTLY_BEFORE)))
+
+    @property
+    def directly_precedes_mask(self):
+        """Mask of all pairs (a, b) where a directly precedes b ("<d")."""
+        return self._cached("directly_precedes", lambda: self.mask(T_DIRECTLY_BEFORE))
+
+    @property
+    def reachability(self):
+        """Deduplicated predecessor/successor bitsets and reachability (see ReachabilityIndex)."""
+        return self._cached("reachability", lambda: ReachabilityIndex.from_matrix(self))
+
+    def __getstate__(self):
+        # Derived masks and indices are cheap to recompute and not worth pickling
+        state = self.__dict__.copy()
+        state["_derived"] = {}
+        return state
+
+    # ------------------------------------------------------------------
+    # Mapping interface (nested dict compatibility)
+    # ------------------------------------------------------------------
+
+    def __getitem__(self, a):
+        return _RelationRow(self, self.index[a])
+
+    def __iter__(self):
+        return iter(self.activities)
+
+    def __len__(self):
+        return len(self.activities)
+
+    def __contains__(self, a):
+        return a in self.index
+
+    def __repr__(self):
+        return f"RelationshipMatrix({len(self.activities)} activities)"
+
+    def to_dict(self):
+        """
+        Convert the matrix back into the nested JSON dict format.
+
+        Returns:
+            Dict[str, Dict[str, str]]: Relation strings "<temporal>,<existential>"
+                for each activity pair, with "TODO" on the diagonal.
+        """
+        return {a: dict(self[a]) for a in self.activities}
+
+
+class _RelationRow(Mapping):
+    """Read-only view on one matrix row that yields relation strings like "<d,=>"."""
+
+    def __init__(self, matrix, row):
+        self._matrix = matrix
+        self._row = row
+
+    def __getitem__(self, b):
+        m = self._matrix
+        col = m.index[b]
+        if col == self._row:
+            return "TODO"
+        return f"{m.temporal_symbols[m.temporal[self._row, col]]},{m.existential_symbols[m.existential[self._row, col]]}"
+
+    def __iter__(self):
+        return iter(self._matrix.activities)
+
+    def __len__(self):
+        return len(self._matrix.activities)
+
+
+class MatrixBuilder:
+    """
+    Incrementally fills the code arrays of a RelationshipMatrix.
+
+    Relation strings are parsed once per distinct value, symbols that are not known
+    are appended to the symbol tables of the resulting matrix.
+    """
+
+    def __init__(self, activities):
+        self.activities = list(activities)
+        self.index = {act: i for i, act in enumerate(self.activities)}
+        n = len(self.activities)
+        self.temporal = np.zeros((n, n), dtype=np.uint8)
+        self.existential = np.zeros((n, n), dtype=np.uint8)
+        self.temporal_symbols = list(TEMPORAL_SYMBOLS)
+        self.existential_symbols = list(EXISTENTIAL_SYMBOLS)
+        self._temporal_codes = {s: c for c, s in enumerate(TEMPORAL_SYMBOLS)}
+        self._existential_codes = {s: c for c, s in enumerate(EXISTENTIAL_SYMBOLS)}
+        # Cache of relation string -> (temporal code, existential code)
+        self._parsed = {}
+
+    @classmethod
+    def from_matrix(cls, matrix):
+        """Builder starting from a copy of the codes and symbol tables of an existing matrix."""
+        builder = cls([])
+        builder.activities = list(matrix.activities)
+        builder.index = dict(matrix.index)
+        builder.temporal = np.array(matrix.temporal, dtype=np.uint8)
+        builder.existential = np.array(matrix.existential, dtype=np.uint8)
+        builder.temporal_symbols = list(matrix.temporal_symbols)
+        builder.existential_symbols = list(matrix.existential_symbols)
+        builder._temporal_codes = {s: c for c, s in enumerate(builder.temporal_symbols)}
+        builder._existential_codes = {s: c for c, s in enumerate(builder.existential_symbols)}
+        return builder
+
+    def _code(self, symbol, codes, symbols):
+        code = codes.get(symbol)
+        if code is None:
+            code = len(symbols)
+            if code >= MAX_SYMBOLS:
+                raise ValueError(f"Too many distinct relation symbols (> {MAX_SYMBOLS})")
+            codes[symbol] = code
+            symbols.append(symbol)
+        return code
+
+    def parse(self, value, a=None, b=None):
+        """Return the (temporal, existential) codes of a relation string like "<d,=>"."""
+        codes = self._parsed.get(value)
+        if codes is None:
+            parts = value.split(",")
+            if len(parts) != 2:
+                raise ValueError(f"Malformed relation '{value}' for ({a},{b})")
+            temp, exist = parts
+            codes = (
+                self._code(temp, self._temporal_codes, self.temporal_symbols),
+                self._code(exist, self._existential_codes, self.existential_symbols),
+            )
+            self._parsed[value] = codes
+        return codes
+
+    def set_row(self, a, row):
+        """Fill row `a` from a mapping of activity -> relation string."""
+        i = self.index[a]
+        cols, temp_codes, exist_codes = [], [], []
+        for b, value in row.items():
+            j = self.index.get(b)
+            # Ignore self-relations and unknown activities
+            if j is None or j == i:
+                continue
+            temp, exist = self.parse(value, a, b)
+            cols.append(j)
+            temp_codes.append(temp)
+            exist_codes.append(exist)
+        self.temporal[i, cols] = temp_codes
+        self.existential[i, cols] = exist_codes
+
+    def build(self):
+        return RelationshipMatrix(
+            self.activities,
+            self.temporal,
+            self.existential,
+            temporal_symbols=self.temporal_symbols,
+            existential_symbols=self.existential_symbols,
+        )
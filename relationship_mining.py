@@ -0,0 +1,336 @@
+import json
+import os
+import tempfile
+from collections import Counter
+
+import numpy as np
+from lxml import etree
+
+from stage_cache import file_digest
+from matrix_formats import matrix_to_sparse
+from relationship_matrix import (
+    RelationshipMatrix,
+    T_NONE, T_BEFORE, T_DIRECTLY_BEFORE, T_AFTER, T_DIRECTLY_AFTER,
+    E_NONE, E_IMPLIES, E_IMPLIED_BY, E_CO_OCCURRENCE, E_NON_CO_OCCURRENCE,
+)
+
+# XES attribute holding the activity label of an event
+ACTIVITY_KEY = "concept:name"
+
+# Bump whenever the layout of persisted variant tables changes
+VARIANT_TABLE_VERSION = 1
+
+
+def iter_xes_traces(path, activity_key=ACTIVITY_KEY):
+    """
+    Stream the traces of an XES event log as lists of activity labels.
+
+    The log is read incrementally with lxml's iterparse. Every event and trace element is
+    cleared (and detached from the document) as soon as it has been read, so memory use
+    only depends on the length of the current trace, not on the size of the log.
+
+    Args:
+        path (str or Path): Path to the .xes file.
+        activity_key (str): Event attribute holding the activity label.
+
+    Returns:
+        Iterator[List[str]]: Activity labels of each trace in document order.
+    """
+    trace = []
+    for _, elem in etree.iterparse(str(path), events=("end",), tag=("{*}event", "{*}trace")):
+        if etree.QName(elem).localname == "event":
+            for attr in elem:
+                if attr.get("key") == activity_key:
+                    trace.append(attr.get("value"))
+                    break
+        else:
+            yield trace
+            trace = []
+        # Free the element and all already processed siblings
+        elem.clear(keep_tail=False)
+        parent = elem.getparent()
+        if parent is not None:
+            while elem.getprevious() is not None:
+                del parent[0]
+
+
+def count_variants(traces):
+    """
+    Collapse a stream of traces into trace variants.
+
+    Args:
+        traces (Iterable[Sequence[str]]): Activity labels of each trace, e.g. from `iter_xes_traces`.
+
+    Returns:
+        Dict[Tuple[str], int]: Number of traces per variant (activity sequence), in order of first occurrence.
+    """
+    variants = Counter()
+    for trace in traces:
+        variants[tuple(trace)] += 1
+    return dict(variants)
+
+
+def save_variant_table(variants, path, source_digest=None, activity_key=ACTIVITY_KEY):
+    """
+    Persist a variant table as JSON, written atomically.
+
+    Activities are stored once in a table, each variant as list of activity indices with its count.
+
+    Args:
+        variants (Dict[Tuple[str], int]): Number of traces per variant.
+        path (str or Path): Output path of the table.
+        source_digest (str, optional): Digest of the log the variants were extracted from.
+        activity_key (str): Event attribute the activity labels were taken from.
+    """
+    activities = sorted({act for variant in variants for act in variant})
+    index = {act: i for i, act in enumerate(activities)}
+    table = {
+        "version": VARIANT_TABLE_VERSION,
+        "source_digest": source_digest,
+        "activity_key": activity_key,
+        "activities": activities,
+        "variants": [[[index[act] for act in variant], count] for variant, count in variants.items()],
+    }
+
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as fh:
+            json.dump(table, fh, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def load_variant_table(path):
+    """
+    Load a variant table written by `save_variant_table`.
+
+    Args:
+        path (str or Path): Path of the table.
+
+    Returns:
+        Tuple[Dict[Tuple[str], int], Dict]: Number of traces per variant, and the table header
+            ("version", "source_digest", "activity_key").
+    """
+    with open(path, encoding="utf-8") as fh:
+        table = json.load(fh)
+    activities = table["activities"]
+    variants = {tuple(activities[i] for i in variant): count for variant, count in table["variants"]}
+    header = {key: table.get(key) for key in ("version", "source_digest", "activity_key")}
+    return variants, header
+
+
+def extract_variants(xes_path, activity_key=ACTIVITY_KEY, table_path=None):
+    """
+    Stream the trace variants of an XES event log, reusing a persisted variant table if possible.
+
+    If `table_path` holds a table of the same log content (same digest, activity key and table
+    version), the log is not parsed at all. Otherwise the variants are extracted by streaming the
+    log once and, if `table_path` is given, stored there for the next run.
+
+    Args:
+        xes_path (str or Path): Path to the .xes file.
+        activity_key (str): Event attribute holding the activity label.
+        table_path (str or Path, optional): Location of the persisted variant table.
+
+    Returns:
+        Dict[Tuple[str], int]: Number of traces per variant.
+    """
+    digest = None
+    if table_path is not None:
+        digest = file_digest(xes_path)
+        if os.path.exists(table_path):
+            try:
+                variants, header = load_variant_table(table_path)
+            except (OSError, ValueError, KeyError, IndexError, TypeError):
+                # Unreadable tables are rebuilt
+                header = None
+            expected = {"version": VARIANT_TABLE_VERSION, "source_digest": digest, "activity_key": activity_key}
+            if header == expected:
+                return variants
+
+    variants = count_variants(iter_xes_traces(xes_path, activity_key))
+
+    if table_path is not None:
+        save_variant_table(variants, table_path, source_digest=digest, activity_key=activity_key)
+    return variants
+
+
+class RelationshipMiner:
+    """
+    Derives the pairwise temporal and existential relationships of a log in one pass.
+
+    Every trace updates a few |A|x|A| counters, so the miner only keeps the counters and the
+    current trace in memory. For a pair (a, b) of activities:
+
+    - existential: "<=>" if a and b always occur together, "=>" if every trace containing a
+      also contains b, "<=" if every trace containing b also contains a, "</=>" if they never
+      occur in the same trace, and "-" otherwise.
+    - temporal: "<" if in every trace containing both, all occurrences of a precede all
+      occurrences of b, "<d" if in addition b directly follows a in every such trace, ">" and
+      ">d" for the inverse, and "-" otherwise.
+
+    The relations only depend on which activity sequences occur, not on how often. Traces can
+    therefore be added once per trace variant with their multiplicity, so that mining scales with
+    the number of variants rather than the number of cases.
+    """
+
+    def __init__(self):
+        self.activities = []
+        self.index = {}
+        # Number of traces containing an activity / both activities of a pair
+        self._occurrences = np.zeros(0, dtype=np.int64)
+        self._co_occurrences = np.zeros((0, 0), dtype=np.int64)
+        # Number of traces in which all a precede all b, and in which b also directly follows a
+        self._before = np.zeros((0, 0), dtype=np.int64)
+        self._directly_before = np.zeros((0, 0), dtype=np.int64)
+
+    def _grow(self, n):
+        # Enlarge all counters to hold n activities (doubling to amortize reallocations)
+        size = len(self._occurrences)
+        if n <= size:
+            return
+        new_size = max(n, 2 * size, 16)
+        self._occurrences = np.pad(self._occurrences, (0, new_size - size))
+        for name in ("_co_occurrences", "_before", "_directly_before"):
+            setattr(self, name, np.pad(getattr(self, name), ((0, new_size - size), (0, new_size - size))))
+
+    def _activity_indices(self, trace):
+        indices = []
+        for act in trace:
+            i = self.index.get(act)
+            if i is None:
+                i = self.index[act] = len(self.activities)
+                self.activities.append(act)
+            indices.append(i)
+        self._grow(len(self.activities))
+        return np.asarray(indices, dtype=np.intp)
+
+    def add_trace(self, trace, count=1):
+        """
+        Update the relationship counters with one trace.
+
+        Args:
+            trace (Sequence[str]): Activity labels in execution order.
+            count (int): Number of identical traces represented by `trace`.
+        """
+        if len(trace) == 0:
+            return
+        positions = self._activity_indices(trace)
+
+        # First and last position of every distinct activity in the trace
+        acts, first = np.unique(positions, return_index=True)
+        _, last_reversed = np.unique(positions[::-1], return_index=True)
+        last = len(positions) - 1 - last_reversed
+
+        pairs = np.ix_(acts, acts)
+        self._occurrences[acts] += count
+        self._co_occurrences[pairs] += count
+
+        before = last[:, np.newaxis] < first[np.newaxis, :]
+        self._before[pairs] += before * count
+
+        # Directly-follows pairs of the trace (each counted once per trace)
+        directly = np.zeros((len(acts), len(acts)), dtype=bool)
+        local = np.searchsorted(acts, positions)
+        directly[local[:-1], local[1:]] = True
+        self._directly_before[pairs] += (before & directly) * count
+
+    def remove_trace(self, trace, count=1):
+        """
+        Undo `add_trace` for a trace that was added before, e.g. when it leaves a sliding window.
+
+        Args:
+            trace (Sequence[str]): Activity labels in execution order, as they were added.
+            count (int): Number of identical traces to remove.
+        """
+        self.add_trace(trace, -count)
+
+    def add_traces(self, traces):
+        """Update the counters with every trace of an iterable (e.g. `iter_xes_traces`)."""
+        for trace in traces:
+            self.add_trace(trace)
+
+    def add_variants(self, variants):
+        """Update the counters once per variant of a variant table (variant -> number of traces)."""
+        for variant, count in variants.items():
+            self.add_trace(variant, count)
+
+    def to_matrix(self):
+        """
+        Derive the relationship matrix from the counters.
+
+        Returns:
+            RelationshipMatrix: Coded relationships, activities sorted by label. Activities whose
+                traces were all removed again are left out.
+        """
+        order = sorted(
+            (i for i in range(len(self.activities)) if self._occurrences[i] > 0),
+            key=lambda i: self.activities[i]
+        )
+        activities = [self.activities[i] for i in order]
+
+        occurrences = self._occurrences[order]
+        co = self._co_occurrences[np.ix_(order, order)]
+        before = self._before[np.ix_(order, order)]
+        directly_before = self._directly_before[np.ix_(order, order)]
+
+        # Existential relations
+        a_implies_b = co == occurrences[:, np.newaxis]
+        b_implies_a = co == occurrences[np.newaxis, :]
+        existential = np.full(co.shape, E_NONE, dtype=np.uint8)
+        existential[b_implies_a] = E_IMPLIED_BY
+        existential[a_implies_b] = E_IMPLIES
+        existential[a_implies_b & b_implies_a] = E_CO_OCCURRENCE
+        existential[co == 0] = E_NON_CO_OCCURRENCE
+
+        # Temporal relations, only defined for pairs that occur together
+        always_before = (co > 0) & (before == co)
+        always_directly_before = always_before & (directly_before == co)
+        temporal = np.full(co.shape, T_NONE, dtype=np.uint8)
+        temporal[always_before] = T_BEFORE
+        temporal[always_directly_before] = T_DIRECTLY_BEFORE
+        temporal[always_before.T] = T_AFTER
+        temporal[always_directly_before.T] = T_DIRECTLY_AFTER
+
+        np.fill_diagonal(existential, E_NONE)
+        np.fill_diagonal(temporal, T_NONE)
+        return RelationshipMatrix(activities, temporal, existential)
+
+
+def mine_relationships(xes_path, activity_key=ACTIVITY_KEY, variant_table=None):
+    """
+    Mine the relationship matrix of an XES event log.
+
+    The log is streamed once and collapsed into trace variants, the relations are then derived
+    from the variants only (see `extract_variants` for reusing a persisted variant table).
+
+    Args:
+        xes_path (str or Path): Path to the .xes file.
+        activity_key (str): Event attribute holding the activity label.
+        variant_table (str or Path, optional): Location of the persisted variant table.
+
+    Returns:
+        RelationshipMatrix: Coded relationships between all activities of the log.
+    """
+    miner = RelationshipMiner()
+    miner.add_variants(extract_variants(xes_path, activity_key, table_path=variant_table))
+    return miner.to_matrix()
+
+
+def write_relationships(relations, out_path, sparse=False):
+    """
+    Write a relationship matrix in the JSON format read by utils.load_relationships.
+
+    Args:
+        relations (RelationshipMatrix): Relationships to write.
+        out_path (str or Path): Output JSON path.
+        sparse (bool): If True, write the sparse format that only lists pairs other than "-,-".
+    """
+    data = matrix_to_sparse(relations) if sparse else relations.to_dict()
+    with open(out_path, "w", encoding="utf-8") as fh:
+        json.dump(data, fh, indent=2, ensure_ascii=False)
@@ -1,9 +1,12 @@
 
 from itertools import combinations
 from utils import get_super_block_acts
+from relationship_matrix import RelationshipMatrix
 import math
+import numpy as np
 from constants import REFINEMENT_SCORES_OUT_TO_OUT, REFINEMENT_SCORES_OUT_TO_SB, REFINEMENT_SCORES_SB_TO_SB
 from warnings import warn
+from profiling import count, timed
 
 def compute_base_score(super_blocks, all_acts, entropy_penalty=0.4, outsider_penalty_exponent=1.5):
     """
@@ -24,11 +27,13 @@ def compute_base_score(super_blocks, all_acts, entropy_penalty=0.4, outsider_pen
             - "start": start activity (or None)
             - "end": end activity (or None)
         all_acts (list of str): List of all activity names in the full process model.
-        outsider_penalty_exponent (float): Exponent to penalize uncovered activities.
+        entropy_penalty (float or np.ndarray): Weight of the fragmentation (normalized entropy).
+        outsider_penalty_exponent (float or np.ndarray): Exponent to penalize uncovered activities.
             Higher values increase the penalty for uncovered activities.
+            Both parameters may be arrays of a parameter grid, which is scored at once (see calibration.py).
 
     Returns:
-        base_score (float): Structuredness score in [0, 1], higher = more structured.
+        base_score (float or np.ndarray): Structuredness score in [0, 1], higher = more structured.
         outsider_acts (list of str): Activities not covered by any super-block.
         n_sbs_str (str): Explanation string summarizing number of super-blocks.
     """
@@ -47,34 +52,80 @@ def compute_base_score(super_blocks, all_acts, entropy_penalty=0.4, outsider_pen
 
     # Identify uncovered activities
     outsider_acts = all_acts_set - covered_acts
-    total_activity_count = len(all_acts_set)
 
-    # Compute coverage fraction for each super-block
-    coverage_fractions = []
+    base_score = base_score_from_coverage(
+        coverage_counts(super_blocks), len(all_acts_set), entropy_penalty, outsider_penalty_exponent
+    )
+
+    num_blocks = len(super_blocks)
+
+    # Prepare summary explanation based on number of super-blocks
+    if num_blocks == 0:
+        n_sbs_str = "0 SB"
+    elif num_blocks == 1:
+        n_sbs_str = "1 SB"
+    else:
+        n_sbs_str = f"{num_blocks} SB"
+
+    return base_score, outsider_acts, n_sbs_str
+
+
+def coverage_counts(super_blocks):
+    """
+    Number of activities each super-block adds to the coverage of the process.
+
+    Start and end activities count as covered, activities already covered by an earlier
+    super-block are not counted again.
+
+    Args:
+        super_blocks (list of dict): Super-blocks as returned by build_super_blocks.
+
+    Returns:
+        list of int: Newly covered activities per super-block, in order.
+    """
+    counts = []
 
     # Store acts already included in other super-blocks to avoid computing duplicate coverages
     already_covered = set()
     for sb in super_blocks:
-        covered_in_block = sb["activities"].copy()
-        if sb["start"]:
-            covered_in_block.append(sb["start"])
-        if sb["end"]:
-            covered_in_block.append(sb["end"])
+        covered_in_block = set(get_super_block_acts(sb))
+        counts.append(len(covered_in_block - already_covered))
+        already_covered.update(covered_in_block)
+    return counts
 
-        covered_clean = set(covered_in_block) - already_covered
-        already_covered.update(set(covered_in_block))
 
-        coverage_fraction = len(covered_clean) / total_activity_count if total_activity_count else 0.0
-        coverage_fractions.append(coverage_fraction)
+def base_score_from_coverage(counts, total_activity_count, entropy_penalty=0.4, outsider_penalty_exponent=1.5):
+    """
+    Combine the coverage of the super-blocks into the base score (see compute_base_score).
+
+    Only the coverage counts and the number of activities enter the score, so it can be updated
+    for a changed number of activities without looking at the super-blocks again.
+
+    Args:
+        counts (list of int): Newly covered activities per super-block (see coverage_counts).
+        total_activity_count (int): Number of activities in the process.
+        entropy_penalty (float or np.ndarray): Weight of the fragmentation (normalized entropy).
+        outsider_penalty_exponent (float or np.ndarray): Exponent to penalize uncovered activities.
+
+    Returns:
+        float or np.ndarray: Base score.
+    """
+    # Compute coverage fraction for each super-block
+    coverage_fractions = [
+        n_covered / total_activity_count if total_activity_count else 0.0 for n_covered in counts
+    ]
 
     # Compute total process coverage
     total_coverage = sum(coverage_fractions)
 
     # Compute normalized entropy over the coverage fractions to measure fragmentation
-    num_blocks = len(super_blocks)
+    num_blocks = len(counts)
     entropy = 0
     if num_blocks > 1:
         for frac in coverage_fractions:
+            # Super-blocks covered entirely by earlier ones contribute nothing (p * log(p) -> 0)
+            if frac == 0:
+                continue
             p_i = frac / total_coverage
             entropy -= p_i * math.log(p_i)
         entropy = entropy / math.log(num_blocks)
@@ -83,17 +134,95 @@ def compute_base_score(super_blocks, all_acts, entropy_penalty=0.4, outsider_pen
     structure_factor = 1.0 - entropy_penalty * entropy
 
     # Combine structure and coverage with penalty for uncovered activities
-    base_score = structure_factor * (total_coverage ** outsider_penalty_exponent)
+    return structure_factor * (total_coverage ** outsider_penalty_exponent)
 
-    # Prepare summary explanation based on number of super-blocks
-    if num_blocks == 0:
-        n_sbs_str = "0 SB"
-    elif num_blocks == 1:
-        n_sbs_str = "1 SB"
-    else:
-        n_sbs_str = f"{num_blocks} SB"
 
-    return base_score, outsider_acts, n_sbs_str
+# Maximum number of activity pairs looked up at once, bounds the memory of the index arrays
+PAIR_CHUNK = 1 << 20
+
+
+def compile_refinement_scores(table, relations):
+    """
+    Compile a refinement score table into a lookup array indexed by the relation codes of a matrix.
+
+    Args:
+        table (dict): Score per (temporal, existential) symbol pair, e.g. REFINEMENT_SCORES_SB_TO_SB.
+        relations (RelationshipMatrix): Matrix whose codes index the array.
+
+    Returns:
+        np.ndarray: Score per (temporal code, existential code). Relations without a score
+            (not in the table or scored 0) are NaN, they fall back to 0 with a warning.
+    """
+    temporal_codes = {symbol: code for code, symbol in enumerate(relations.temporal_symbols)}
+    existential_codes = {symbol: code for code, symbol in enumerate(relations.existential_symbols)}
+    scores = np.full((len(temporal_codes), len(existential_codes)), np.nan)
+    for (temp, exist), score in table.items():
+        if score and temp in temporal_codes and exist in existential_codes:
+            scores[temporal_codes[temp], existential_codes[exist]] = score
+    return scores
+
+
+def _product_pairs(rows, cols, keep=None):
+    """
+    Activity pairs rows × cols in row-major order, in chunks of at most PAIR_CHUNK pairs.
+
+    Args:
+        rows (np.ndarray): Matrix indices of the first activity of the pairs.
+        cols (np.ndarray): Matrix indices of the second activity of the pairs.
+        keep (Callable[[slice], np.ndarray], optional): Mask of the pairs to take, given the
+            slice of `rows` of a chunk. All pairs are taken by default.
+
+    Returns:
+        Iterator[Tuple[np.ndarray, np.ndarray]]: Matrix indices of both activities per chunk.
+    """
+    step = max(1, PAIR_CHUNK // max(len(cols), 1))
+    for first in range(0, len(rows), step):
+        block = slice(first, first + step)
+        if keep is None:
+            yield np.repeat(rows[block], len(cols)), np.tile(cols, len(rows[block]))
+        else:
+            i, j = np.nonzero(keep(block))
+            yield rows[block][i], cols[j]
+
+
+def _sum_pair_scores(relations, scores, pairs):
+    """
+    Sum the scores of activity pairs with NumPy gathers.
+
+    Each chunk is summed with NumPy's pairwise summation, so the result can differ from
+    the builtin sum over the pairs in the last bits. Pairs without a score count as 0 and
+    are warned about.
+
+    Args:
+        relations (RelationshipMatrix): Coded relationships.
+        scores (np.ndarray): Compiled score table (see `compile_refinement_scores`).
+        pairs (Iterable[Tuple[np.ndarray, np.ndarray]]): Chunks of matrix indices of the first
+            and second activity of the pairs, in summation order.
+
+    Returns:
+        Tuple[float, int]: Sum of the scores and number of scored pairs.
+    """
+    total = 0.0
+    n_pairs = 0
+    for first, second in pairs:
+        values = scores[relations.temporal[first, second], relations.existential[first, second]]
+        unknown = np.isnan(values)
+        if unknown.any():
+            for i, j in zip(first[unknown], second[unknown]):
+                a, b = relations.activities[i], relations.activities[j]
+                temp, exist = relations.relation(a, b)
+                warn(f"Unknown relation ({temp},{exist}) for ({a},{b}) - falling back to value 0")
+            values[unknown] = 0
+        total += float(values.sum())
+        n_pairs += len(values)
+    return total, n_pairs
+
+
+def _pair_score(relations, scores, a, b):
+    # Score of a single pair for the verbose output, 0 for unknown relations
+    i, j = relations.index[a], relations.index[b]
+    score = scores[relations.temporal[i, j], relations.existential[i, j]]
+    return 0 if np.isnan(score) else float(score)
 
 
 def refine_sb_to_sb(relations, super_blocks, verbose):
@@ -109,12 +238,12 @@ def refine_sb_to_sb(relations, super_blocks, verbose):
     extract the temporal and existential relation and use a pre-defined scoring
     scheme (REFINEMENT_SCORES_SB_TO_SB) to assign a numeric score.
 
+    The scores of all end → start pairs are gathered with vectorized lookups.
+
     Parameters
     ----------
-    all_acts : set of str
-        All activity names in the process.
-    relations : dict of dict
-        Pairwise relationships between activities, with format relations[a][b] = "<temporal>,<existential>".
+    relations : RelationshipMatrix
+        Shared coded pairwise relationships between activities.
     super_blocks : list of dict
         List of super-blocks, each defined by:
         - "activities": list of inner activities
@@ -129,47 +258,47 @@ def refine_sb_to_sb(relations, super_blocks, verbose):
         Refinement score, higher values indicate stronger connectivity between super-blocks.
     """
 
+    relations = RelationshipMatrix.coerce(relations)
+    scores = compile_refinement_scores(REFINEMENT_SCORES_SB_TO_SB, relations)
+
+    # Use defined end/start activities if available, else fall back to internal activities
+    end_acts = [[sb["end"]] if sb["end"] else list(sb["activities"]) for sb in super_blocks]
+    start_acts = [[sb["start"]] if sb["start"] else list(sb["activities"]) for sb in super_blocks]
+
+    ends = [np.array([relations.index[act] for act in acts], dtype=np.intp) for acts in end_acts]
+    starts = [np.array([relations.index[act] for act in acts], dtype=np.intp) for acts in start_acts]
+
+    def pairs():
+        # Ends of SB_i × starts of every other SB_j, one chunk per SB_i
+        for idx1 in range(len(super_blocks)):
+            others = [idx2 for idx2 in range(len(super_blocks)) if idx2 != idx1]
+            if not others:
+                continue
+            yield (
+                np.concatenate([np.repeat(ends[idx1], len(starts[idx2])) for idx2 in others]),
+                np.concatenate([np.tile(starts[idx2], len(ends[idx1])) for idx2 in others]),
+            )
+
+    # Compare every ordered pair of super-blocks (excluding self-pairs)
+    total, n_pairs = _sum_pair_scores(relations, scores, pairs())
+
     if verbose:
         print("-" * 80 + "\n")
         print("Refinement SB vs. SB:")
-
-    # Store all per-pair relation scores
-    scores = []  
-    # Keep track of all activities that are part of any super-block
-    all_sb_acts = set()  
-
-    # Compare every pair of super-blocks (excluding self-pairs)
-    for idx1, sb1 in enumerate(super_blocks):
-
-        # Add all activities (incl. start/end if present) from current SB to the set
-        all_sb_acts.update(set(get_super_block_acts(sb1)))
-
-        for idx2, sb2 in enumerate(super_blocks):
-            if idx1 == idx2:
-                continue  # skip self-comparisons
-
-            # Use defined end activities if available, else fall back to internal activities
-            end_acts = [sb1["end"]] if sb1["end"] else sb1["activities"]
-            # Use defined start activities if available, else fall back to internal activities
-            start_acts = [sb2["start"]] if sb2["start"] else sb2["activities"]
-
-            if verbose:
-                print(f"\nSB{idx1+1}→SB{idx2+1}: end {end_acts} → start {start_acts}")
-
-            # For each combination of end→start activities, look up relation score
-            for end in end_acts:
-                for start in start_acts:
-                    temp, exist = relations[end][start].split(",")
-                    score = REFINEMENT_SCORES_SB_TO_SB.get((temp, exist))
-                    if not score:
-                        warn(f"Unknown relation ({temp},{exist}) for ({end},{start}) - falling back to value 0")
-                        score = 0
-                    scores.append(score)
-                    if verbose:
-                        print(f"    ({end}→{start}) = ({temp},{exist}) → {score:+.2f}")
+        for idx1 in range(len(super_blocks)):
+            for idx2 in range(len(super_blocks)):
+                if idx1 == idx2:
+                    continue
+                print(f"\nSB{idx1+1}→SB{idx2+1}: end {end_acts[idx1]} → start {start_acts[idx2]}")
+                for end in end_acts[idx1]:
+                    for start in start_acts[idx2]:
+                        temp, exist = relations.relation(end, start)
+                        print(f"    ({end}→{start}) = ({temp},{exist}) → {_pair_score(relations, scores, end, start):+.2f}")
+
+    count("pairs_scored_sb_sb", n_pairs)
 
     # Average over all comparisons
-    refinement = sum(scores) / len(scores) 
+    refinement = total / n_pairs
 
     if verbose:
         print(f"\nRefinement SB vs. SB: {refinement:+.2f}")
@@ -186,14 +315,15 @@ def refine_out_to_sb(outsiders, relations, super_blocks, verbose):
     Each pairwise relationship is mapped to a numeric score based on a predefined 
     refinement scoring table.
 
-    The average is computed across all outsider-to-super-block activity pairs. 
+    The average is computed across all outsider-to-super-block activity pairs, which are
+    looked up at once.
 
     Parameters
     ----------
     outsiders : list of str
         List of activities not covered by any super-block.
-    relations : dict of dict
-        Pairwise relationships between activities, with format relations[a][b] = "<temporal>,<existential>".
+    relations : RelationshipMatrix
+        Shared coded pairwise relationships between activities.
     super_blocks : list of dict
         List of super-blocks, each defined by:
         - "activities": list of inner activities
@@ -208,44 +338,35 @@ def refine_out_to_sb(outsiders, relations, super_blocks, verbose):
         The refinement score between outsiders and super-blocks.
     """
 
+    relations = RelationshipMatrix.coerce(relations)
+    scores = compile_refinement_scores(REFINEMENT_SCORES_OUT_TO_SB, relations)
+
+    # Get all activities associated with each SB (internal + optional start/end)
+    outsiders = list(outsiders)
+    sb_acts = [get_super_block_acts(sb) for sb in super_blocks]
+    acts = [act for block_acts in sb_acts for act in block_acts]
+
+    # Pairs in the order outsider, SB, activity
+    total, n_pairs = _sum_pair_scores(relations, scores, _product_pairs(
+        np.array([relations.index[act] for act in outsiders], dtype=np.intp),
+        np.array([relations.index[act] for act in acts], dtype=np.intp),
+    ))
+
     if verbose:
         print("-" * 80 + "\n")
         print("Refinement Out vs. SB:")
-
-    # Collect all pairwise scores between outsider activities and SB activities
-    scores = []
-
-    # Iterate over each outsider activity
-    for outsider in outsiders:
-        if verbose:
+        for outsider in outsiders:
             print(f"Out → {outsider}")
+            for idx, block_acts in enumerate(sb_acts):
+                print(f"  SB{idx+1} → {block_acts}")
+                for act in block_acts:
+                    temp, exist = relations.relation(outsider, act)
+                    print(f"    ({outsider}→{act}) = ({temp},{exist}) → {_pair_score(relations, scores, outsider, act):+.2f}")
 
-        # Compare this outsider to every super-block
-        for idx, sb in enumerate(super_blocks):
-            # Get all activities associated with this SB (internal + optional start/end)
-            acts = get_super_block_acts(sb)
-
-            if verbose:
-                print(f"  SB{idx+1} → {acts}")
-
-            # For each activity in the super-block, compare it to the outsider
-            for act in acts:
-                # Extract the pairwise relationship (temporal and existential)
-                temp, exist = relations[outsider][act].split(",")
-
-                # Map the relationship to a numeric refinement score
-                score = REFINEMENT_SCORES_OUT_TO_SB.get((temp, exist))
-                if not score:
-                    warn(f"Unknown relation ({temp},{exist}) for ({outsider},{act}) - falling back to value 0")
-                    score = 0
-
-                scores.append(score)
-
-                if verbose:
-                    print(f"    ({outsider}→{act}) = ({temp},{exist}) → {score:+.2f}")
+    count("pairs_scored_out_sb", n_pairs)
 
     # Compute the average refinement score across all outsider–SB activity pairs
-    refinement = sum(scores) / len(scores) if scores else 0
+    refinement = total / n_pairs if n_pairs else 0
 
     if verbose:
         print(f"Refinement Out {outsider} vs. SB: {refinement:+.2f}")
@@ -262,14 +383,15 @@ def refine_out_to_out(outsiders, relations, verbose):
     activities, the function retrieves their pairwise relationship (temporal and 
     existential), and maps it to a numerical score using a predefined table.
 
+    Pairs are taken in the order of `outsiders` (like itertools.combinations), i.e. the upper
+    triangle of the outsiders × outsiders lookup.
+
     Parameters
     ----------
-    all_acts : set of str
-        All activity names in the process.
     outsiders : list of str
         Activities that are not covered by any super-block.
-    relations : dict of dict
-        Pairwise relationships between activities, with format relations[a][b] = "<temporal>,<existential>".
+    relations : RelationshipMatrix
+        Shared coded pairwise relationships between activities.
     verbose : bool
         If True, print detailed intermediate output.
 
@@ -279,29 +401,29 @@ def refine_out_to_out(outsiders, relations, verbose):
         Refinement score indicating structural connectivity among outsiders.
     """
 
+    relations = RelationshipMatrix.coerce(relations)
+    scores = compile_refinement_scores(REFINEMENT_SCORES_OUT_TO_OUT, relations)
+
+    outsiders = list(outsiders)
+    indices = np.array([relations.index[act] for act in outsiders], dtype=np.intp)
+    positions = np.arange(len(outsiders))
+
+    # Unique unordered pairs (no self-pairs) in the order of combinations(outsiders, 2)
+    total, n_pairs = _sum_pair_scores(relations, scores, _product_pairs(
+        indices, indices, keep=lambda block: positions[block, None] < positions[None, :]
+    ))
+
     if verbose:
         print("--------------------------------------------------------------------------------\n")
         print("Refinement Out vs. Out:")
+        for out1, out2 in combinations(outsiders, 2):
+            temp, exist = relations.relation(out1, out2)
+            print(f"    ({out1}→{out2}) = ({temp},{exist}) → {_pair_score(relations, scores, out1, out2):+.2f}")
 
-    # Store all pairwise refinement scores between outsiders
-    scores = []
-
-    # Iterate over all unique unordered pairs of outsiders (no self-pairs)
-    for out1, out2 in combinations(outsiders, 2):
-        # Extract temporal and existential relationship
-        temp, exist = relations[out1][out2].split(",")
-        # Map to refinement score using predefined dictionary
-        score = REFINEMENT_SCORES_OUT_TO_OUT.get((temp, exist))
-        if not score:
-            warn(f"Unknown relation ({temp},{exist}) for ({out1},{out2}) - falling back to value 0")
-            score = 0
-        scores.append(score)
-
-        if verbose:
-            print(f"    ({out1}→{out2}) = ({temp},{exist}) → {score:+.2f}")
+    count("pairs_scored_out_out", n_pairs)
 
     # Compute average score over all comparisons
-    refinement = sum(scores) / len(scores)
+    refinement = total / n_pairs
 
     if verbose:
         print(f"\nRefinement Out vs. Out: {refinement:+.2f}")
@@ -340,9 +462,10 @@ def compute_refinement_weights(
         bridge_strength (float): In [0, 1]. Defines how much the bridge shrinks with imbalance.
                                  A value of 1 means the bridge can shrink to 0.
         bridge_gamma (float): Controls the sensitivity of the bridge to imbalance (>= 0).
+        The parameters may also be NumPy arrays of a parameter grid (see calibration.py).
 
     Returns:
-        tuple: (weight_sb_sb, weight_out_sb, weight_out_out), all floats.
+        tuple: (weight_sb_sb, weight_out_sb, weight_out_out), all floats (or arrays).
     """
 
     # Collect all activities covered by super-blocks (including optional start/end)
@@ -387,7 +510,7 @@ def compute_refinement_weights(
 
     return weight_sb_sb, weight_out_sb, weight_out_out
 
-def score_process(path, relationships, super_blocks, verbose=False):
+def score_process(path, relationships, super_blocks, verbose=False, reuse=None):
     """
     Computes the overall structuredness score for a given process log.
 
@@ -403,8 +526,16 @@ def score_process(path, relationships, super_blocks, verbose=False):
     ----------
     path : str
         Path to the JSON file containing pairwise activity relationships.
+    relationships : RelationshipMatrix or dict of dict
+        Shared coded relationship matrix (or nested dict of relation strings).
+    super_blocks : list of dict
+        Super-blocks as returned by build_super_blocks.
     verbose : bool, default=False
         If True, print detailed progress and score information to stdout.
+    reuse : dict, optional
+        Weighted refinement terms ("sb_sb", "out_sb", "out_out") of an earlier run on the same
+        activities and super-blocks whose relations did not change (see incremental.reclassify).
+        They are taken as they are instead of being recomputed, so their warnings are not repeated.
 
     Returns
     -------
@@ -431,8 +562,11 @@ def score_process(path, relationships, super_blocks, verbose=False):
         print(f"ANALYSIS FOR {path}\n")
 
 
+    # Reuse the coded matrix shared with block detection
+    relationships = RelationshipMatrix.coerce(relationships)
+
     # Get the full list of activities from the relationship data
-    all_acts = set(relationships.keys())
+    all_acts = set(relationships.activities)
 
     # Compute the base structuredness score based on coverage and fragmentation
     base_score, outsiders, n_sbs_str = compute_base_score(super_blocks, all_acts)
@@ -441,11 +575,16 @@ def score_process(path, relationships, super_blocks, verbose=False):
     weight_sb_sb, weight_out_sb, weight_out_out = compute_refinement_weights(all_acts, super_blocks)
 
     all_refs = []
+    reuse = reuse or {}
 
     # Compute refinement score between all super-blocks
     # Only if there are at least two super-blocks
     if len(super_blocks) > 1:
-        sb_sb_ref = weight_sb_sb * refine_sb_to_sb(relationships, super_blocks, verbose)
+        if "sb_sb" in reuse:
+            sb_sb_ref = reuse["sb_sb"]
+        else:
+            with timed("refine_sb_to_sb"):
+                sb_sb_ref = weight_sb_sb * refine_sb_to_sb(relationships, super_blocks, verbose)
         all_refs.append(sb_sb_ref)
         if verbose:
             print(f"Weighted Refinement SB vs. SB: {sb_sb_ref:+.2f} (Factor: {weight_sb_sb:+.2f})")
@@ -455,7 +594,11 @@ def score_process(path, relationships, super_blocks, verbose=False):
     # Compute refinement score between outsider activities and super-blocks 
     # Only if there is at least one of each to compare
     if len(super_blocks) >= 1 and len(outsiders) >= 1:
-        out_sb_ref = weight_out_sb * refine_out_to_sb(outsiders, relationships, super_blocks, verbose)
+        if "out_sb" in reuse:
+            out_sb_ref = reuse["out_sb"]
+        else:
+            with timed("refine_out_to_sb"):
+                out_sb_ref = weight_out_sb * refine_out_to_sb(outsiders, relationships, super_blocks, verbose)
         all_refs.append(out_sb_ref)
         if verbose:
             print(f"Weighted Refinement Out vs. SB: {out_sb_ref:+.2f} (Factor: {weight_out_sb:+.2f})")
@@ -465,7 +608,11 @@ def score_process(path, relationships, super_blocks, verbose=False):
     # Compute refinement score between outsider activities
     # Only if there are at least two outsiders to compare
     if len(outsiders) > 1:
-        out_out_ref = weight_out_out * refine_out_to_out(outsiders, relationships, verbose)
+        if "out_out" in reuse:
+            out_out_ref = reuse["out_out"]
+        else:
+            with timed("refine_out_to_out"):
+                out_out_ref = weight_out_out * refine_out_to_out(outsiders, relationships, verbose)
         all_refs.append(out_out_ref)
         if verbose:
             print(f"Weighted Refinement Out vs. Out: {out_out_ref:+.2f} (Factor: {weight_out_out:+.2f})")
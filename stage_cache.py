@@ -0,0 +1,217 @@
+import hashlib
+import os
+import pickle
+import tempfile
+
+import constants
+
+# Bump whenever the output of a pipeline stage changes for identical inputs,
+# so that results computed by an older version are never reused.
+CACHE_VERSION = 4
+
+# Cache levels in pipeline order
+STAGES = ("matrix", "blocks", "super_blocks", "score")
+
+# Default upper bound of the on-disk cache size
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+
+def file_digest(path, chunk_size=1 << 20):
+    """
+    Compute the SHA-256 digest of a file's content.
+
+    Args:
+        path (str or Path): File to hash.
+        chunk_size (int): Number of bytes read at once.
+
+    Returns:
+        str: Hex digest of the file content.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def constants_digest():
+    """
+    Compute a digest of the scoring tables and class thresholds in constants.py.
+
+    Returns:
+        str: Hex digest that changes whenever any table entry or threshold changes.
+    """
+    tables = {
+        "REFINEMENT_SCORES_SB_TO_SB": constants.REFINEMENT_SCORES_SB_TO_SB,
+        "REFINEMENT_SCORES_OUT_TO_SB": constants.REFINEMENT_SCORES_OUT_TO_SB,
+        "REFINEMENT_SCORES_OUT_TO_OUT": constants.REFINEMENT_SCORES_OUT_TO_OUT,
+        "class_score_thresholds": constants.class_score_thresholds,
+    }
+    canonical = repr(sorted((name, sorted(table.items())) for name, table in tables.items()))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class StageCache:
+    """
+    Content-addressed on-disk cache for the intermediate results of the classification pipeline.
+
+    Each input file is identified by the hash of its content. The parsed matrix, the blocks
+    and the super-blocks only depend on that content, the score details are additionally keyed
+    by the refinement tables and class thresholds in constants.py. Changing these constants
+    therefore only re-runs scoring, never block detection.
+
+    Entries are pickled into "<cache_dir>/<stage>/<key>.pkl". Reading an entry refreshes its
+    modification time, which `evict` uses to drop the least recently used entries once the
+    cache grows beyond `max_bytes`. Writes are atomic, so several worker processes can share
+    one cache directory.
+
+    Only point the cache at directories you trust, as entries are loaded with pickle.
+    """
+
+    def __init__(self, cache_dir, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = str(cache_dir)
+        self.max_bytes = max_bytes
+
+    def stage_keys(self, path):
+        """
+        Compute the cache key of every stage for an input file.
+
+        Args:
+            path (str or Path): Input file of the pipeline.
+
+        Returns:
+            Dict[str, str]: Mapping from stage name to cache key.
+        """
+        content = f"v{CACHE_VERSION}-{file_digest(path)}"
+        return {
+            "matrix": content,
+            "blocks": content,
+            "super_blocks": content,
+            "score": f"{content}-{constants_digest()[:16]}",
+        }
+
+    def _entry_path(self, stage, key):
+        return os.path.join(self.cache_dir, stage, f"{key}.pkl")
+
+    def get(self, stage, key, default=None):
+        """
+        Load a cached stage result.
+
+        Args:
+            stage (str): One of STAGES.
+            key (str): Cache key as returned by `stage_keys`.
+            default: Value returned on a cache miss.
+
+        Returns:
+            The cached value, or `default` if it is not (or no longer readable) in the cache.
+        """
+        entry = self._entry_path(stage, key)
+        try:
+            with open(entry, "rb") as fh:
+                value = pickle.load(fh)
+        except Exception:
+            # Missing, truncated or outdated entries are treated as a miss
+            return default
+        # Mark entry as recently used
+        try:
+            os.utime(entry)
+        except OSError:
+            pass
+        return value
+
+    def put(self, stage, key, value):
+        """
+        Store a stage result atomically.
+
+        Args:
+            stage (str): One of STAGES.
+            key (str): Cache key as returned by `stage_keys`.
+            value: Picklable stage result.
+        """
+        stage_dir = os.path.join(self.cache_dir, stage)
+        os.makedirs(stage_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=stage_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as fh:
+                pickle.dump(value, fh, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self._entry_path(stage, key))
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def get_or_compute(self, stage, key, compute):
+        """
+        Return the cached result of a stage, computing and storing it on a miss.
+
+        Args:
+            stage (str): One of STAGES.
+            key (str): Cache key as returned by `stage_keys`.
+            compute (Callable[[], Any]): Computes the stage result.
+
+        Returns:
+            The cached or freshly computed stage result.
+        """
+        missing = object()
+        value = self.get(stage, key, default=missing)
+        if value is missing:
+            value = compute()
+            self.put(stage, key, value)
+        return value
+
+    def evict(self):
+        """
+        Delete least recently used entries until the cache fits into `max_bytes`.
+
+        Returns:
+            int: Number of deleted entries.
+        """
+        entries = []
+        for stage in STAGES:
+            stage_dir = os.path.join(self.cache_dir, stage)
+            if not os.path.isdir(stage_dir):
+                continue
+            for name in os.listdir(stage_dir):
+                if not name.endswith(".pkl"):
+                    continue
+                entry = os.path.join(stage_dir, name)
+                try:
+                    stat = os.stat(entry)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry))
+
+        total = sum(size for _, size, _ in entries)
+        deleted = 0
+
+        # Oldest access first
+        for _, size, entry in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(entry)
+            except OSError:
+                continue
+            total -= size
+            deleted += 1
+
+        return deleted
+
+
+class NullCache:
+    """Stand-in for StageCache that always computes and never stores anything."""
+
+    def stage_keys(self, path):
+        return dict.fromkeys(STAGES)
+
+    def get(self, stage, key, default=None):
+        return default
+
+    def put(self, stage, key, value):
+        pass
+
+    def get_or_compute(self, stage, key, compute):
+        return compute()
+
+    def evict(self):
+        return 0
@@ -0,0 +1,159 @@
+import random
+
+from relationship_mining import RelationshipMiner
+
+# Structures the generator can produce
+SHAPES = ("sequence", "xor", "par", "mixed")
+
+
+def _activity_names(n):
+    # Zero-padded labels keep the matrix order equal to the generation order
+    width = len(str(n))
+    return [f"a{i:0{width}d}" for i in range(1, n + 1)]
+
+
+def _split(rng, acts, max_branches):
+    # Cut a list of activities into 2..max_branches non-empty consecutive parts
+    k = rng.randint(2, min(max_branches, len(acts)))
+    cuts = sorted(rng.sample(range(1, len(acts)), k - 1))
+    return [acts[i:j] for i, j in zip([0] + cuts, cuts + [len(acts)])]
+
+
+def _build_tree(rng, acts, shape, max_branches, depth):
+    if len(acts) == 1:
+        return acts[0]
+    if shape == "sequence" or len(acts) < 4:
+        return ("seq", list(acts))
+
+    if shape == "mixed":
+        operator = rng.choice(("seq", "xor", "par", "opt"))
+    else:
+        # Nested blocks of one type, separated by sequences
+        operator = shape if depth % 2 == 0 else "seq"
+
+    if operator == "seq":
+        return ("seq", [_build_tree(rng, part, shape, max_branches, depth + 1)
+                        for part in _split(rng, acts, max_branches)])
+    if operator == "opt":
+        return ("seq", [acts[0], ("opt", [_build_tree(rng, acts[1:-1], shape, max_branches, depth + 1)]), acts[-1]])
+
+    # XOR and PAR blocks get a split and a merge activity
+    split, inner, merge = acts[0], acts[1:-1], acts[-1]
+    if len(inner) < 2:
+        return ("seq", list(acts))
+    branches = [_build_tree(rng, part, shape, max_branches, depth + 1) for part in _split(rng, inner, max_branches)]
+    return ("seq", [split, (operator, branches), merge])
+
+
+def random_process_tree(n_activities, shape="mixed", max_branches=4, rng=None):
+    """
+    Generate a random block-structured process tree.
+
+    Inner nodes are tuples (operator, children) with operator "seq", "xor", "par" or "opt"
+    (the children are executed or skipped together), leaves are activity labels.
+
+    Args:
+        n_activities (int): Number of activities.
+        shape (str): "sequence" for a single sequence, "xor" or "par" for nested blocks of that
+            type alternating with sequences, "mixed" for random operators (see SHAPES).
+        max_branches (int): Maximum number of children of a node.
+        rng (random.Random, optional): Random number generator.
+
+    Returns:
+        tuple or str: Root of the tree.
+    """
+    if shape not in SHAPES:
+        raise ValueError(f"Unknown shape '{shape}', expected one of {SHAPES}")
+    rng = rng or random.Random()
+    return _build_tree(rng, _activity_names(n_activities), shape, max(2, max_branches), 0)
+
+
+def play_out(tree, rng):
+    """
+    Simulate one trace of a process tree.
+
+    Args:
+        tree (tuple or str): Process tree from `random_process_tree`.
+        rng (random.Random): Random number generator.
+
+    Returns:
+        List[str]: Activity labels in execution order.
+    """
+    if isinstance(tree, str):
+        return [tree]
+    operator, children = tree
+    if operator == "seq":
+        return [act for child in children for act in play_out(child, rng)]
+    if operator == "xor":
+        return play_out(rng.choice(children), rng)
+    if operator == "opt":
+        return [act for child in children for act in play_out(child, rng)] if rng.random() < 0.5 else []
+
+    # PAR: random interleaving of the branches
+    branches = [play_out(child, rng) for child in children]
+    positions = [0] * len(branches)
+    trace = []
+    while True:
+        open_branches = [i for i, branch in enumerate(branches) if positions[i] < len(branch)]
+        if not open_branches:
+            return trace
+        i = rng.choice(open_branches)
+        trace.append(branches[i][positions[i]])
+        positions[i] += 1
+
+
+def add_noise(trace, activities, rng):
+    """
+    Distort a trace by swapping two neighbouring events, dropping an event or inserting a random activity.
+
+    Args:
+        trace (List[str]): Trace to distort, it is not modified.
+        activities (List[str]): Activities that can be inserted.
+        rng (random.Random): Random number generator.
+
+    Returns:
+        List[str]: The distorted trace.
+    """
+    trace = list(trace)
+    kind = rng.choice(("swap", "drop", "insert"))
+    if kind == "swap" and len(trace) > 1:
+        i = rng.randrange(len(trace) - 1)
+        trace[i], trace[i + 1] = trace[i + 1], trace[i]
+    elif kind == "drop" and len(trace) > 1:
+        del trace[rng.randrange(len(trace))]
+    else:
+        trace.insert(rng.randrange(len(trace) + 1), rng.choice(activities))
+    return trace
+
+
+def generate_matrix(n_activities, shape="mixed", n_traces=200, noise=0.0, max_branches=4, seed=0):
+    """
+    Generate the relationship matrix of a synthetic process.
+
+    A random process tree is played out and the relations are mined from the traces, so the
+    matrix is consistent like one of a real log. A fraction `noise` of the traces is distorted
+    (see `add_noise`).
+
+    Args:
+        n_activities (int): Number of activities.
+        shape (str): Structure of the process, see `random_process_tree`.
+        n_traces (int): Number of simulated traces.
+        noise (float): Fraction of distorted traces.
+        max_branches (int): Maximum number of branches per block.
+        seed (int): Seed of the generator, equal arguments give equal matrices.
+
+    Returns:
+        RelationshipMatrix: Mined relationships. Activities that never occur in the simulated
+            traces (e.g. in skipped optional parts) are not included.
+    """
+    rng = random.Random(seed)
+    tree = random_process_tree(n_activities, shape, max_branches, rng)
+    activities = _activity_names(n_activities)
+
+    miner = RelationshipMiner()
+    for _ in range(n_traces):
+        trace = play_out(tree, rng)
+        if rng.random() < noise:
+            trace = add_noise(trace, activities, rng)
+        miner.add_trace(trace)
+    return miner.to_matrix()
@@ -1,18 +1,32 @@
-import json
+from matrix_formats import (
+    is_binary_matrix, load_binary_relationships, is_yaml_matrix, load_yaml_relationships,
+    stream_relationships,
+)
+from reachability import ReachabilityIndex
 
 def load_relationships(path):
     """
-    Load activity relationship data from a JSON file.
+    Load activity relationship data from a JSON, YAML or binary matrix file.
+
+    The relation strings are parsed once into an integer-coded RelationshipMatrix
+    that is shared by all subsequent pipeline stages. JSON files may use either
+    the dense nested dict or the sparse format, in which omitted pairs default
+    to "-,-". Dense files are read row by row, so the nested dict of relation
+    strings is never held in memory. Files in the binary format are recognized
+    by their header and memory-mapped instead of parsed, AR-matrix YAML exports
+    (.yaml/.yml) are read directly without a JSON conversion (see matrix_formats.py).
     
     Args:
-        path (str or Path): Path to the JSON file containing activity relationships.
+        path (str or Path): Path to the file containing activity relationships.
     
     Returns:
-        dict: Parsed JSON data representing relationships between activities.
+        RelationshipMatrix: Coded relationships between activities.
     """
-    with open(path) as fh:
-        relationships = json.load(fh)
-    return relationships
+    if is_binary_matrix(path):
+        return load_binary_relationships(path)
+    if is_yaml_matrix(path):
+        return load_yaml_relationships(path)
+    return stream_relationships(path)
 
 
 def flatten_blocks(blocks, include_split_merge=True):
@@ -77,11 +91,14 @@ def latest_among(nodes, succ):
     
     Args:
         nodes (set): Nodes to check.
-        succ (dict): Mapping of node → set/list of successors.
+        succ (ReachabilityIndex or dict): Reachability index of the matrix (bitset lookup),
+            or mapping of node → set/list of successors.
     
     Returns:
         set: Subset of nodes that are latest.
     """
+    if isinstance(succ, ReachabilityIndex):
+        return succ.latest(nodes)
     return {n for n in nodes if not any(m in succ[n] for m in nodes if m != n)}
 
 
@@ -92,11 +109,14 @@ def earliest_among(nodes, succ):
     
     Args:
         nodes (set): Nodes to check.
-        succ (dict): Mapping of node → set/list of successors.
+        succ (ReachabilityIndex or dict): Reachability index of the matrix (bitset lookup),
+            or mapping of node → set/list of successors.
     
     Returns:
         set: Subset of nodes that are earliest.
     """
+    if isinstance(succ, ReachabilityIndex):
+        return succ.earliest(nodes)
     return {n for n in nodes if not any(n in succ[m] for m in nodes if m != n)}
 
 
@@ -105,22 +125,28 @@ def find_first_allowed_pred(x, preds, allowed_preds):
     Find the first predecessor of a node that is in the allowed set.
     Traverses backwards through the predecessor graph until:
       - an allowed predecessor is found with no further predecessors, or
-      - no allowed predecessor is found (returns the original node).
+      - no allowed predecessor is found (returns the last node reached).
+    The traversal is iterative and stops when it runs into a cycle.
     
     Args:
         x (str): Current activity/node.
-        preds (dict): Mapping of node → list of predecessors.
+        preds (ReachabilityIndex or dict): Reachability index of the matrix (memoized bitset
+            walk), or mapping of node → list of predecessors.
         allowed_preds (set): Set of allowed predecessor nodes.
     
     Returns:
         str: First allowed predecessor found, or original node.
     """
-    if x in allowed_preds and not preds.get(x):
-        return x
+    if isinstance(preds, ReachabilityIndex):
+        return preds.first_allowed_pred(x, allowed_preds)
 
-    for p in preds.get(x, []):
-        if p in allowed_preds:
-            return find_first_allowed_pred(p, preds, allowed_preds)
+    visited = {x}
+    while not (x in allowed_preds and not preds.get(x)):
+        p = next((p for p in preds.get(x, []) if p in allowed_preds), None)
+        if p is None or p in visited:
+            break
+        visited.add(p)
+        x = p
     return x
 
 